@@ -0,0 +1,156 @@
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import TruncHour
+
+from .models import Bid, CategoryBidRollup, ListingBidRollup, RollupWatermark
+
+WATERMARK = "bids"
+
+# Bids read from the Bid table per rollup step
+ROLLUP_BATCH = 50000
+
+
+# FUNCTION
+# NAME:        mergeRollups
+# DESCRIPTION: Function will add freshly aggregated buckets to the stored
+#              rollup rows, inserting the buckets that do not exist yet
+# ARGUMENTS:   It needs the rollup model, the name of its key field, the new
+#              buckets as dicts and the fields to add, to max and to min
+# OUTPUT:      None
+def mergeRollups(model, key, buckets, added, maxed, minned=()):
+    if not buckets:
+        return
+    keys = {bucket[key] for bucket in buckets}
+    hours = {bucket["hour"] for bucket in buckets}
+    existing = {
+        (getattr(row, f"{key}_id"), row.hour): row
+        for row in model.objects.filter(**{f"{key}__in": keys, "hour__in": hours})
+    }
+
+    rows = []
+    for bucket in buckets:
+        row = existing.get((bucket[key], bucket["hour"]))
+        if row is None:
+            row = model(**{f"{key}_id": bucket[key], "hour": bucket["hour"]})
+            for field in (*added, *maxed, *minned):
+                setattr(row, field, bucket[field])
+        else:
+            for field in added:
+                setattr(row, field, getattr(row, field) + bucket[field])
+            for field in maxed:
+                setattr(row, field, max(getattr(row, field), bucket[field]))
+            for field in minned:
+                setattr(row, field, min(getattr(row, field), bucket[field]))
+        rows.append(row)
+
+    model.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=[key, "hour"],
+        update_fields=[*added, *maxed, *minned],
+    )
+
+
+# FUNCTION
+# NAME:        rollupStep
+# DESCRIPTION: Function will fold the next batch of bids past the watermark
+#              into the hourly rollups of their listings and categories, and
+#              move the watermark, all in one transaction. Bids are read by
+#              id, which follows commit order because SQLite has a single
+#              writer.
+# ARGUMENTS:   It needs the batch size
+# OUTPUT:      It returns the number of bids folded in
+def rollupStep(batchSize=ROLLUP_BATCH):
+    with transaction.atomic():
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK)
+        upper = (
+            Bid.objects.filter(id__gt=watermark.last_bid)
+            .order_by("id")
+            .values_list("id", flat=True)[batchSize - 1:batchSize]
+            .first()
+        )
+        if upper is None:
+            upper = Bid.objects.filter(id__gt=watermark.last_bid).aggregate(top=Max("id"))["top"]
+            if upper is None:
+                return 0
+
+        batch = Bid.objects.filter(id__gt=watermark.last_bid, id__lte=upper).order_by()
+        perListing = list(
+            batch.annotate(hour=TruncHour("date"))
+            .values("listing", "hour")
+            .annotate(bids=Count("id"), high=Max("amount"), low=Min("amount"), total=Sum("amount"))
+        )
+        perCategory = list(
+            batch.filter(listing__category__isnull=False)
+            .annotate(hour=TruncHour("date"))
+            .values("hour", category=F("listing__category"))
+            .annotate(bids=Count("id"), high=Max("amount"), total=Sum("amount"))
+        )
+
+        mergeRollups(ListingBidRollup, "listing", perListing, ["bids", "total"], ["high"], ["low"])
+        mergeRollups(CategoryBidRollup, "category", perCategory, ["bids", "total"], ["high"])
+
+        folded = sum(bucket["bids"] for bucket in perListing)
+        watermark.last_bid = upper
+        watermark.save(update_fields=["last_bid"])
+    return folded
+
+
+# FUNCTION
+# NAME:        rebuildRollups
+# DESCRIPTION: Function will drop every rollup row and the watermark, so the
+#              next steps rebuild them from the whole Bid table. Needed when
+#              bids are deleted.
+# ARGUMENTS:   None
+# OUTPUT:      None
+def rebuildRollups():
+    with transaction.atomic():
+        ListingBidRollup.objects.all().delete()
+        CategoryBidRollup.objects.all().delete()
+        RollupWatermark.objects.filter(name=WATERMARK).delete()
+
+
+# Query API, reading the rollups only
+
+# FUNCTION
+# NAME:        bidsPerHour
+# DESCRIPTION: Function will return the number of bids per hour of a listing
+#              or a category between two times
+# ARGUMENTS:   It needs the listing id or the category id and the time range
+# OUTPUT:      It returns a list of (hour, bids) pairs, oldest first
+def bidsPerHour(start, end, listingId=None, categoryId=None):
+    if listingId is not None:
+        rows = ListingBidRollup.objects.filter(listing_id=listingId)
+    else:
+        rows = CategoryBidRollup.objects.filter(category_id=categoryId)
+    return list(rows.filter(hour__gte=start, hour__lt=end).order_by("hour").values_list("hour", "bids"))
+
+
+# FUNCTION
+# NAME:        priceOverTime
+# DESCRIPTION: Function will return the highest bid of every hour of a
+#              listing, which is the price once that hour ended
+# ARGUMENTS:   It needs the listing id
+# OUTPUT:      It returns a list of (hour, high) pairs, oldest first
+def priceOverTime(listingId):
+    return list(
+        ListingBidRollup.objects.filter(listing_id=listingId)
+        .order_by("hour")
+        .values_list("hour", "high")
+    )
+
+
+# FUNCTION
+# NAME:        mostContestedCategories
+# DESCRIPTION: Function will rank the categories by number of bids between
+#              two times
+# ARGUMENTS:   It needs the time range and the number of categories
+# OUTPUT:      It returns a list of (category name, bids) pairs
+def mostContestedCategories(start, end, limit=10):
+    return list(
+        CategoryBidRollup.objects.filter(hour__gte=start, hour__lt=end)
+        .values("category__name")
+        .annotate(bids=Sum("bids"))
+        .order_by("-bids")
+        .values_list("category__name", "bids")[:limit]
+    )
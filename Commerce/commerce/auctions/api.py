@@ -0,0 +1,223 @@
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_safe
+
+from .models import Listing, Bid, Comment
+from .pagination import keysetPage, LISTINGS_PER_PAGE
+
+# Version of the API, part of every url. Bump it, and keep the old views,
+# when a response changes in a way clients would notice.
+API_VERSION = "v1"
+
+# Seconds clients and shared caches may reuse a response without asking
+MAX_AGE = 5
+
+# Every field a listing can be serialized with. Each entry names the
+# columns the field needs, the relations to join, and how to read it, so a
+# request for a few fields only loads those columns.
+LISTING_FIELDS = {
+    "id": ([], [], lambda l: l.id),
+    "name": (["name"], [], lambda l: l.name),
+    "description": (["description"], [], lambda l: l.description),
+    "price": (["price"], [], lambda l: str(l.price)),
+    "bidCount": (["bid_count"], [], lambda l: l.bid_count),
+    "active": (["active"], [], lambda l: l.active),
+    "date": ([], [], lambda l: l.date),
+    "end": (["end"], [], lambda l: l.end),
+    "thumbnail": (["photo", "thumbnail"], [], lambda l: l.thumbnail_url),
+    "photo": (["photo", "detail"], [], lambda l: l.detail_url),
+    "owner": (["owner__username"], ["owner"], lambda l: l.owner.username),
+    "category": (["category__name", "category__slug"], ["category"],
+                 lambda l: {"name": l.category.name, "slug": l.category.slug} if l.category else None),
+    "winner": (["winner__username"], ["winner"], lambda l: l.winner.username if l.winner else None),
+}
+
+# Fields returned when the client does not choose
+GRID_FIELDS = ["id", "name", "price", "bidCount", "active", "date", "end", "thumbnail", "category"]
+DETAIL_FIELDS = list(LISTING_FIELDS)
+
+BID_FIELDS = {
+    "id": lambda b: b.id,
+    "amount": lambda b: b.amount,
+    "user": lambda b: b.user.username,
+    "date": lambda b: b.date,
+}
+
+COMMENT_FIELDS = {
+    "id": lambda c: c.id,
+    "comment": lambda c: c.comment,
+    "user": lambda c: c.user.username,
+    "date": lambda c: c.date,
+}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# FUNCTION
+# NAME:        jsonResponse
+# DESCRIPTION: Function will encode data as compact JSON. Responses without
+#              an ETag get one hashed from the body, so clients can still
+#              revalidate and skip the download.
+# ARGUMENTS:   It needs the request, the data and optionally the status
+# OUTPUT:      It returns the HttpResponse
+def jsonResponse(request, data, status=200):
+    body = json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":"))
+    response = HttpResponse(body, content_type="application/json", status=status)
+    if status != 200:
+        return response
+
+    # Views under condition() already have an ETag from the version columns
+    if not getattr(request, "hasVersionEtag", False):
+        etag = f'"{hashlib.sha1(body.encode()).hexdigest()[:24]}"'
+        if request.headers.get("If-None-Match") == etag:
+            response = HttpResponseNotModified()
+        response["ETag"] = etag
+    patch_cache_control(response, public=True, max_age=MAX_AGE)
+    return response
+
+
+# FUNCTION
+# NAME:        apiView
+# DESCRIPTION: Decorator for the API views. Only allows GET and HEAD, and
+#              turns an ApiError into a JSON error body.
+# ARGUMENTS:   It needs the view
+# OUTPUT:      It returns the wrapped view
+def apiView(view):
+    @require_safe
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as e:
+            return jsonResponse(request, {"error": e.message}, status=e.status)
+    wrapper.__name__ = view.__name__
+    return wrapper
+
+
+# FUNCTION
+# NAME:        chooseFields
+# DESCRIPTION: Function will read the comma separated "fields" parameter
+# ARGUMENTS:   It needs the request, the allowed fields and the defaults
+# OUTPUT:      It returns the list of field names
+def chooseFields(request, allowed, default):
+    requested = request.GET.get("fields")
+    if not requested:
+        return default
+    fields = [field.strip() for field in requested.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ApiError(400, f"Unknown fields: {', '.join(unknown)}.")
+    return fields
+
+
+# FUNCTION
+# NAME:        listingQueryset
+# DESCRIPTION: Function will build the listing query loading only the
+#              columns and joins the chosen fields need, always in a single
+#              query
+# ARGUMENTS:   It needs the list of fields
+# OUTPUT:      It returns the queryset
+def listingQueryset(fields):
+    columns = {"id", "date"}
+    relations = set()
+    for field in fields:
+        needed, joins, _ = LISTING_FIELDS[field]
+        columns.update(needed)
+        relations.update(joins)
+    return Listing.objects.select_related(*relations).only(*columns)
+
+
+def serializeListing(listing, fields):
+    return {field: LISTING_FIELDS[field][2](listing) for field in fields}
+
+
+def pageResponse(request, items, nextCursor):
+    data = {"results": items, "next": None}
+    if nextCursor:
+        query = request.GET.copy()
+        query["after"] = nextCursor
+        data["next"] = f"{request.path}?{query.urlencode()}"
+    return jsonResponse(request, data)
+
+
+# FUNCTION
+# NAME:        listingVersion
+# DESCRIPTION: Function will build the ETag of everything under a listing
+#              from its version columns, with one indexed lookup
+# ARGUMENTS:   It needs the request and the id of the listing
+# OUTPUT:      It returns the ETag, or None if the listing does not exist
+def listingVersion(request, id):
+    state = Listing.objects.filter(pk=id).values_list("version", "last_comment").first()
+    if state is None:
+        return None
+    request.hasVersionEtag = True
+    return hashlib.sha1(repr((API_VERSION, request.path, id, *state, request.GET.urlencode())).encode()).hexdigest()[:24]
+
+
+@apiView
+def listings(request):
+    fields = chooseFields(request, LISTING_FIELDS, GRID_FIELDS)
+    queryset = listingQueryset(fields)
+
+    state = request.GET.get("active", "true")
+    if state in ("true", "false"):
+        queryset = queryset.filter(active=state == "true")
+    elif state != "all":
+        raise ApiError(400, "active must be true, false or all.")
+    if request.GET.get("category"):
+        queryset = queryset.filter(category__slug=request.GET["category"].lower())
+
+    try:
+        pageSize = min(int(request.GET.get("limit", LISTINGS_PER_PAGE)), 100)
+    except ValueError:
+        raise ApiError(400, "limit must be a number.")
+
+    rows, nextCursor = keysetPage(queryset, request.GET.get("after"), max(pageSize, 1))
+    return pageResponse(request, [serializeListing(listing, fields) for listing in rows], nextCursor)
+
+
+@apiView
+@condition(etag_func=listingVersion)
+def listing(request, id):
+    fields = chooseFields(request, LISTING_FIELDS, DETAIL_FIELDS)
+    listing = listingQueryset(fields).filter(pk=id).first()
+    if listing is None:
+        raise ApiError(404, "Listing not found.")
+    return jsonResponse(request, serializeListing(listing, fields))
+
+
+# FUNCTION
+# NAME:        childPage
+# DESCRIPTION: Function will serialize one keyset page of the bids or the
+#              comments of a listing, with their users joined in
+# ARGUMENTS:   It needs the request, the listing id, the model and the
+#              serializer fields
+# OUTPUT:      It returns the response
+def childPage(request, id, model, allowed):
+    fields = chooseFields(request, allowed, list(allowed))
+    if not Listing.objects.filter(pk=id).exists():
+        raise ApiError(404, "Listing not found.")
+    queryset = model.objects.filter(listing_id=id).select_related("user")
+    rows, nextCursor = keysetPage(queryset, request.GET.get("after"))
+    items = [{field: allowed[field](row) for field in fields} for row in rows]
+    return pageResponse(request, items, nextCursor)
+
+
+@apiView
+@condition(etag_func=listingVersion)
+def bids(request, id):
+    return childPage(request, id, Bid, BID_FIELDS)
+
+
+@apiView
+@condition(etag_func=listingVersion)
+def comments(request, id):
+    return childPage(request, id, Comment, COMMENT_FIELDS)
@@ -0,0 +1,121 @@
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .categories import invalidateCategoryCounts
+from .live import publishListing
+from .models import Listing, Bid
+
+# Outcome of a bid. accepted says if the bid went through, message explains
+# why it did not, price and bidCount are the listing state after the attempt
+BidResult = namedtuple("BidResult", ["accepted", "message", "price", "bidCount"])
+
+ACCEPTED = "Your bid is the current bid."
+TOO_LOW = "Bid should be higher than the current price."
+CLOSED = "This auction is closed."
+
+
+# FUNCTION
+# NAME:        placeBid
+# DESCRIPTION: Function will place a bid on a listing. The "higher than the
+#              current price" check and the update of the listing are one
+#              conditional UPDATE, so two concurrent bids can never both win
+#              against the same price. Only the bid summary columns are
+#              written.
+# ARGUMENTS:   It needs the id of the listing, the user placing the bid and
+#              the amount
+# OUTPUT:      It returns a BidResult
+def placeBid(listingId, user, amount):
+    now = timezone.now()
+    with transaction.atomic():
+        # Auctions past their end are closed even if the worker has not
+        # got to them yet
+        updated = Listing.objects.filter(
+            Q(end__isnull=True) | Q(end__gt=now),
+            pk=listingId, active=True, price__lt=amount
+        ).update(
+            price=amount,
+            high_bidder=user,
+            bid_count=F("bid_count") + 1,
+            version=F("version") + 1,
+        )
+
+        if updated:
+            Bid.objects.create(user=user, listing_id=listingId, amount=amount)
+
+    # Read back what the listing looks like now, whatever happened
+    state = Listing.objects.filter(pk=listingId).values("price", "bid_count", "active", "end").first()
+    if state is None:
+        raise Listing.DoesNotExist(f"Listing {listingId} does not exist")
+
+    if updated:
+        message = ACCEPTED
+        data = {"price": str(state["price"]), "bidCount": state["bid_count"], "active": True}
+        transaction.on_commit(lambda: publishListing(listingId, "bid", data))
+    elif not state["active"] or (state["end"] is not None and state["end"] <= now):
+        message = CLOSED
+    else:
+        message = TOO_LOW
+
+    return BidResult(bool(updated), message, state["price"], state["bid_count"])
+
+
+# FUNCTION
+# NAME:        closeAuction
+# DESCRIPTION: Function will close a listing and make its current high bidder
+#              the winner in the same UPDATE, so a bid landing while the
+#              owner closes the auction cannot be lost
+# ARGUMENTS:   It needs the id of the listing
+# OUTPUT:      It returns a boolean stating if this call closed the listing
+def closeAuction(listingId):
+    updated = Listing.objects.filter(pk=listingId, active=True).update(
+        active=False,
+        winner=F("high_bidder"),
+        version=F("version") + 1,
+    )
+    if updated:
+        invalidateCategoryCounts()
+        transaction.on_commit(lambda: publishListing(listingId, "close", {"active": False}))
+    return bool(updated)
+
+
+# FUNCTION
+# NAME:        closeExpired
+# DESCRIPTION: Function will close one batch of auctions whose end time has
+#              passed. The winner of every listing is resolved from its own
+#              bids by a correlated subquery in the same UPDATE, so the whole
+#              batch is closed with one statement.
+# ARGUMENTS:   It needs the current time and the batch size
+# OUTPUT:      It returns the ids of the listings closed and how late each
+#              one was closed, in seconds
+def closeExpired(now, batchSize):
+    with transaction.atomic():
+        expired = list(
+            Listing.objects.filter(active=True, end__lte=now)
+            .order_by("end")
+            .values_list("id", "end")[:batchSize]
+        )
+        if not expired:
+            return [], []
+
+        ids = [id for id, _ in expired]
+        topBidder = (
+            Bid.objects.filter(listing=OuterRef("pk"))
+            .order_by("-amount", "date")
+            .values("user")[:1]
+        )
+        Listing.objects.filter(pk__in=ids, active=True).update(
+            active=False,
+            winner=Subquery(topBidder),
+            version=F("version") + 1,
+        )
+
+        def announce():
+            for id in ids:
+                publishListing(id, "close", {"active": False})
+        transaction.on_commit(announce)
+
+    invalidateCategoryCounts()
+    return ids, [(now - end).total_seconds() for _, end in expired]
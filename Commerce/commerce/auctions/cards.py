@@ -0,0 +1,71 @@
+import threading
+
+from django.core.cache import caches
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+# Alias in settings.CACHES holding the rendered cards. Local memory is fine
+# for a single node, point it at a shared backend when running several.
+CARD_CACHE = "cards"
+
+stats = {"hits": 0, "misses": 0}
+statsLock = threading.Lock()
+
+
+# FUNCTION
+# NAME:        cardKey
+# DESCRIPTION: Function will build the cache key of a listing card. The key
+#              holds the listing version, so any change to the listing moves
+#              it to a new key and old cards simply expire. The creation
+#              time guards against ids being reused after a database reset.
+# ARGUMENTS:   It needs the listing and if the current user watches it
+# OUTPUT:      It returns the cache key
+def cardKey(listing, watched):
+    created = int(listing.date.timestamp() * 1000000)
+    return f"auctions:card:{listing.id}:{created}:{listing.version}:{int(watched)}"
+
+
+# FUNCTION
+# NAME:        renderCard
+# DESCRIPTION: Function will return the HTML of a listing card, from the
+#              cache when possible, rendering and storing it otherwise
+# ARGUMENTS:   It needs the listing and if the current user watches it
+# OUTPUT:      It returns the card as safe HTML
+def renderCard(listing, watched):
+    cache = caches[CARD_CACHE]
+    key = cardKey(listing, watched)
+    html = cache.get(key)
+
+    with statsLock:
+        stats["hits" if html is not None else "misses"] += 1
+
+    if html is None:
+        html = render_to_string("auctions/card.html", {
+            "listing": listing,
+            "watched": watched,
+        })
+        cache.set(key, html)
+    return mark_safe(html)
+
+
+# FUNCTION
+# NAME:        cardCacheStats
+# DESCRIPTION: Function will return the hit and miss counters of the card
+#              cache of this process
+# ARGUMENTS:   None
+# OUTPUT:      It returns a dict with hits, misses and the hit rate
+def cardCacheStats():
+    with statsLock:
+        hits, misses = stats["hits"], stats["misses"]
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hitRate": hits / total if total else 0.0}
+
+
+# FUNCTION
+# NAME:        resetCardCacheStats
+# DESCRIPTION: Function will set the counters of the card cache back to zero
+# ARGUMENTS:   None
+# OUTPUT:      None
+def resetCardCacheStats():
+    with statsLock:
+        stats["hits"] = stats["misses"] = 0
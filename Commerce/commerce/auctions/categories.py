@@ -0,0 +1,42 @@
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Listing
+
+CATEGORY_COUNTS_KEY = "auctions:category-counts"
+
+# Seconds the counts are reused. The default cache is local to each
+# process and only sees its own invalidations, so this bounds how long
+# another worker, or a change made by closeexpired, leaves them stale.
+CATEGORY_COUNTS_SECONDS = 30
+
+
+# FUNCTION
+# NAME:        categoryCounts
+# DESCRIPTION: Function will return the number of active listings of every
+#              category. The table is computed with one GROUP BY and kept in
+#              the cache for CATEGORY_COUNTS_SECONDS, or until a listing is
+#              created, edited or closed by this process.
+# ARGUMENTS:   None
+# OUTPUT:      It returns a dict of category id to active listing count
+def categoryCounts():
+    counts = cache.get(CATEGORY_COUNTS_KEY)
+    if counts is None:
+        counts = dict(
+            Listing.objects.filter(active=True, category__isnull=False)
+            .order_by()
+            .values_list("category")
+            .annotate(total=Count("id"))
+        )
+        cache.set(CATEGORY_COUNTS_KEY, counts, CATEGORY_COUNTS_SECONDS)
+    return counts
+
+
+# FUNCTION
+# NAME:        invalidateCategoryCounts
+# DESCRIPTION: Function will drop the cached category counts so the next
+#              read recomputes them
+# ARGUMENTS:   None
+# OUTPUT:      None
+def invalidateCategoryCounts():
+    cache.delete(CATEGORY_COUNTS_KEY)
@@ -0,0 +1,109 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import Category, Listing, User
+from .pagination import keysetPage
+
+
+# FUNCTION
+# NAME:        digest
+# DESCRIPTION: Function will hash the parts of an ETag into a short string
+# ARGUMENTS:   Any number of values
+# OUTPUT:      It returns the ETag value
+def digest(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()[:24]
+
+
+# FUNCTION
+# NAME:        conditionalGet
+# DESCRIPTION: Decorator answering GET requests with 304 when the ETag sent
+#              by the client still matches, without running the view. The
+#              ETag function must only read cheap version columns. POSTs go
+#              straight to the view. Pages are marked private so shared
+#              caches never hand one user's page to another.
+# ARGUMENTS:   It needs the ETag function, called with the view arguments
+# OUTPUT:      It returns the decorator
+def conditionalGet(etagFunc):
+    def decorator(view):
+        conditional = condition(etag_func=etagFunc)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+            response = conditional(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+# FUNCTION
+# NAME:        viewer
+# DESCRIPTION: Function will return what identifies the viewer in an ETag,
+#              since the pages show the user name and per-user state
+# ARGUMENTS:   It needs the request
+# OUTPUT:      It returns the user id, or 0 for anonymous visitors
+def viewer(request):
+    return request.user.id if request.user.is_authenticated else 0
+
+
+# FUNCTION
+# NAME:        listingEtag
+# DESCRIPTION: Function will build the ETag of a listing page from the
+#              listing version (bids, closing, edits), the newest comment, the
+#              watch state and the viewer, all read with indexed lookups
+# ARGUMENTS:   It needs the request and the id of the listing
+# OUTPUT:      It returns the ETag, or None when the listing does not exist
+def listingEtag(request, id):
+    state = Listing.objects.filter(pk=id).values_list("version", "last_comment", "active", "end").first()
+    if state is None:
+        return None
+    watched = False
+    if request.user.is_authenticated:
+        watched = User.watchlist.through.objects.filter(user_id=request.user.id, listing_id=id).exists()
+    # Kept on the request so the view does not ask again
+    request.watchState = watched
+    return digest("listing", id, *state, watched, viewer(request), request.GET.urlencode())
+
+
+# FUNCTION
+# NAME:        gridEtag
+# DESCRIPTION: Function will build the ETag of a page of listing cards from
+#              the ids and versions of the listings on it, without loading
+#              the rest of their columns, plus the watch state and viewer
+# ARGUMENTS:   It needs the request and the queryset of the grid
+# OUTPUT:      It returns the ETag
+def gridEtag(request, queryset):
+    rows, nextCursor = keysetPage(queryset.only("id", "date", "version"), request.GET.get("after"))
+    cards = [(listing.id, listing.version) for listing in rows]
+    watched = []
+    if request.user.is_authenticated and cards:
+        watched = sorted(User.watchlist.through.objects.filter(
+            user_id=request.user.id, listing_id__in=[id for id, _ in cards]
+        ).values_list("listing_id", flat=True))
+    # Kept on the request so the view does not ask again
+    request.watchedIds = set(watched)
+    return digest("grid", cards, nextCursor, watched, viewer(request), request.path, request.GET.urlencode())
+
+
+def indexEtag(request):
+    return gridEtag(request, Listing.objects.filter(active=True))
+
+
+def categoryEtag(request, slug):
+    category = Category.objects.filter(slug=slug.lower()).first()
+    if category is None:
+        return None
+    # Not category.listings: the related manager would set the category on
+    # every row and load the deferred category_id of each one
+    return gridEtag(request, Listing.objects.filter(category=category))
+
+
+def watchlistEtag(request):
+    if not request.user.is_authenticated:
+        return None
+    return gridEtag(request, request.user.watchlist.all())
@@ -1,4 +1,5 @@
 from django import forms
+from django.utils import timezone
 from .models import Listing, Category
 
 class ListingForm(forms.Form):
@@ -17,10 +18,15 @@ class ListingForm(forms.Form):
         max_digits = 10,
         widget = forms.NumberInput()
     )
-    # might have to add an url instead of an actual image that will then be saved
+    # Either a link to a photo or an uploaded one, both are stored locally
+    # and resized off the request by auctions.photos
     photo = forms.URLField(
         required = False
     )
+    upload = forms.ImageField(
+        label = "Or upload a photo",
+        required = False
+    )
 
     category = forms.ModelChoiceField(
         queryset = Category.objects.all(),
@@ -28,10 +34,40 @@ class ListingForm(forms.Form):
         widget = forms.Select()
     )
 
+    end = forms.DateTimeField(
+        label = "Ends",
+        required = False,
+        widget = forms.DateTimeInput(attrs={
+            'type': 'datetime-local'
+        })
+    )
+
+    def clean_end(self):
+        end = self.cleaned_data["end"]
+        if end is not None and end <= timezone.now():
+            raise forms.ValidationError("The auction must end in the future.")
+        return end
+
     class Meta:
         model  = Listing                 
         fields = ["name", "description", "price", "photo",
-                  "category", "active"]   
+                  "upload", "category", "active", "end"]   
+
+class ListingImportForm(ListingForm):
+    # Same rules as ListingForm, but the category comes as a name and is
+    # resolved against a dict loaded once by the import command
+    category = forms.CharField()
+
+    def __init__(self, *args, categories, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.categories = categories
+
+    def clean_category(self):
+        name = self.cleaned_data["category"].strip()
+        category = self.categories.get(name.lower())
+        if category is None:
+            raise forms.ValidationError(f"Unknown category \"{name}\".")
+        return category
         
 class BidForm(forms.Form):
     bid = forms.DecimalField(
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+# Hashing jobs allowed to wait for a worker, per worker
+QUEUE_PER_WORKER = 4
+
+executor = None
+slots = None
+executorLock = threading.Lock()
+
+
+class HashingBusy(Exception):
+    """
+    Raised when the hashing pool already has as many jobs as it may queue.
+    """
+
+
+# FUNCTION
+# NAME:        runJob
+# DESCRIPTION: Function will run one hashing job on a pool thread, with the
+#              thread's own database connection, and free its slot
+# ARGUMENTS:   It needs the function and its arguments
+# OUTPUT:      It returns what the function returns
+def runJob(func, *args, **kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+        slots.release()
+
+
+# FUNCTION
+# NAME:        offloadHashing
+# DESCRIPTION: Function will run a call doing password hashing, such as
+#              authenticate or create_user, on a small pool of threads, so
+#              the threads serving the auction pages are never busy hashing.
+#              The pool has AUCTIONS_HASH_WORKERS threads and a bounded queue,
+#              past which the call is refused instead of piling up. With 0
+#              workers the call runs like any sync code of an async view.
+# ARGUMENTS:   It needs the function and its arguments
+# OUTPUT:      It returns what the function returns, or raises HashingBusy
+async def offloadHashing(func, *args, **kwargs):
+    global executor, slots
+    workers = getattr(settings, "AUCTIONS_HASH_WORKERS", 2)
+    if workers <= 0:
+        return await sync_to_async(func)(*args, **kwargs)
+
+    with executorLock:
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hashing")
+            slots = threading.BoundedSemaphore(workers * (1 + QUEUE_PER_WORKER))
+    if not slots.acquire(blocking=False):
+        raise HashingBusy()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(runJob, func, *args, **kwargs))
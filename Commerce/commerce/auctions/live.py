@@ -0,0 +1,130 @@
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# How many undelivered events a slow subscriber may have before old ones
+# are dropped. Only the latest state of a listing matters to the page.
+QUEUE_SIZE = 16
+
+
+class LocalBroker:
+    """
+    In-process publish/subscribe. Publishing is safe from any thread, so
+    sync views can publish while the subscribers wait on the event loop of
+    the ASGI worker. Only reaches subscribers of the same process, use a
+    shared broker with the same two methods when running several workers.
+    """
+
+    def __init__(self):
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+    def publish(self, channel, message):
+        with self.lock:
+            targets = list(self.subscribers.get(channel, ()))
+        for loop, queue in targets:
+            loop.call_soon_threadsafe(offer, queue, message)
+
+    def subscribe(self, channel):
+        """
+        Returns a Subscription receiving the messages published on channel.
+        Must be called from the event loop that will read it.
+        """
+        subscription = Subscription(self, channel, asyncio.get_running_loop())
+        with self.lock:
+            self.subscribers.setdefault(channel, set()).add(subscription.entry)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            listeners = self.subscribers.get(subscription.channel)
+            if listeners is not None:
+                listeners.discard(subscription.entry)
+                if not listeners:
+                    del self.subscribers[subscription.channel]
+
+    def subscriberCount(self):
+        with self.lock:
+            return sum(len(listeners) for listeners in self.subscribers.values())
+
+
+class Subscription:
+    """
+    One subscriber of a channel. get() waits for the next message and can be
+    cancelled (e.g. by a timeout) without losing the subscription.
+    """
+
+    def __init__(self, broker, channel, loop):
+        self.broker = broker
+        self.channel = channel
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.entry = (loop, self.queue)
+
+    async def get(self):
+        return await self.queue.get()
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+# FUNCTION
+# NAME:        offer
+# DESCRIPTION: Function will put a message on a subscriber queue, dropping
+#              the oldest message when the queue is full
+# ARGUMENTS:   It needs the queue and the message
+# OUTPUT:      None
+def offer(queue, message):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(message)
+
+
+broker = None
+brokerLock = threading.Lock()
+
+
+# FUNCTION
+# NAME:        getBroker
+# DESCRIPTION: Function will return the broker of this process, created
+#              from the AUCTIONS_LIVE_BROKER setting the first time
+# ARGUMENTS:   None
+# OUTPUT:      It returns the broker
+def getBroker():
+    global broker
+    with brokerLock:
+        if broker is None:
+            path = getattr(settings, "AUCTIONS_LIVE_BROKER", "auctions.live.LocalBroker")
+            broker = import_string(path)()
+    return broker
+
+
+# FUNCTION
+# NAME:        listingChannel
+# DESCRIPTION: Function will return the name of the channel of a listing
+# ARGUMENTS:   It needs the id of the listing
+# OUTPUT:      It returns the channel name
+def listingChannel(listingId):
+    return f"listing:{listingId}"
+
+
+# FUNCTION
+# NAME:        publishListing
+# DESCRIPTION: Function will push the current bid state of a listing to the
+#              pages watching it
+# ARGUMENTS:   It needs the id of the listing, the event name ("bid" or
+#              "close") and the data to send
+# OUTPUT:      None
+def publishListing(listingId, event, data):
+    getBroker().publish(listingChannel(listingId), {"event": event, "data": data})
+
+
+# FUNCTION
+# NAME:        formatEvent
+# DESCRIPTION: Function will format a message as a Server-Sent Event
+# ARGUMENTS:   It needs the message
+# OUTPUT:      It returns the event as text
+def formatEvent(message):
+    return f"event: {message['event']}\ndata: {json.dumps(message['data'])}\n\n"
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from auctions.bids import closeExpired
+
+
+class Command(BaseCommand):
+    help = "Closes auctions whose end time has passed, in batches, and picks each winner from its own bids."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--loop", action="store_true",
+            help="Keep running and check for expired auctions every --interval seconds."
+        )
+        parser.add_argument("--interval", type=float, default=5.0)
+
+    def handle(self, *args, **options):
+        while True:
+            closed = self.closeAll(options["batch_size"])
+            if not options["loop"]:
+                self.stdout.write(self.style.SUCCESS(f"Closed {closed} auctions."))
+                return
+            time.sleep(options["interval"])
+
+    def closeAll(self, batchSize):
+        total = 0
+        while True:
+            start = time.perf_counter()
+            ids, lags = closeExpired(timezone.now(), batchSize)
+            elapsed = time.perf_counter() - start
+            if not ids:
+                return total
+
+            total += len(ids)
+            self.stdout.write(
+                f"closed {len(ids)} auctions in {elapsed * 1000:.1f} ms "
+                f"({len(ids) / elapsed:.0f}/s), lag behind end "
+                f"avg {sum(lags) / len(lags):.1f}s max {max(lags):.1f}s"
+            )
@@ -0,0 +1,55 @@
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from auctions.synthetic import SyntheticData
+
+
+class Command(BaseCommand):
+    help = (
+        "Generates a deterministic synthetic dataset: users, categories, listings, bids, comments "
+        "and watchlists, with Zipf popularity so bids and comments cluster on a few hot listings. "
+        "The same --seed and sizes always give the same data. Every generated user has the "
+        "password \"password\"."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--categories", type=int, default=20)
+        parser.add_argument("--listings", type=int, default=10000)
+        parser.add_argument("--bids", type=int, default=100000, help="Total bids, spread by popularity.")
+        parser.add_argument("--comments", type=int, default=50000, help="Total comments, spread by popularity.")
+        parser.add_argument("--watchlist", type=float, default=10, help="Average listings watched per user.")
+        parser.add_argument("--exponent", type=float, default=1.1, help="Zipf exponent, higher is more skewed.")
+        parser.add_argument("--days", type=int, default=90, help="How far back the listings go.")
+        parser.add_argument(
+            "--now", default=None,
+            help="ISO date the data ends at, defaults to today 00:00 UTC. Fix it to get the same dates.",
+        )
+        parser.add_argument("--prefix", default="gen", help="Prefix of the generated usernames and categories.")
+        parser.add_argument("--batch-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        if options["now"]:
+            now = datetime.fromisoformat(options["now"])
+            if now.tzinfo is None:
+                now = now.replace(tzinfo=timezone.utc)
+        else:
+            now = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        if options["users"] < 1 or options["categories"] < 1:
+            raise CommandError("At least one user and one category are needed.")
+
+        generator = SyntheticData(
+            options["seed"], now, days=options["days"], exponent=options["exponent"],
+            batchSize=options["batch_size"], prefix=options["prefix"], out=self.stdout.write,
+        )
+        counts, elapsed = generator.generate(
+            options["users"], options["categories"], options["listings"],
+            options["bids"], options["comments"], options["watchlist"],
+        )
+        rows = sum(counts.values())
+        seconds = sum(elapsed.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {rows} rows in {seconds:.1f}s ({rows / max(seconds, 1e-9):.0f} rows/s)."
+        ))
@@ -0,0 +1,164 @@
+import csv
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from auctions.categories import invalidateCategoryCounts
+from auctions.forms import ListingImportForm
+from auctions.models import Category, Listing, User
+
+FIELDS = ["name", "description", "price", "photo", "category", "end"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports listings from a CSV or JSONL file with the columns "
+        + ", ".join(FIELDS) + ". Rows are validated like the create form "
+        "and inserted in batches. Rows that fail are written to a rejects "
+        "file so they can be fixed and imported again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--owner", required=True, help="Username owning the imported listings.")
+        parser.add_argument("--format", choices=["csv", "jsonl"], help="Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--start-line", type=int, default=1,
+            help="Skip rows before this line, to resume an interrupted import."
+        )
+        parser.add_argument("--rejects", help="Where to write failed rows, defaults to <path>.rejects.jsonl.")
+        parser.add_argument("--progress-every", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        format = options["format"] or ("csv" if path.endswith(".csv") else "jsonl")
+        batchSize = options["batch_size"]
+        rejectsPath = options["rejects"] or f"{path}.rejects.jsonl"
+
+        owner = User.objects.filter(username=options["owner"]).first()
+        if owner is None:
+            raise CommandError(f"User \"{options['owner']}\" does not exist.")
+
+        # One query for every category, looked up by lowercase name
+        categories = {category.name.lower(): category for category in Category.objects.all()}
+
+        imported = rejected = 0
+        batch = []
+        lastLine = options["start_line"] - 1
+        start = time.perf_counter()
+
+        # Keep the rejects of the earlier run when resuming, but only those
+        # before the start line, the others are about to be rejected again
+        mode = "a" if options["start_line"] > 1 else "w"
+        if mode == "a":
+            keepRejects(rejectsPath, options["start_line"])
+        with open(rejectsPath, mode) as rejects:
+            for line, row in readRows(path, format):
+                if line < options["start_line"]:
+                    continue
+
+                listing, errors = self.buildListing(row, owner, categories)
+                if errors:
+                    # The rejects file can be fixed and imported as it is,
+                    # the extra keys are ignored
+                    rejects.write(json.dumps({**row, "_line": line, "_errors": errors}) + "\n")
+                    rejected += 1
+                else:
+                    batch.append(listing)
+
+                if len(batch) >= batchSize:
+                    imported += self.insert(batch, batchSize)
+                    batch = []
+                    lastLine = line
+
+                if line % options["progress_every"] == 0:
+                    self.progress(line, lastLine, imported, rejected, start)
+
+            imported += self.insert(batch, batchSize)
+
+        invalidateCategoryCounts()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} listings in {elapsed:.1f}s ({imported / max(elapsed, 1e-9):.0f}/s), "
+            f"{rejected} rows rejected."
+        ))
+        if rejected:
+            self.stdout.write(f"Rejected rows were written to {rejectsPath}")
+        elif mode == "w" and os.path.exists(rejectsPath):
+            os.remove(rejectsPath)
+
+    def buildListing(self, row, owner, categories):
+        data = {field: "" if row.get(field) is None else row[field] for field in FIELDS}
+        form = ListingImportForm(data, categories=categories)
+        if not form.is_valid():
+            return None, {field: list(messages) for field, messages in form.errors.items()}
+
+        cd = form.cleaned_data
+        return Listing(
+            name=cd["name"],
+            description=cd["description"],
+            price=cd["price"],
+            photo=cd["photo"] or None,
+            category=cd["category"],
+            end=cd["end"],
+            owner=owner,
+            active=True,
+            # Photos are fetched later by the processphotos command
+            photo_status="pending" if cd["photo"] else "",
+        ), None
+
+    def insert(self, batch, batchSize):
+        if not batch:
+            return 0
+        with transaction.atomic():
+            Listing.objects.bulk_create(batch, batch_size=batchSize)
+        return len(batch)
+
+    def progress(self, line, lastLine, imported, rejected, start):
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"line {line}: {imported} imported, {rejected} rejected, "
+            f"{imported / max(elapsed, 1e-9):.0f} rows/s, committed through line {lastLine}"
+        )
+
+
+# FUNCTION
+# NAME:        keepRejects
+# DESCRIPTION: Function will drop from a rejects file the rows from a line
+#              on, so a resumed import does not write them twice
+# ARGUMENTS:   It needs the path of the rejects file and the first line to drop
+# OUTPUT:      Nothing, the file is rewritten in place if it exists
+def keepRejects(path, startLine):
+    if not os.path.exists(path):
+        return
+    with open(path) as f:
+        kept = [text for text in f if text.strip() and json.loads(text).get("_line", 0) < startLine]
+    with open(path, "w") as f:
+        f.writelines(kept)
+
+
+# FUNCTION
+# NAME:        readRows
+# DESCRIPTION: Function will stream the rows of a CSV or JSONL file one at a
+#              time, so memory stays flat whatever the size of the file
+# ARGUMENTS:   It needs the path and the format
+# OUTPUT:      It yields (line number, row dict) pairs. Lines are counted
+#              from 1 and do not count the CSV header.
+def readRows(path, format):
+    with open(path, newline="", encoding="utf-8") as f:
+        if format == "csv":
+            for line, row in enumerate(csv.DictReader(f), start=1):
+                yield line, row
+        else:
+            for line, text in enumerate(f, start=1):
+                if not text.strip():
+                    continue
+                try:
+                    row = json.loads(text)
+                except json.JSONDecodeError:
+                    row = {"_raw": text.strip()}
+                yield line, row if isinstance(row, dict) else {"_raw": text.strip()}
@@ -0,0 +1,43 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from auctions.models import Listing
+from auctions.photos import ingestPhoto
+
+
+class Command(BaseCommand):
+    help = "Generates the thumbnail and detail variants of every listing photo still pending."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Threads resizing photos, 1 runs them in order.")
+        parser.add_argument("--retry-failed", action="store_true", help="Also retry photos that failed before.")
+
+    def handle(self, *args, **options):
+        statuses = ["pending", "failed"] if options["retry_failed"] else ["pending"]
+        ids = list(Listing.objects.filter(photo_status__in=statuses).values_list("id", flat=True))
+
+        # One photo crashing counts as failed, it never ends the run
+        def job(id):
+            try:
+                return ingestPhoto(id)
+            except Exception as e:
+                self.stderr.write(f"Photo of listing {id} crashed: {e!r}")
+                return False
+            finally:
+                close_old_connections()
+
+        start = time.perf_counter()
+        if options["workers"] <= 1:
+            results = [job(id) for id in ids]
+        else:
+            with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+                results = list(pool.map(job, ids))
+        elapsed = time.perf_counter() - start
+
+        ready = sum(results)
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {len(ids)} photos in {elapsed:.1f}s: {ready} ready, {len(ids) - ready} failed."
+        ))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Max, OuterRef, Subquery
+from django.db.models.functions import Cast, Coalesce
+
+from auctions.models import Bid, Listing
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the high bid, high bidder and bid count stored on every listing from the Bid table."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = rebuildBidSummary()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt bid summary for {updated} listings."))
+
+
+# FUNCTION
+# NAME:        rebuildBidSummary
+# DESCRIPTION: Recomputes the denormalized bid state of every listing in a
+#              single UPDATE using correlated subqueries over the Bid table
+# ARGUMENTS:   None
+# OUTPUT:      The number of listings updated
+def rebuildBidSummary():
+    bids = Bid.objects.filter(listing=OuterRef("pk"))
+    topBid = bids.order_by("-amount", "date")
+
+    # Aggregates are grouped by listing inside each subquery, an UPDATE
+    # cannot join against the Bid table directly
+    bidCount = bids.order_by().values("listing").annotate(total=Count("pk")).values("total")
+    highBid = bids.order_by().values("listing").annotate(top=Max("amount")).values("top")
+
+    return Listing.objects.update(
+        bid_count=Coalesce(Subquery(bidCount), 0),
+        high_bidder=Subquery(topBid.values("user")[:1]),
+        price=Coalesce(Cast(Subquery(highBid), DecimalField(max_digits=10, decimal_places=2)), "price"),
+        version=F("version") + 1,
+    )
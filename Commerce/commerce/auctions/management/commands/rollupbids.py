@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from auctions.analytics import ROLLUP_BATCH, rebuildRollups, rollupStep
+
+
+class Command(BaseCommand):
+    help = "Folds new bids into the hourly listing and category rollups used by the analytics."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=ROLLUP_BATCH)
+        parser.add_argument("--rebuild", action="store_true", help="Drop the rollups and rebuild them from every bid.")
+        parser.add_argument("--loop", action="store_true", help="Keep catching up every --interval seconds.")
+        parser.add_argument("--interval", type=float, default=60.0)
+
+    def handle(self, *args, **options):
+        if options["rebuild"]:
+            rebuildRollups()
+
+        while True:
+            total = 0
+            start = time.perf_counter()
+            while True:
+                folded = rollupStep(options["batch_size"])
+                if not folded:
+                    break
+                total += folded
+            elapsed = time.perf_counter() - start
+            if total or not options["loop"]:
+                self.stdout.write(f"Rolled up {total} bids in {elapsed:.1f}s.")
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
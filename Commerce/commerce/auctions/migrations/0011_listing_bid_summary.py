@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Cast, Coalesce
+
+
+def backfillBidSummary(apps, schema_editor):
+    # Same computation as the rebuildbidsummary command, frozen here so the
+    # migration does not follow later changes to the models
+    Listing = apps.get_model("auctions", "Listing")
+    Bid = apps.get_model("auctions", "Bid")
+    bids = Bid.objects.filter(listing=OuterRef("pk"))
+    bidCount = bids.order_by().values("listing").annotate(total=Count("pk")).values("total")
+    highBid = bids.order_by().values("listing").annotate(top=Max("amount")).values("top")
+    Listing.objects.update(
+        bid_count=Coalesce(Subquery(bidCount), 0),
+        high_bidder=Subquery(bids.order_by("-amount", "date").values("user")[:1]),
+        price=Coalesce(Cast(Subquery(highBid), models.IntegerField()), "price"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0010_alter_listing_category'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='bid_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='high_bidder',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='leading_listings', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['listing', '-amount'], name='bid_listing_amount_idx'),
+        ),
+        migrations.RunPython(backfillBidSummary, migrations.RunPython.noop),
+    ]
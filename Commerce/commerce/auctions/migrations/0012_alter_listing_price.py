@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0011_listing_bid_summary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='listing',
+            name='price',
+            field=models.DecimalField(decimal_places=2, max_digits=10),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0012_alter_listing_price'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='listing',
+            options={'ordering': ['-date', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['active', '-date', '-id'], name='listing_active_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['category', '-date', '-id'], name='listing_cat_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+from django.db import migrations
+
+# External-content FTS5 index over Listing.name and Listing.description.
+# Triggers keep it in sync for every write path, including bulk_create and
+# queryset updates that never fire model signals. The update trigger only
+# fires when the indexed columns change, so bids do not touch the index.
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE auctions_listing_fts USING fts5(
+        name, description,
+        content='auctions_listing', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER auctions_listing_fts_ai AFTER INSERT ON auctions_listing BEGIN
+        INSERT INTO auctions_listing_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER auctions_listing_fts_ad AFTER DELETE ON auctions_listing BEGIN
+        INSERT INTO auctions_listing_fts(auctions_listing_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER auctions_listing_fts_au AFTER UPDATE OF name, description ON auctions_listing BEGIN
+        INSERT INTO auctions_listing_fts(auctions_listing_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO auctions_listing_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    "INSERT INTO auctions_listing_fts(auctions_listing_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS auctions_listing_fts_au",
+    "DROP TRIGGER IF EXISTS auctions_listing_fts_ad",
+    "DROP TRIGGER IF EXISTS auctions_listing_fts_ai",
+    "DROP TABLE IF EXISTS auctions_listing_fts",
+]
+
+
+def runOnSqlite(statements):
+    # Other databases fall back to icontains in auctions.search
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0014_comment_keyset_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(runOnSqlite(CREATE_SQL), runOnSqlite(DROP_SQL)),
+    ]
@@ -0,0 +1,36 @@
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def fillSlugs(apps, schema_editor):
+    Category = apps.get_model("auctions", "Category")
+    taken = set()
+    for category in Category.objects.order_by("id"):
+        base = slugify(category.name) or "category"
+        slug, n = base, 2
+        while slug in taken:
+            slug, n = f"{base}-{n}", n + 1
+        taken.add(slug)
+        category.slug = slug
+        category.save(update_fields=["slug"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0015_listing_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(max_length=64, null=True),
+        ),
+        migrations.RunPython(fillSlugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(max_length=64, unique=True),
+        ),
+    ]
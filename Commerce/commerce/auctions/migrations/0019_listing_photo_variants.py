@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:46
+
+from django.db import migrations, models
+
+
+def queueExistingPhotos(apps, schema_editor):
+    # Photos linked before this migration get ingested by processphotos
+    Listing = apps.get_model("auctions", "Listing")
+    Listing.objects.exclude(photo__isnull=True).exclude(photo="").update(photo_status="pending")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0018_listing_end'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='detail',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='photo_status',
+            field=models.CharField(blank=True, choices=[('', 'No photo'), ('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, default='', max_length=8),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='photo_upload',
+            field=models.FileField(blank=True, null=True, upload_to='photos/incoming'),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='thumbnail',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+        migrations.RunPython(queueExistingPhotos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0019_listing_photo_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='last_comment',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
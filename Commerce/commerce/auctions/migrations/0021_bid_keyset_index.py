@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0020_listing_last_comment'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='bid',
+            options={'ordering': ['-date', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['listing', '-date', '-id'], name='bid_listing_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0021_bid_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32, unique=True)),
+                ('last_bid', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CategoryBidRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('bids', models.IntegerField(default=0)),
+                ('high', models.FloatField()),
+                ('total', models.FloatField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bid_rollups', to='auctions.category')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='category_rollup_hour_idx')],
+                'constraints': [models.UniqueConstraint(fields=('category', 'hour'), name='category_rollup_hour_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ListingBidRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('bids', models.IntegerField(default=0)),
+                ('high', models.FloatField()),
+                ('low', models.FloatField()),
+                ('total', models.FloatField(default=0)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bid_rollups', to='auctions.listing')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['hour'], name='listing_rollup_hour_idx')],
+                'constraints': [models.UniqueConstraint(fields=('listing', 'hour'), name='listing_rollup_hour_unique')],
+            },
+        ),
+    ]
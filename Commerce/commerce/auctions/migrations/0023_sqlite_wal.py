@@ -0,0 +1,31 @@
+from django.db import migrations
+
+
+# FUNCTION
+# NAME:        setJournalMode
+# DESCRIPTION: Function will build the migration step switching a SQLite
+#              file to a journal mode. The mode is stored in the file, so
+#              it is set once here instead of on every connection.
+# ARGUMENTS:   It needs the journal mode
+# OUTPUT:      It returns the function run by RunPython
+def setJournalMode(mode):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "sqlite":
+            return
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA journal_mode={mode}")
+    return run
+
+
+class Migration(migrations.Migration):
+
+    # The journal mode cannot change inside a transaction
+    atomic = False
+
+    dependencies = [
+        ('auctions', '0022_bid_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(setJournalMode("WAL"), setJournalMode("DELETE")),
+    ]
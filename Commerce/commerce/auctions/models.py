@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser
+from django.core.files.storage import default_storage
 from django.db import models
+from django.utils.text import slugify
 
 class User(AbstractUser):
     watchlist = models.ManyToManyField(
@@ -8,8 +10,27 @@ class User(AbstractUser):
         blank=True
     )
 
+    def get_session_auth_hash(self):
+        # Copies from the user cache carry the hash instead of the password,
+        # see auctions/users.py
+        cached = getattr(self, "session_auth_hash", None)
+        return cached if cached is not None else super().get_session_auth_hash()
+
 class Category(models.Model):
     name = models.CharField(max_length=64)
+    # Lowercase, indexed key used in the category urls
+    slug = models.SlugField(max_length=64, unique=True)
+
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            # Names slugifying alike get a numeric suffix, like the
+            # backfill of migration 0016
+            base = slugify(self.name)[:56] or "category"
+            slug, n = base, 2
+            while Category.objects.filter(slug=slug).exclude(pk=self.pk).exists():
+                slug, n = f"{base}-{n}", n + 1
+            self.slug = slug
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -18,11 +39,23 @@ class Listing(models.Model):
     id = models.BigAutoField(primary_key=True)
     name = models.CharField(max_length=64)
     description = models.TextField()
-    price = models.IntegerField()
+    price = models.DecimalField(max_digits=10, decimal_places=2)
     photo = models.URLField(
         blank = True,
         null=True
     )
+    # Photo uploaded with the form, kept until the variants are generated
+    photo_upload = models.FileField(upload_to="photos/incoming", blank=True, null=True)
+    # Storage names of the generated variants, named after the hash of the
+    # source image so they can be cached forever
+    thumbnail = models.CharField(max_length=200, blank=True, default="")
+    detail = models.CharField(max_length=200, blank=True, default="")
+    photo_status = models.CharField(max_length=8, blank=True, default="", db_index=True, choices=[
+        ("", "No photo"),
+        ("pending", "Pending"),
+        ("ready", "Ready"),
+        ("failed", "Failed"),
+    ])
     
     owner = models.ForeignKey(
         User, 
@@ -41,10 +74,51 @@ class Listing(models.Model):
     date = models.DateTimeField(auto_now_add=True)
     winner = models.ForeignKey(User, max_length=64, null=True, blank=True, on_delete=models.SET_NULL, related_name="won_listings")
     active = models.BooleanField(default=True)
+    # When the auction closes on its own, None lets it run until the owner
+    # closes it. Closed in batches by the closeexpired command.
+    end = models.DateTimeField(null=True, blank=True)
+
+    # Bid summary kept on the listing so the listing page never has to scan
+    # the Bid table. price holds the current high bid, these two hold the
+    # rest. Updated with the bid in bidListing, rebuilt by rebuildbidsummary.
+    high_bidder = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="leading_listings"
+    )
+    bid_count = models.IntegerField(default=0)
+    # Bumped on every change that shows on the listing card, so cached
+    # cards keyed by version never need to be deleted
+    version = models.IntegerField(default=0)
+    # Time of the newest comment, part of the ETag of the listing page
+    last_comment = models.DateTimeField(null=True, blank=True)
 
     class Meta:
-        ordering = ["-date"]
+        ordering = ["-date", "-id"]
+        # Back the keyset pagination of the listing grids
+        indexes = [
+            models.Index(fields=["active", "-date", "-id"], name="listing_active_date_id_idx"),
+            models.Index(fields=["category", "-date", "-id"], name="listing_cat_date_id_idx"),
+            models.Index(fields=["active", "end"], name="listing_active_end_idx"),
+        ]
     
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            self.version += 1
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = {*kwargs["update_fields"], "version"}
+        super().save(*args, **kwargs)
+
+    @property
+    def thumbnail_url(self):
+        return default_storage.url(self.thumbnail) if self.thumbnail else self.photo
+
+    @property
+    def detail_url(self):
+        return default_storage.url(self.detail) if self.detail else self.photo
+
     def __str__(self):
         return self.name
 
@@ -66,7 +140,12 @@ class Bid(models.Model):
     amount = models.FloatField()
 
     class Meta:
-        ordering = ["-date"]
+        ordering = ["-date", "-id"]
+        indexes = [
+            models.Index(fields=["listing", "-amount"], name="bid_listing_amount_idx"),
+            # Back the keyset pagination of the bid history in the API
+            models.Index(fields=["listing", "-date", "-id"], name="bid_listing_date_id_idx"),
+        ]
     
     def __str__(self):
          return f"{self.amount}"
@@ -86,7 +165,11 @@ class Comment(models.Model):
     )
 
     class Meta:
-        ordering = ["-date"]
+        ordering = ["-date", "-id"]
+        # Back the keyset pagination of the comments on the listing page
+        indexes = [
+            models.Index(fields=["listing", "-date", "-id"], name="comment_listing_date_id_idx"),
+        ]
 
     def __str__(self):
         return self.comment
@@ -94,3 +177,52 @@ class Comment(models.Model):
     date = models.DateTimeField(auto_now_add=True)
     comment = models.TextField()
 
+
+# Hourly bid rollups, filled from the Bid table by the rollupbids command
+# and read by auctions.analytics instead of aggregating raw bids
+class ListingBidRollup(models.Model):
+    listing = models.ForeignKey(
+        Listing,
+        models.CASCADE,
+        related_name = "bid_rollups"
+    )
+    hour = models.DateTimeField()
+    bids = models.IntegerField(default=0)
+    high = models.FloatField()
+    low = models.FloatField()
+    total = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["listing", "hour"], name="listing_rollup_hour_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["hour"], name="listing_rollup_hour_idx"),
+        ]
+
+class CategoryBidRollup(models.Model):
+    category = models.ForeignKey(
+        Category,
+        models.CASCADE,
+        related_name = "bid_rollups"
+    )
+    hour = models.DateTimeField()
+    bids = models.IntegerField(default=0)
+    high = models.FloatField()
+    total = models.FloatField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["category", "hour"], name="category_rollup_hour_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["hour"], name="category_rollup_hour_idx"),
+        ]
+
+# How far the rollups have read into the Bid table
+class RollupWatermark(models.Model):
+    name = models.CharField(max_length=32, unique=True)
+    last_bid = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_bid}"
@@ -0,0 +1,73 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+# Number of listings shown per page in the listing grids
+LISTINGS_PER_PAGE = 24
+
+# Number of comments shown per page on the listing page
+COMMENTS_PER_PAGE = 20
+
+# Number of results shown per page on the search page
+SEARCH_RESULTS_PER_PAGE = 20
+
+
+# FUNCTION
+# NAME:        encodeCursor
+# DESCRIPTION: Function will turn the (date, id) of the last row of a page
+#              into an opaque url-safe cursor
+# ARGUMENTS:   It needs the datetime and the id of the row
+# OUTPUT:      It returns the cursor string
+def encodeCursor(date, id):
+    raw = f"{date.isoformat()}|{id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+# FUNCTION
+# NAME:        decodeCursor
+# DESCRIPTION: Function will turn a cursor back into a (date, id) pair
+# ARGUMENTS:   It needs the cursor string
+# OUTPUT:      It returns the (date, id) tuple, or None if the cursor is
+#              missing or malformed
+def decodeCursor(cursor):
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        date, id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(date), int(id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+# FUNCTION
+# NAME:        keysetPage
+# DESCRIPTION: Function will return one page of a queryset ordered by
+#              (-date, -id), starting right after the cursor. It seeks with
+#              a WHERE on the composite key instead of an OFFSET, so every
+#              page costs the same no matter how deep it is.
+# ARGUMENTS:   It needs the queryset, the cursor (or None for the first
+#              page), and optionally the page size and the names of the date
+#              and id fields
+# OUTPUT:      It returns the rows of the page and the cursor of the next
+#              page, which is None on the last page
+def keysetPage(queryset, cursor, pageSize=LISTINGS_PER_PAGE, dateField="date", idField="id"):
+    queryset = queryset.order_by(f"-{dateField}", f"-{idField}")
+
+    position = decodeCursor(cursor)
+    if position is not None:
+        date, id = position
+        queryset = queryset.filter(
+            Q(**{f"{dateField}__lt": date}) | Q(**{dateField: date, f"{idField}__lt": id})
+        )
+
+    # Fetch one extra row to know if there is a next page
+    rows = list(queryset[:pageSize + 1])
+    nextCursor = None
+    if len(rows) > pageSize:
+        rows = rows[:pageSize]
+        last = rows[-1]
+        nextCursor = encodeCursor(getattr(last, dateField), getattr(last, idField))
+
+    return rows, nextCursor
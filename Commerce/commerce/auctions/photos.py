@@ -0,0 +1,294 @@
+import hashlib
+import http.client
+import io
+import ipaddress
+import logging
+import socket
+import threading
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from PIL import Image, UnidentifiedImageError
+
+from .models import Listing
+
+logger = logging.getLogger(__name__)
+
+# Largest source image accepted, uploaded or fetched
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+FETCH_TIMEOUT = 10
+
+# Bounding boxes of the generated variants, matching the sizes the index
+# cards and the listing page display them at
+VARIANTS = {
+    "thumb": (300, 250),
+    "detail": (800, 500),
+}
+
+
+class UnsafePhotoUrl(ValueError):
+    """
+    Raised when a photo url is not http(s) or points to an address the
+    server must not connect to.
+    """
+
+
+# FUNCTION
+# NAME:        allowedAddress
+# DESCRIPTION: Function will tell whether the server may fetch photos from
+#              an IP address: only public ones, and loopback when the
+#              AUCTIONS_PHOTO_ALLOW_LOOPBACK setting is on (for the tests)
+# ARGUMENTS:   It needs the address as a string
+# OUTPUT:      It returns True or False
+def allowedAddress(address):
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    if ip.is_loopback:
+        return getattr(settings, "AUCTIONS_PHOTO_ALLOW_LOOPBACK", False)
+    return ip.is_global
+
+
+# FUNCTION
+# NAME:        resolvePublic
+# DESCRIPTION: Function will resolve a host and refuse it if any of its
+#              addresses is not allowed
+# ARGUMENTS:   It needs the host and the port
+# OUTPUT:      It returns the getaddrinfo entries, or raises UnsafePhotoUrl
+def resolvePublic(host, port):
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise UnsafePhotoUrl(f"Cannot resolve {host}: {e}")
+    for *_, sockaddr in infos:
+        if not allowedAddress(sockaddr[0]):
+            raise UnsafePhotoUrl(f"{host} resolves to {sockaddr[0]}, which is not a public address.")
+    return infos
+
+
+# FUNCTION
+# NAME:        checkUrl
+# DESCRIPTION: Function will refuse a photo url that is not http(s) or whose
+#              host is not public
+# ARGUMENTS:   It needs the url
+# OUTPUT:      Nothing, it raises UnsafePhotoUrl
+def checkUrl(url):
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ("http", "https"):
+        raise UnsafePhotoUrl("Only http and https photo urls are supported.")
+    if not parts.hostname:
+        raise UnsafePhotoUrl("The photo url has no host.")
+    resolvePublic(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+
+
+# FUNCTION
+# NAME:        connectPublic
+# DESCRIPTION: Function will open the connection of a photo fetch to an
+#              address checked by resolvePublic, so a name resolving to a
+#              public address first and a private one later cannot get
+#              through. Same arguments as socket.create_connection.
+# ARGUMENTS:   It needs the (host, port) pair, the timeout and the source
+#              address
+# OUTPUT:      It returns the connected socket
+def connectPublic(address, timeout=socket._GLOBAL_DEFAULT_TIMEOUT, source_address=None, **kwargs):
+    host, port = address
+    error = None
+    for family, type, proto, _, sockaddr in resolvePublic(host, port):
+        sock = socket.socket(family, type, proto)
+        try:
+            if timeout is not socket._GLOBAL_DEFAULT_TIMEOUT:
+                sock.settimeout(timeout)
+            if source_address:
+                sock.bind(source_address)
+            sock.connect(sockaddr)
+            return sock
+        except OSError as e:
+            sock.close()
+            error = e
+    raise error
+
+
+class PublicHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = connectPublic
+
+
+class PublicHTTPSConnection(http.client.HTTPSConnection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._create_connection = connectPublic
+
+
+class PublicHTTPHandler(urllib.request.HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(PublicHTTPConnection, req)
+
+
+class PublicHTTPSHandler(urllib.request.HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(PublicHTTPSConnection, req, context=self._context)
+
+
+class CheckedRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """
+    Follows a few redirects, checking every new url like the first one.
+    """
+    max_redirections = 3
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        checkUrl(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+# FUNCTION
+# NAME:        photoOpener
+# DESCRIPTION: Function will build the opener of the photo fetches: http and
+#              https only, no proxies, every connection and redirect checked
+# ARGUMENTS:   None
+# OUTPUT:      It returns the urllib opener
+def photoOpener():
+    opener = urllib.request.OpenerDirector()
+    for handler in (
+        urllib.request.UnknownHandler(), urllib.request.HTTPDefaultErrorHandler(),
+        urllib.request.HTTPErrorProcessor(), CheckedRedirectHandler(),
+        PublicHTTPHandler(), PublicHTTPSHandler(),
+    ):
+        opener.add_handler(handler)
+    return opener
+
+
+# FUNCTION
+# NAME:        readSource
+# DESCRIPTION: Function will read the source image of a listing, from the
+#              uploaded file if there is one, from the photo url otherwise
+# ARGUMENTS:   It needs the listing
+# OUTPUT:      It returns the bytes of the image
+def readSource(listing):
+    if listing.photo_upload:
+        with listing.photo_upload.open("rb") as f:
+            data = f.read(MAX_SOURCE_BYTES + 1)
+    else:
+        # Never let a listing make the server read local files or reach
+        # addresses that are not public
+        checkUrl(listing.photo)
+        request = urllib.request.Request(listing.photo, headers={"User-Agent": "auctions-photo-ingest"})
+        with photoOpener().open(request, timeout=FETCH_TIMEOUT) as response:
+            data = response.read(MAX_SOURCE_BYTES + 1)
+    if len(data) > MAX_SOURCE_BYTES:
+        raise ValueError("Photo is too large.")
+    return data
+
+
+# FUNCTION
+# NAME:        makeVariant
+# DESCRIPTION: Function will scale an image down to fit a bounding box and
+#              encode it as JPEG
+# ARGUMENTS:   It needs the source bytes and the (width, height) box
+# OUTPUT:      It returns the JPEG bytes
+def makeVariant(data, size):
+    with Image.open(io.BytesIO(data)) as image:
+        image = image.convert("RGB")
+        image.thumbnail(size)
+        out = io.BytesIO()
+        image.save(out, "JPEG", quality=85, optimize=True)
+    return out.getvalue()
+
+
+# FUNCTION
+# NAME:        storeVariants
+# DESCRIPTION: Function will generate and store every variant of a source
+#              image under names derived from its SHA-256. The same image
+#              used by several listings is only processed once.
+# ARGUMENTS:   It needs the source bytes
+# OUTPUT:      It returns a dict of variant name to storage name
+def storeVariants(data):
+    digest = hashlib.sha256(data).hexdigest()
+    names = {}
+    for variant, size in VARIANTS.items():
+        name = f"photos/{digest[:2]}/{digest}-{variant}.jpg"
+        if not default_storage.exists(name):
+            default_storage.save(name, ContentFile(makeVariant(data, size)))
+        names[variant] = name
+    return names
+
+
+# FUNCTION
+# NAME:        ingestPhoto
+# DESCRIPTION: Function will fetch the photo of a listing, generate its
+#              variants and store their names on the listing. Bumps the
+#              version so the cached card picks up the thumbnail.
+# ARGUMENTS:   It needs the id of the listing
+# OUTPUT:      It returns a boolean stating if the variants are ready
+def ingestPhoto(listingId):
+    listing = Listing.objects.filter(pk=listingId).first()
+    if listing is None or not (listing.photo_upload or listing.photo):
+        return False
+
+    try:
+        names = storeVariants(readSource(listing))
+    # http.client errors such as a bad status line or a cut off body are
+    # not OSErrors
+    except (OSError, ValueError, http.client.HTTPException, UnidentifiedImageError,
+            Image.DecompressionBombError) as e:
+        logger.warning("Could not ingest the photo of listing %s: %s", listingId, e)
+        Listing.objects.filter(pk=listingId).update(photo_status="failed", version=F("version") + 1)
+        return False
+
+    Listing.objects.filter(pk=listingId).update(
+        thumbnail=names["thumb"],
+        detail=names["detail"],
+        photo_status="ready",
+        version=F("version") + 1,
+    )
+    # The variants replace the upload, no need to keep it around
+    if listing.photo_upload:
+        listing.photo_upload.delete(save=False)
+        Listing.objects.filter(pk=listingId).update(photo_upload=None)
+    return True
+
+
+executor = None
+executorLock = threading.Lock()
+
+
+# FUNCTION
+# NAME:        runJob
+# DESCRIPTION: Function will run one ingestion job on a worker thread with
+#              its own database connection
+# ARGUMENTS:   It needs the id of the listing
+# OUTPUT:      None
+def runJob(listingId):
+    close_old_connections()
+    try:
+        ingestPhoto(listingId)
+    except Exception:
+        logger.exception("Photo job for listing %s crashed", listingId)
+    finally:
+        close_old_connections()
+
+
+# FUNCTION
+# NAME:        enqueuePhoto
+# DESCRIPTION: Function will queue the photo of a listing for ingestion once
+#              the current transaction commits, so the request never waits
+#              for the download or the resizing. With AUCTIONS_PHOTO_WORKERS
+#              set to 0 nothing runs in process and the processphotos
+#              command does the work.
+# ARGUMENTS:   It needs the id of the listing
+# OUTPUT:      None
+def enqueuePhoto(listingId):
+    global executor
+    workers = getattr(settings, "AUCTIONS_PHOTO_WORKERS", 2)
+    if workers <= 0:
+        return
+    with executorLock:
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="photos")
+    transaction.on_commit(lambda: executor.submit(runJob, listingId))
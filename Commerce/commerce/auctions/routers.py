@@ -0,0 +1,75 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Alias of the read replica in settings.DATABASES
+REPLICA = "replica"
+
+# Set while a read-only view runs, it is a context variable so it follows
+# the request under both WSGI threads and ASGI tasks
+replicaReads = ContextVar("replicaReads", default=False)
+
+
+# FUNCTION
+# NAME:        readingReplica
+# DESCRIPTION: Context manager sending the reads made inside it to the
+#              replica. Writes still go to the primary.
+# ARGUMENTS:   None
+# OUTPUT:      None
+@contextmanager
+def readingReplica():
+    token = replicaReads.set(True)
+    try:
+        yield
+    finally:
+        replicaReads.reset(token)
+
+
+# FUNCTION
+# NAME:        replicaView
+# DESCRIPTION: Decorator running GET and HEAD requests of a view against the
+#              replica. Other methods read the primary, so a POST always sees
+#              the latest price. Put it above conditionalGet so the ETag
+#              lookups read the replica too.
+# ARGUMENTS:   It needs the view
+# OUTPUT:      It returns the wrapped view
+def replicaView(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return view(request, *args, **kwargs)
+        with readingReplica():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of replica views to the replica alias and everything
+    else to the primary. Without a replica configured everything goes to
+    the primary.
+    """
+
+    def replicaAvailable(self):
+        if REPLICA not in connections.settings:
+            return False
+        # Test runs mirror the replica onto the test copy of the primary
+        return connections[REPLICA].settings_dict["NAME"] != connections[DEFAULT_DB_ALIAS].settings_dict["NAME"]
+
+    def db_for_read(self, model, **hints):
+        if replicaReads.get() and self.replicaAvailable():
+            return REPLICA
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same rows
+        return {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, REPLICA}
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,169 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Listing
+from .pagination import SEARCH_RESULTS_PER_PAGE
+
+FTS_TABLE = "auctions_listing_fts"
+
+# Matches are wrapped in these control characters by snippet(), and turned
+# into <mark> tags only after the text has been escaped
+MARK_START = "\x02"
+MARK_END = "\x03"
+
+# Name matches weigh more than description matches in the ranking
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+
+TRIGGERS = {
+    "auctions_listing_fts_ai": f"""
+        CREATE TRIGGER auctions_listing_fts_ai AFTER INSERT ON auctions_listing BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END
+    """,
+    "auctions_listing_fts_ad": f"""
+        CREATE TRIGGER auctions_listing_fts_ad AFTER DELETE ON auctions_listing BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+        END
+    """,
+    "auctions_listing_fts_au": f"""
+        CREATE TRIGGER auctions_listing_fts_au AFTER UPDATE OF name, description ON auctions_listing BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description)
+            VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO {FTS_TABLE}(rowid, name, description)
+            VALUES (new.id, new.name, new.description);
+        END
+    """,
+}
+
+
+# FUNCTION
+# NAME:        ensureSearchIndex
+# DESCRIPTION: Function will put back the sync triggers of the FTS5 index if
+#              they are missing and rebuild the index in that case. SQLite
+#              migrations that alter auctions_listing copy it to a new table,
+#              which drops its triggers, so this runs after every migrate.
+# ARGUMENTS:   It needs the database connection
+# OUTPUT:      It returns a boolean stating if the index had to be repaired
+def ensureSearchIndex(connection):
+    if connection.vendor != "sqlite":
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        if cursor.fetchone() is None:
+            # The migration creating the index has not run yet
+            return False
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'auctions_listing'")
+        missing = set(TRIGGERS) - {name for name, in cursor.fetchall()}
+        for name in missing:
+            cursor.execute(TRIGGERS[name])
+        if missing:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return bool(missing)
+
+
+# FUNCTION
+# NAME:        ftsQuery
+# DESCRIPTION: Function will turn free text typed by a user into a safe FTS5
+#              MATCH expression. Every word is quoted, so operators and
+#              punctuation cannot break the query, and the last word matches
+#              as a prefix so results show up while typing.
+# ARGUMENTS:   It needs the text of the query
+# OUTPUT:      It returns the MATCH expression, or None if there are no words
+def ftsQuery(text):
+    words = re.findall(r"\w+", text or "")
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+# FUNCTION
+# NAME:        highlight
+# DESCRIPTION: Function will escape a snippet and turn the match markers
+#              into <mark> tags
+# ARGUMENTS:   It needs the snippet returned by SQLite
+# OUTPUT:      It returns safe HTML
+def highlight(snippet):
+    html = escape(snippet or "")
+    html = html.replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+    return mark_safe(html)
+
+
+# FUNCTION
+# NAME:        searchListings
+# DESCRIPTION: Function will search listings by name and description. On
+#              SQLite it uses the FTS5 index with BM25 ranking and snippets,
+#              elsewhere it falls back to icontains.
+# ARGUMENTS:   It needs the query text, and optionally the active state to
+#              filter on (True, False or None for both), a category id and
+#              the page number starting at 1
+# OUTPUT:      It returns a list of (listing, snippet) pairs and a boolean
+#              stating if there is a next page
+def searchListings(text, active=None, categoryId=None, page=1):
+    match = ftsQuery(text)
+    if match is None:
+        return [], False
+
+    pageSize = SEARCH_RESULTS_PER_PAGE
+    offset = (max(page, 1) - 1) * pageSize
+
+    if connection.vendor != "sqlite":
+        return searchListingsFallback(text, active, categoryId, offset, pageSize)
+
+    filters = ""
+    params = [MARK_START, MARK_END, match]
+    if active is not None:
+        filters += " AND l.active = %s"
+        params.append(active)
+    if categoryId is not None:
+        filters += " AND l.category_id = %s"
+        params.append(categoryId)
+    params += [pageSize + 1, offset]
+
+    sql = f"""
+        SELECT l.id, snippet({FTS_TABLE}, 1, %s, %s, '...', 16)
+        FROM {FTS_TABLE}
+        JOIN auctions_listing l ON l.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH %s{filters}
+        ORDER BY bm25({FTS_TABLE}, {NAME_WEIGHT}, {DESCRIPTION_WEIGHT})
+        LIMIT %s OFFSET %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    hasNext = len(rows) > pageSize
+    rows = rows[:pageSize]
+
+    # Load the listings of the page in one query and keep the ranked order
+    listings = Listing.objects.select_related("owner", "category").in_bulk([id for id, _ in rows])
+    return [(listings[id], highlight(snippet)) for id, snippet in rows if id in listings], hasNext
+
+
+# FUNCTION
+# NAME:        searchListingsFallback
+# DESCRIPTION: Function will search listings with icontains on databases
+#              without FTS5. Results are newest first and the snippet is the
+#              start of the description.
+# ARGUMENTS:   Same as searchListings, with the offset and page size
+# OUTPUT:      Same as searchListings
+def searchListingsFallback(text, active, categoryId, offset, pageSize):
+    listings = Listing.objects.select_related("owner", "category")
+    for word in re.findall(r"\w+", text):
+        listings = listings.filter(Q(name__icontains=word) | Q(description__icontains=word))
+    if active is not None:
+        listings = listings.filter(active=active)
+    if categoryId is not None:
+        listings = listings.filter(category_id=categoryId)
+
+    rows = list(listings[offset:offset + pageSize + 1])
+    return [(listing, escape(listing.description[:120])) for listing in rows[:pageSize]], len(rows) > pageSize
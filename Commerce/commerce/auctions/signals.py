@@ -0,0 +1,37 @@
+from django.contrib.auth.signals import user_logged_out
+from django.db import connections
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .categories import invalidateCategoryCounts
+from .models import Listing, User
+from .search import ensureSearchIndex
+from .users import invalidateUser
+
+
+# Listing saves cover the create form and admin edits. Closing an auction
+# goes through a queryset update, so closeAuction invalidates on its own.
+@receiver(post_save, sender=Listing)
+@receiver(post_delete, sender=Listing)
+def listingChanged(sender, **kwargs):
+    invalidateCategoryCounts()
+
+
+# Saving a user covers password changes. A new user can also reuse the id
+# of a deleted one, which must not inherit its cached copy.
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def userChanged(sender, instance, **kwargs):
+    invalidateUser(instance.pk)
+
+
+@receiver(user_logged_out)
+def userLoggedOut(sender, request, user, **kwargs):
+    if user is not None:
+        invalidateUser(user.pk)
+
+
+@receiver(post_migrate)
+def repairSearchIndex(sender, using, **kwargs):
+    if sender.name == "auctions":
+        ensureSearchIndex(connections[using])
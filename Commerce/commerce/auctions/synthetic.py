@@ -0,0 +1,265 @@
+import bisect
+import itertools
+import random
+import time
+from datetime import timedelta, timezone
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils.text import slugify
+
+from .categories import invalidateCategoryCounts
+from .models import Bid, Category, Comment, Listing, User
+
+ADJECTIVES = ["vintage", "antique", "rare", "handmade", "modern", "classic", "signed", "mint", "used", "restored"]
+MATERIALS = ["wooden", "brass", "leather", "silver", "glass", "ceramic", "cotton", "steel", "oak", "marble"]
+THINGS = ["chess set", "clock", "camera", "guitar", "lamp", "watch", "vase", "bicycle", "desk", "broom",
+          "teapot", "radio", "typewriter", "mirror", "rug", "painting", "jacket", "bookcase", "compass", "kettle"]
+REMARKS = ["Is this still available?", "Does it ship abroad?", "Any scratches?", "What are the dimensions?",
+           "Great price!", "Can you send more photos?", "Is the original box included?", "Works perfectly?"]
+
+
+# FUNCTION
+# NAME:        zipfWeights
+# DESCRIPTION: Function will build the cumulative Zipf weights of n ranks,
+#              rank 1 being the most popular, for random.choices
+# ARGUMENTS:   It needs the number of ranks and the exponent
+# OUTPUT:      It returns the list of cumulative weights
+def zipfWeights(n, exponent):
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, n + 1)))
+
+
+# FUNCTION
+# NAME:        drawCount
+# DESCRIPTION: Function will round an expected count up or down at random,
+#              so the totals over many listings come out right
+# ARGUMENTS:   It needs the random generator and the expected count
+# OUTPUT:      It returns the count
+def drawCount(rng, expected):
+    whole = int(expected)
+    return whole + (1 if rng.random() < expected - whole else 0)
+
+
+class SyntheticData:
+    """
+    Generates users, categories, listings, bids, comments and watchlists
+    from a seed. The same seed and sizes always give the same rows,
+    whatever the batch size. Popularity follows a Zipf law: a few listings
+    get most of the bids, comments and watchers, and a few users do most
+    of the selling and bidding.
+
+    Users, categories and listings go through bulk_create. Bids, comments
+    and watchlist rows, the big tables, are written with executemany on
+    the raw cursor. Listings are inserted first and get their bid summary
+    columns in one UPDATE per listing once their bids are written.
+    """
+
+    def __init__(self, seed, now, days=90, exponent=1.1, batchSize=10000, prefix="gen", out=None):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.now = now
+        self.start = now - timedelta(days=days)
+        self.exponent = exponent
+        self.batchSize = batchSize
+        self.prefix = prefix
+        self.out = out
+        self.counts = {}
+        self.elapsed = {}
+
+    def generate(self, users, categories, listings, bids, comments, watchlist):
+        if connection.vendor == "sqlite" and not connection.in_atomic_block:
+            # Generated data can be generated again, no need to wait for
+            # the disk on every commit. Only lasts for this connection.
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA synchronous=OFF")
+        with transaction.atomic():
+            self.timed("users", self.makeUsers, users)
+            self.timed("categories", self.makeCategories, categories)
+        self.timed("listings, bids and comments", self.makeListings, listings, bids, comments)
+        self.timed("watchlist", self.makeWatchlists, watchlist)
+        invalidateCategoryCounts()
+        return self.counts, self.elapsed
+
+    def timed(self, name, step, *args):
+        before = sum(self.counts.values())
+        start = time.perf_counter()
+        step(*args)
+        self.elapsed[name] = time.perf_counter() - start
+        if self.out is not None:
+            rows = sum(self.counts.values()) - before
+            self.out(f"{name}: {rows} rows in {self.elapsed[name]:.1f}s "
+                     f"({rows / max(self.elapsed[name], 1e-9):.0f} rows/s)")
+
+    def makeUsers(self, total):
+        # Hashing every password would take hours, they all share this one
+        password = make_password("password")
+        ids = []
+        for offset in range(0, total, self.batchSize):
+            batch = [
+                User(
+                    username=f"{self.prefix}user{i}", email=f"{self.prefix}user{i}@example.com",
+                    password=password, date_joined=self.start,
+                )
+                for i in range(offset, min(total, offset + self.batchSize))
+            ]
+            ids += [user.id for user in User.objects.bulk_create(batch)]
+        self.userIds = ids
+        self.userWeights = zipfWeights(len(ids), self.exponent)
+        self.counts["users"] = total
+
+    def makeCategories(self, total):
+        names = [f"{self.prefix.title()} category {i}" for i in range(total)]
+        # bulk_create skips Category.save, which fills the slug
+        Category.objects.bulk_create(
+            [Category(name=name, slug=slugify(name)) for name in names], ignore_conflicts=True
+        )
+        self.categories = list(Category.objects.filter(name__in=names).order_by("id"))
+        self.categoryWeights = zipfWeights(len(self.categories), self.exponent)
+        self.counts["categories"] = total
+
+    def pickUser(self, rng, exclude=None):
+        # What random.choices does, without building a list per pick
+        userId = self.userIds[bisect.bisect(self.userWeights, rng.random() * self.userWeights[-1])]
+        if userId == exclude:
+            userId = self.userIds[rng.randrange(len(self.userIds))]
+        return userId
+
+    def makeListings(self, total, totalBids, totalComments):
+        # Shuffled, so the hot listings are spread over time
+        ranks = list(range(1, total + 1))
+        self.rng.shuffle(ranks)
+        norm = zipfWeights(total, self.exponent)[-1] if total else 1
+        self.byRank = [0] * total
+        self.counts.update({"listings": 0, "bids": 0, "comments": 0})
+        span = (self.now - self.start).total_seconds()
+
+        bidRows, commentRows = [], []
+        for offset in range(0, total, self.batchSize):
+            chunk = range(offset, min(total, offset + self.batchSize))
+            with transaction.atomic():
+                listings, dates, rngs = [], [], []
+                for i in chunk:
+                    # One generator per listing, seeded from its position, so
+                    # the batch size cannot change the order of the draws
+                    rng = random.Random(f"{self.seed}:{i}")
+                    rngs.append(rng)
+                    date = self.start + timedelta(seconds=span * (i + rng.random()) / total)
+                    dates.append(date)
+                    listings.append(Listing(
+                        name=f"{rng.choice(ADJECTIVES).title()} {rng.choice(MATERIALS)} "
+                             f"{rng.choice(THINGS)}",
+                        description=f"A {rng.choice(ADJECTIVES)} {rng.choice(THINGS)} "
+                                    f"in {rng.choice(['good', 'great', 'fair'])} condition.",
+                        price=Decimal(rng.randint(1, 200)),
+                        owner_id=self.pickUser(rng),
+                        category=rng.choices(self.categories, cum_weights=self.categoryWeights)[0],
+                        end=date + timedelta(days=rng.uniform(1, 14)),
+                    ))
+                # date is auto_now_add, so bulk_create stamps every row with
+                # the current time. The real dates go in with the summaries.
+                Listing.objects.bulk_create(listings)
+                summaries = []
+                for i, listing, date, rng in zip(chunk, listings, dates, rngs):
+                    rank = ranks[i]
+                    self.byRank[rank - 1] = listing.id
+                    share = (1 / rank ** self.exponent) / norm
+                    summaries.append(self.fillListing(
+                        listing, date, rng, drawCount(rng, totalBids * share), drawCount(rng, totalComments * share),
+                        bidRows, commentRows,
+                    ))
+                self.flush(bidRows, commentRows, force=True)
+                self.updateListings(summaries)
+            self.counts["listings"] += len(listings)
+
+    def fillListing(self, listing, opened, rng, bidCount, commentCount, bidRows, commentRows):
+        adapt = connection.ops.adapt_datetimefield_value
+        closes = min(listing.end, self.now)
+        window = max((closes - opened).total_seconds(), 1)
+        # Naive UTC dates skip the time zone conversion of every row
+        opened = opened.astimezone(timezone.utc).replace(tzinfo=None)
+        amount = float(listing.price)
+        # Raises grow with the starting price, not the current one, so the
+        # hottest listings stay within the price column
+        raiseTo = amount * 0.1
+        highBidder = None
+
+        # Bids in increasing time and amount, each one in its own slice of
+        # the auction so they stay ordered without sorting
+        for k in range(bidCount):
+            highBidder = self.pickUser(rng, exclude=listing.owner_id)
+            amount = round(amount + max(0.01, rng.uniform(0.1, 1) * raiseTo), 2)
+            date = opened + timedelta(seconds=window * (k + rng.random()) / bidCount)
+            bidRows.append((highBidder, listing.id, adapt(date), amount))
+            self.flush(bidRows, commentRows)
+
+        lastComment = None
+        for k in range(commentCount):
+            lastComment = opened + timedelta(seconds=window * (k + rng.random()) / commentCount)
+            commentRows.append((self.pickUser(rng), listing.id, adapt(lastComment), rng.choice(REMARKS)))
+            self.flush(bidRows, commentRows)
+
+        active = listing.end > self.now
+        return (
+            adapt(opened),
+            Decimal(str(amount)).quantize(Decimal("0.01")) if bidCount else listing.price,
+            highBidder,
+            None if active else highBidder,
+            active,
+            bidCount,
+            adapt(lastComment) if lastComment else None,
+            listing.id,
+        )
+
+    def flush(self, bidRows, commentRows, force=False):
+        if bidRows and (force or len(bidRows) >= self.batchSize):
+            self.insertRows(Bid, ["user", "listing", "date", "amount"], bidRows)
+            self.counts["bids"] += len(bidRows)
+            bidRows.clear()
+        if commentRows and (force or len(commentRows) >= self.batchSize):
+            self.insertRows(Comment, ["user", "listing", "date", "comment"], commentRows)
+            self.counts["comments"] += len(commentRows)
+            commentRows.clear()
+
+    def insertRows(self, model, fields, rows):
+        columns = ", ".join(connection.ops.quote_name(model._meta.get_field(f).column) for f in fields)
+        placeholders = ", ".join(["%s"] * len(fields))
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {connection.ops.quote_name(model._meta.db_table)} ({columns}) VALUES ({placeholders})",
+                rows,
+            )
+
+    def updateListings(self, summaries):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"UPDATE {connection.ops.quote_name(Listing._meta.db_table)} SET date = %s, price = %s, "
+                "high_bidder_id = %s, winner_id = %s, active = %s, bid_count = %s, last_comment = %s "
+                "WHERE id = %s",
+                summaries,
+            )
+
+    def makeWatchlists(self, mean):
+        through = User.watchlist.through
+        rows = []
+        self.counts["watchlist"] = 0
+        if not self.byRank or not mean:
+            return
+        listingWeights = zipfWeights(len(self.byRank), self.exponent)
+        for userId in self.userIds:
+            size = min(len(self.byRank), int(self.rng.expovariate(1 / mean)))
+            picked = set()
+            for rankIndex in self.rng.choices(range(len(self.byRank)), cum_weights=listingWeights, k=size):
+                picked.add(self.byRank[rankIndex])
+            rows += [(userId, listingId) for listingId in sorted(picked)]
+            if len(rows) >= self.batchSize:
+                self.insertWatchlist(through, rows)
+        self.insertWatchlist(through, rows)
+
+    def insertWatchlist(self, through, rows):
+        if not rows:
+            return
+        with transaction.atomic():
+            self.insertRows(through, ["user", "listing"], rows)
+        self.counts["watchlist"] += len(rows)
+        rows.clear()
@@ -0,0 +1,10 @@
+from django import template
+
+from auctions.cards import renderCard
+
+register = template.Library()
+
+
+@register.simple_tag
+def listingCard(listing, watched):
+    return renderCard(listing, listing.id in watched)
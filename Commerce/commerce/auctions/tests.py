@@ -1,3 +1,992 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from .bids import placeBid, closeAuction, TOO_LOW, CLOSED
+from .cards import CARD_CACHE, cardCacheStats, resetCardCacheStats
+from .categories import categoryCounts
+from .hashing import offloadHashing
+from .live import LocalBroker, getBroker, listingChannel
+from .analytics import bidsPerHour, mostContestedCategories, priceOverTime, rollupStep
+from .models import User, Listing, Category, Bid, Comment, ListingBidRollup
+from .pagination import LISTINGS_PER_PAGE, COMMENTS_PER_PAGE
+from .photos import UnsafePhotoUrl, allowedAddress, checkUrl, ingestPhoto
+from .routers import REPLICA, ReplicaRouter, readingReplica, replicaReads, replicaView
+from .search import searchListings
+from .throttle import TokenBuckets, resetThrottles
+from .users import USER_CACHE, userKey
+from .watchlist import isWatched
+
+
+class ListingBidSummaryTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", "owner@example.com", "pass")
+        self.bidder = User.objects.create_user("bidder", "bidder@example.com", "pass")
+        self.category = Category.objects.create(name="Toys")
+        self.listing = Listing.objects.create(
+            name="Broom", description="Flies", price=10,
+            owner=self.owner, category=self.category
+        )
+        self.other = Listing.objects.create(
+            name="Cauldron", description="Bubbles", price=5,
+            owner=self.owner, category=self.category
+        )
+
+    def addBids(self, listing, total, start):
+        Bid.objects.bulk_create([
+            Bid(user=self.bidder, listing=listing, amount=start + i)
+            for i in range(total)
+        ])
+
+    def test_bid_updates_summary(self):
+        self.client.force_login(self.bidder)
+        self.client.post(reverse("listing", args=[self.listing.id]), {"bid": "25"})
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.price, 25)
+        self.assertEqual(self.listing.bid_count, 1)
+        self.assertEqual(self.listing.high_bidder, self.bidder)
+
+    def test_close_uses_listing_high_bidder(self):
+        # A higher bid on another listing must not decide this winner
+        self.addBids(self.other, 1, 1000)
+        self.client.force_login(self.bidder)
+        self.client.post(reverse("listing", args=[self.listing.id]), {"bid": "25"})
+        self.client.force_login(self.owner)
+        self.client.post(reverse("listing", args=[self.listing.id]), {"close": "close"})
+        self.listing.refresh_from_db()
+        self.assertFalse(self.listing.active)
+        self.assertEqual(self.listing.winner, self.bidder)
+
+    def test_rebuild_command(self):
+        self.addBids(self.listing, 3, 20)
+        call_command("rebuildbidsummary", stdout=StringIO())
+        self.listing.refresh_from_db()
+        self.other.refresh_from_db()
+        self.assertEqual(self.listing.bid_count, 3)
+        self.assertEqual(self.listing.price, 22)
+        self.assertEqual(self.listing.high_bidder, self.bidder)
+        self.assertEqual(self.other.bid_count, 0)
+        self.assertEqual(self.other.price, 5)
+        self.assertIsNone(self.other.high_bidder)
+
+    def test_listing_page_queries_flat_as_bids_grow(self):
+        # Millions of rows are too slow for the test suite, but the page must
+        # not issue more queries with a full Bid table than with an empty one
+        url = reverse("listing", args=[self.listing.id])
+        with self.assertNumQueries(3):
+            self.client.get(url)
+        self.addBids(self.listing, 500, 20)
+        self.addBids(self.other, 5000, 20)
+        call_command("rebuildbidsummary", stdout=StringIO())
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.context["bidCount"], 500)
+
+
+class PlaceBidTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", "owner@example.com", "pass")
+        self.bidder = User.objects.create_user("bidder", "bidder@example.com", "pass")
+        self.listing = Listing.objects.create(
+            name="Broom", description="Flies", price=10, owner=self.owner
+        )
+
+    def test_accepts_higher_bid(self):
+        result = placeBid(self.listing.id, self.bidder, Decimal("10.50"))
+        self.assertTrue(result.accepted)
+        self.assertEqual(result.price, Decimal("10.50"))
+        self.assertEqual(result.bidCount, 1)
+        self.assertEqual(Bid.objects.count(), 1)
+
+    def test_rejects_equal_or_lower_bid(self):
+        placeBid(self.listing.id, self.bidder, 12)
+        result = placeBid(self.listing.id, self.owner, 12)
+        self.assertFalse(result.accepted)
+        self.assertEqual(result.message, TOO_LOW)
+        self.assertEqual(result.bidCount, 1)
+        self.assertEqual(Bid.objects.count(), 1)
+
+    def test_rejects_bid_on_closed_listing(self):
+        placeBid(self.listing.id, self.bidder, 12)
+        self.assertTrue(closeAuction(self.listing.id))
+        self.assertFalse(closeAuction(self.listing.id))
+        result = placeBid(self.listing.id, self.owner, 50)
+        self.assertFalse(result.accepted)
+        self.assertEqual(result.message, CLOSED)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.winner, self.bidder)
+
+
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", "owner@example.com", "pass")
+        Listing.objects.bulk_create([
+            Listing(name=f"Item {i}", description="Thing", price=1,
+                    owner=self.owner, active=i % 5 != 0)
+            for i in range(60)
+        ])
+
+    def test_index_walks_every_active_listing_once(self):
+        seen = []
+        url = reverse("index")
+        cursor = None
+        while True:
+            response = self.client.get(url, {"after": cursor} if cursor else {})
+            seen += [listing.id for listing in response.context["listings"]]
+            cursor = response.context["nextCursor"]
+            if cursor is None:
+                break
+        active = Listing.objects.filter(active=True).values_list("id", flat=True)
+        self.assertEqual(sorted(seen), sorted(active))
+        self.assertEqual(len(seen), len(set(seen)))
+
+    def test_bad_cursor_returns_first_page(self):
+        response = self.client.get(reverse("index"), {"after": "not-a-cursor"})
+        self.assertEqual(len(response.context["listings"]), LISTINGS_PER_PAGE)
+
+
+class ListingDetailQueryBudgetTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", "owner@example.com", "pass")
+        self.category = Category.objects.create(name="Toys")
+        self.listing = Listing.objects.create(
+            name="Broom", description="Flies", price=10,
+            owner=self.owner, category=self.category
+        )
+        self.url = reverse("listing", args=[self.listing.id])
+
+    def addComments(self, total):
+        users = User.objects.bulk_create([
+            User(username=f"commenter{Comment.objects.count()}-{i}") for i in range(total)
+        ])
+        Comment.objects.bulk_create([
+            Comment(user=user, listing=self.listing, comment="Nice") for user in users
+        ])
+
+    def test_anonymous_budget_independent_of_comments(self):
+        for total in (0, 5, 100):
+            self.addComments(total)
+            # ETag check, listing with owner and category, comments
+            with self.assertNumQueries(3):
+                response = self.client.get(self.url)
+            self.assertContains(response, "owner")
+
+    def test_logged_in_budget_independent_of_comments(self):
+        self.client.force_login(self.owner)
+        # Loads the user into the cache
+        self.client.get(self.url)
+        for total in (0, 5, 100):
+            self.addComments(total)
+            # ETag check, watchlist, listing, comments. The session and the
+            # user come from the cache.
+            with self.assertNumQueries(4):
+                self.client.get(self.url)
+
+    def test_comments_are_paginated(self):
+        self.addComments(COMMENTS_PER_PAGE + 5)
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.context["comments"]), COMMENTS_PER_PAGE)
+        response = self.client.get(self.url, {"comments": response.context["nextComments"]})
+        self.assertEqual(len(response.context["comments"]), 5)
+        self.assertIsNone(response.context["nextComments"])
+
+    def test_missing_listing_is_404(self):
+        response = self.client.get(reverse("listing", args=[999999]))
+        self.assertEqual(response.status_code, 404)
+
+
+class WatchlistLookupTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", "owner@example.com", "pass")
+        self.watcher = User.objects.create_user("watcher", "watcher@example.com", "pass")
+        self.listings = Listing.objects.bulk_create([
+            Listing(name=f"Item {i}", description="Thing", price=1, owner=self.owner)
+            for i in range(10)
+        ])
+        self.watcher.watchlist.add(*self.listings[:3])
+
+    def test_is_watched(self):
+        self.assertTrue(isWatched(self.watcher, self.listings[0]))
+        self.assertFalse(isWatched(self.watcher, self.listings[5]))
+        self.assertFalse(isWatched(self.owner, self.listings[0]))
+
+    def test_index_marks_watched_listings_in_one_query(self):
+        self.client.force_login(self.watcher)
+        self.client.get(reverse("index"))
+        # ETag check, watched ids, listings
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse("index"))
+        self.assertEqual(response.context["watched"], {l.id for l in self.listings[:3]})
+        self.assertContains(response, "In your watchlist", count=3)
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", "owner@example.com", "pass")
+        self.toys = Category.objects.create(name="Toys")
+        self.broom = Listing.objects.create(
+            name="Flying broom", description="A broom that flies <fast>", price=10,
+            owner=self.owner, category=self.toys
+        )
+        self.mop = Listing.objects.create(
+            name="Mop", description="Cleans floors better than any broom", price=5,
+            owner=self.owner, active=False
+        )
+
+    def ids(self, results):
+        return [listing.id for listing, _ in results]
+
+    def test_name_matches_rank_first(self):
+        results, hasNext = searchListings("broom")
+        self.assertEqual(self.ids(results), [self.broom.id, self.mop.id])
+        self.assertFalse(hasNext)
+
+    def test_snippet_is_highlighted_and_escaped(self):
+        results, _ = searchListings("flies")
+        self.assertIn("<mark>flies</mark>", results[0][1])
+        self.assertIn("&lt;fast&gt;", results[0][1])
+
+    def test_filters(self):
+        self.assertEqual(self.ids(searchListings("broom", active=False)[0]), [self.mop.id])
+        self.assertEqual(self.ids(searchListings("broom", categoryId=self.toys.id)[0]), [self.broom.id])
+
+    def test_index_follows_edits_and_deletes(self):
+        Listing.objects.filter(pk=self.mop.pk).update(description="Cleans floors")
+        self.assertEqual(self.ids(searchListings("broom")[0]), [self.broom.id])
+        self.broom.delete()
+        self.assertEqual(searchListings("broom")[0], [])
+
+    def test_operators_in_query_are_harmless(self):
+        self.assertEqual(searchListings('"flying* (broom')[0][0][0], self.broom)
+        self.assertEqual(searchListings("")[0], [])
+
+    def test_search_page(self):
+        response = self.client.get(reverse("search"), {"q": "bro", "active": "active"})
+        self.assertContains(response, "Flying broom")
+        self.assertNotContains(response, "Mop")
+
+
+class CategoryTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user("owner", "owner@example.com", "pass")
+        self.toys = Category.objects.create(name="Board Games")
+        self.listing = Listing.objects.create(
+            name="Chess", description="Wooden", price=10,
+            owner=self.owner, category=self.toys
+        )
+
+    def test_slug_is_generated(self):
+        self.assertEqual(self.toys.slug, "board-games")
+
+    def test_clashing_slugs_get_a_suffix(self):
+        self.assertEqual(Category.objects.create(name="Board: Games").slug, "board-games-2")
+        self.assertEqual(Category.objects.create(name="Élan").slug, "elan")
+        self.assertEqual(Category.objects.create(name="日本").slug, "category")
+        self.assertEqual(Category.objects.create(name="中国").slug, "category-2")
+
+    def test_category_lookup_ignores_case(self):
+        response = self.client.get(reverse("category", args=["Board-Games"]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["title"], self.toys)
+
+    def test_category_page_budget(self):
+        Listing.objects.bulk_create([
+            Listing(name=f"Item {i}", description="Thing", price=1, owner=self.owner, category=self.toys)
+            for i in range(10)
+        ])
+        self.client.get(reverse("category", args=["board-games"]))
+        # ETag check (category, listing versions), category, listings
+        with self.assertNumQueries(4):
+            self.client.get(reverse("category", args=["board-games"]))
+
+    def test_unknown_category_is_404(self):
+        response = self.client.get(reverse("category", args=["nothing"]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_counts_are_cached_and_invalidated(self):
+        response = self.client.get(reverse("categories"))
+        self.assertContains(response, "(1)")
+        # Cached counts, only the category list is read
+        with self.assertNumQueries(1):
+            self.client.get(reverse("categories"))
+
+        Listing.objects.create(name="Go", description="Stones", price=5, owner=self.owner, category=self.toys)
+        self.assertEqual(categoryCounts()[self.toys.id], 2)
+        closeAuction(self.listing.id)
+        self.assertEqual(categoryCounts()[self.toys.id], 1)
+
+
+class ListingCardCacheTests(TestCase):
+
+    def setUp(self):
+        caches[CARD_CACHE].clear()
+        resetCardCacheStats()
+        self.owner = User.objects.create_user("owner", "owner@example.com", "pass")
+        self.bidder = User.objects.create_user("bidder", "bidder@example.com", "pass")
+        self.listing = Listing.objects.create(
+            name="Broom", description="Flies", price=10, owner=self.owner
+        )
+
+    def test_second_render_is_a_hit(self):
+        self.client.get(reverse("index"))
+        self.client.get(reverse("index"))
+        self.assertEqual(cardCacheStats()["hits"], 1)
+        self.assertEqual(cardCacheStats()["misses"], 1)
+
+    def test_bid_close_and_edit_refresh_the_card(self):
+        self.assertContains(self.client.get(reverse("index")), "10.00")
+        placeBid(self.listing.id, self.bidder, 42)
+        self.assertContains(self.client.get(reverse("index")), "42.00")
+
+        self.listing.refresh_from_db()
+        self.listing.name = "Fast broom"
+        self.listing.save()
+        self.assertContains(self.client.get(reverse("index")), "Fast broom")
+
+        version = Listing.objects.get(pk=self.listing.pk).version
+        closeAuction(self.listing.id)
+        self.assertEqual(Listing.objects.get(pk=self.listing.pk).version, version + 1)
+
+
+class LiveUpdateTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", "owner@example.com", "pass")
+        self.bidder = User.objects.create_user("bidder", "bidder@example.com", "pass")
+        self.listing = Listing.objects.create(
+            name="Broom", description="Flies", price=10, owner=self.owner
+        )
+
+    def test_broker_delivers_across_threads(self):
+        broker = LocalBroker()
+
+        async def listen():
+            subscription = broker.subscribe("news")
+            thread = threading.Thread(target=broker.publish, args=("news", {"event": "bid"}))
+            thread.start()
+            message = await asyncio.wait_for(subscription.get(), 5)
+            subscription.close()
+            return message
+
+        self.assertEqual(asyncio.run(listen()), {"event": "bid"})
+        self.assertEqual(broker.subscriberCount(), 0)
+
+    def test_bid_and_close_are_published_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            placeBid(self.listing.id, self.bidder, 15)
+            closeAuction(self.listing.id)
+
+        async def listen():
+            subscription = getBroker().subscribe(listingChannel(self.listing.id))
+            for callback in callbacks:
+                callback()
+            messages = [await subscription.get(), await subscription.get()]
+            subscription.close()
+            return messages
+
+        bid, close = asyncio.run(listen())
+        self.assertEqual(bid, {"event": "bid", "data": {"price": "15.00", "bidCount": 1, "active": True}})
+        self.assertEqual(close["event"], "close")
+
+    def test_events_need_asgi(self):
+        response = self.client.get(reverse("listingEvents", args=[self.listing.id]))
+        self.assertEqual(response.status_code, 204)
+
+
+class AuctionEndTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", "owner@example.com", "pass")
+        self.bidder = User.objects.create_user("bidder", "bidder@example.com", "pass")
+        self.rival = User.objects.create_user("rival", "rival@example.com", "pass")
+        self.now = timezone.now()
+
+    def makeListing(self, end):
+        return Listing.objects.create(name="Broom", description="Flies", price=1, owner=self.owner, end=end)
+
+    def test_winners_come_from_each_listing_bids(self):
+        first = self.makeListing(self.now + timedelta(minutes=1))
+        second = self.makeListing(self.now + timedelta(minutes=1))
+        unsold = self.makeListing(self.now - timedelta(minutes=1))
+        running = self.makeListing(self.now + timedelta(days=1))
+        placeBid(first.id, self.bidder, 50)
+        placeBid(second.id, self.bidder, 5)
+        placeBid(second.id, self.rival, 6)
+        Listing.objects.filter(pk__in=[first.id, second.id]).update(end=self.now - timedelta(seconds=1))
+
+        call_command("closeexpired", "--batch-size", "2", stdout=StringIO())
+
+        winners = dict(Listing.objects.values_list("id", "winner"))
+        self.assertEqual(winners[first.id], self.bidder.id)
+        self.assertEqual(winners[second.id], self.rival.id)
+        self.assertIsNone(winners[unsold.id])
+        self.assertEqual(
+            set(Listing.objects.filter(active=True).values_list("id", flat=True)), {running.id}
+        )
+
+    def test_bids_after_end_are_rejected(self):
+        listing = self.makeListing(self.now - timedelta(seconds=1))
+        result = placeBid(listing.id, self.bidder, 50)
+        self.assertFalse(result.accepted)
+        self.assertEqual(result.message, CLOSED)
+
+    def test_end_must_be_in_the_future(self):
+        self.client.force_login(self.owner)
+        category = Category.objects.create(name="Toys")
+        response = self.client.post(reverse("create"), {
+            "name": "Broom", "description": "Flies", "price": "1",
+            "category": category.id, "end": "2000-01-01T10:00",
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Listing.objects.exists())
+
+
+class ImportListingsTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", "owner@example.com", "pass")
+        self.toys = Category.objects.create(name="Toys")
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+
+    def write(self, name, text):
+        path = os.path.join(self.dir, name)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_csv_import_with_rejects(self):
+        path = self.write("listings.csv",
+            "name,description,price,photo,category\n"
+            "Broom,Flies,10,,toys\n"
+            "Mop,Cleans,-1,,Toys\n"
+            "Wand,Sparkles,3.50,,Spells\n"
+            "Hat,Pointy,2,,\n"
+        )
+        call_command("importlistings", path, "--owner", "owner", "--batch-size", "1", stdout=StringIO())
+
+        self.assertEqual(
+            dict(Listing.objects.values_list("name", "category__name")),
+            {"Broom": "Toys"},
+        )
+        with open(path + ".rejects.jsonl") as f:
+            rejects = [json.loads(line) for line in f]
+        self.assertEqual([r["_line"] for r in rejects], [2, 3, 4])
+        self.assertIn("price", rejects[0]["_errors"])
+        self.assertIn("category", rejects[1]["_errors"])
+        # A category is required, like on the create form
+        self.assertIn("category", rejects[2]["_errors"])
+
+    def test_jsonl_resume(self):
+        path = self.write("listings.jsonl", "\n".join(json.dumps(
+            {"name": f"Item {i}", "description": "Thing", "price": i + 1, "category": "Toys"}
+        ) for i in range(5)))
+        call_command("importlistings", path, "--owner", "owner", "--start-line", "3", stdout=StringIO())
+        self.assertEqual(
+            sorted(Listing.objects.values_list("name", flat=True)), ["Item 2", "Item 3", "Item 4"]
+        )
+        self.assertEqual(searchListings("item")[0][0][0].owner, self.owner)
+
+    def test_resume_does_not_repeat_rejects(self):
+        path = self.write("listings.csv",
+            "name,description,price,photo,category\n"
+            "Broom,Flies,10,,Toys\n"
+            "Mop,Cleans,-1,,Toys\n"
+            "Wand,Sparkles,3.50,,Spells\n"
+        )
+        call_command("importlistings", path, "--owner", "owner", stdout=StringIO())
+        call_command("importlistings", path, "--owner", "owner", "--start-line", "3", stdout=StringIO())
+        with open(path + ".rejects.jsonl") as f:
+            self.assertEqual([json.loads(line)["_line"] for line in f], [2, 3])
+
+
+class PhotoIngestionTests(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        override = override_settings(MEDIA_ROOT=self.media, AUCTIONS_PHOTO_WORKERS=0, AUCTIONS_PHOTO_ALLOW_LOOPBACK=True)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.owner = User.objects.create_user("owner", "owner@example.com", "pass")
+        self.category = Category.objects.create(name="Toys")
+        self.png = self.makeImage(1600, 1200)
+
+        # Local stand-in for the origin serving the photos
+        png = self.png
+
+        class Origin(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/redirect":
+                    self.send_response(302)
+                    self.send_header("Location", "http://169.254.169.254/latest/meta-data/")
+                    self.end_headers()
+                    return
+                if self.path == "/garbled":
+                    self.wfile.write(b"garbled\r\n\r\n")
+                    return
+                if self.path != "/broom.png":
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "image/png")
+                self.end_headers()
+                self.wfile.write(png)
+
+            def log_message(self, *args):
+                pass
+
+        self.origin = ThreadingHTTPServer(("127.0.0.1", 0), Origin)
+        threading.Thread(target=self.origin.serve_forever, daemon=True).start()
+        self.addCleanup(self.origin.server_close)
+        self.addCleanup(self.origin.shutdown)
+        self.baseUrl = f"http://127.0.0.1:{self.origin.server_port}"
+
+    def makeImage(self, width, height):
+        out = io.BytesIO()
+        Image.new("RGB", (width, height), "orange").save(out, "PNG")
+        return out.getvalue()
+
+    def makeListing(self, photo):
+        return Listing.objects.create(
+            name="Broom", description="Flies", price=1, owner=self.owner,
+            photo=photo, photo_status="pending"
+        )
+
+    def test_fetched_photo_gets_content_addressed_variants(self):
+        first = self.makeListing(f"{self.baseUrl}/broom.png")
+        second = self.makeListing(f"{self.baseUrl}/broom.png")
+        self.assertTrue(ingestPhoto(first.id))
+        self.assertTrue(ingestPhoto(second.id))
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        digest = hashlib.sha256(self.png).hexdigest()
+        self.assertEqual(first.photo_status, "ready")
+        self.assertEqual(first.thumbnail, f"photos/{digest[:2]}/{digest}-thumb.jpg")
+        self.assertEqual(first.thumbnail, second.thumbnail)
+        with Image.open(os.path.join(self.media, first.thumbnail)) as thumb:
+            self.assertLessEqual(thumb.size[0], 300)
+            self.assertLessEqual(thumb.size[1], 250)
+        self.assertContains(self.client.get(reverse("index")), first.thumbnail_url)
+
+    def test_broken_origin_marks_photo_failed(self):
+        listing = self.makeListing(f"{self.baseUrl}/missing.png")
+        with self.assertLogs("auctions.photos", "WARNING"):
+            self.assertFalse(ingestPhoto(listing.id))
+        listing.refresh_from_db()
+        self.assertEqual(listing.photo_status, "failed")
+        self.assertEqual(listing.thumbnail_url, listing.photo)
+
+    def test_private_addresses_are_refused(self):
+        for address in ["10.0.0.1", "192.168.1.1", "169.254.169.254", "::ffff:10.0.0.1", "fe80::1"]:
+            self.assertFalse(allowedAddress(address), address)
+        self.assertTrue(allowedAddress("93.184.216.34"))
+        with self.settings(AUCTIONS_PHOTO_ALLOW_LOOPBACK=False):
+            self.assertFalse(allowedAddress("127.0.0.1"))
+            listing = self.makeListing(f"{self.baseUrl}/broom.png")
+            with self.assertLogs("auctions.photos", "WARNING"):
+                self.assertFalse(ingestPhoto(listing.id))
+
+    def test_redirects_to_private_addresses_are_refused(self):
+        with self.assertRaises(UnsafePhotoUrl):
+            checkUrl("http://169.254.169.254/latest/meta-data/")
+        listing = self.makeListing(f"{self.baseUrl}/redirect")
+        with self.assertLogs("auctions.photos", "WARNING") as logs:
+            self.assertFalse(ingestPhoto(listing.id))
+        self.assertIn("169.254.169.254", "\n".join(logs.output))
+
+    def test_garbled_response_marks_photo_failed(self):
+        listing = self.makeListing(f"{self.baseUrl}/garbled")
+        with self.assertLogs("auctions.photos", "WARNING"):
+            self.assertFalse(ingestPhoto(listing.id))
+        listing.refresh_from_db()
+        self.assertEqual(listing.photo_status, "failed")
+
+    def test_command_goes_on_after_a_crash(self):
+        broken = self.makeListing(f"{self.baseUrl}/broom.png")
+        fine = self.makeListing(f"{self.baseUrl}/broom.png")
+        real = ingestPhoto
+
+        def crashing(id):
+            if id == broken.id:
+                raise RuntimeError("boom")
+            return real(id)
+
+        out, err = StringIO(), StringIO()
+        with mock.patch("auctions.management.commands.processphotos.ingestPhoto", crashing):
+            call_command("processphotos", "--workers", "1", stdout=out, stderr=err)
+        fine.refresh_from_db()
+        self.assertEqual(fine.photo_status, "ready")
+        self.assertIn(f"listing {broken.id} crashed", err.getvalue())
+        self.assertIn("1 ready, 1 failed", out.getvalue())
+
+    def test_upload_is_processed_by_command(self):
+        self.client.force_login(self.owner)
+        self.client.post(reverse("create"), {
+            "name": "Broom", "description": "Flies", "price": "1",
+            "category": self.category.id,
+            "upload": SimpleUploadedFile("broom.png", self.makeImage(400, 400), "image/png"),
+        })
+        listing = Listing.objects.get()
+        self.assertEqual(listing.photo_status, "pending")
+
+        call_command("processphotos", "--workers", "1", stdout=StringIO())
+        listing.refresh_from_db()
+        self.assertEqual(listing.photo_status, "ready")
+        self.assertFalse(listing.photo_upload)
+        self.assertTrue(os.path.exists(os.path.join(self.media, listing.detail)))
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", "owner@example.com", "pass")
+        self.bidder = User.objects.create_user("bidder", "bidder@example.com", "pass")
+        self.listing = Listing.objects.create(
+            name="Broom", description="Flies", price=10, owner=self.owner
+        )
+        self.url = reverse("listing", args=[self.listing.id])
+
+    def revalidate(self, url):
+        etag = self.client.get(url)["ETag"]
+        return etag, self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_listing_is_304_without_rendering(self):
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_bids_comments_and_watching_change_the_etag(self):
+        self.client.force_login(self.bidder)
+        etag, response = self.revalidate(self.url)
+        self.assertEqual(response.status_code, 304)
+
+        changes = [
+            lambda: placeBid(self.listing.id, self.bidder, 20),
+            lambda: self.client.post(self.url, {"comment": "Nice"}),
+            lambda: self.client.post(self.url, {"watchlist": "watchlist"}),
+        ]
+        for change in changes:
+            change()
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            etag = response["ETag"]
+
+    def test_etag_differs_per_user(self):
+        anonymous = self.client.get(self.url)["ETag"]
+        self.client.force_login(self.bidder)
+        self.assertNotEqual(self.client.get(self.url)["ETag"], anonymous)
+
+    def test_index_revalidates_until_a_card_changes(self):
+        etag, response = self.revalidate(reverse("index"))
+        self.assertEqual(response.status_code, 304)
+        placeBid(self.listing.id, self.bidder, 20)
+        response = self.client.get(reverse("index"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+
+class ApiTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", "owner@example.com", "pass")
+        self.bidder = User.objects.create_user("bidder", "bidder@example.com", "pass")
+        self.toys = Category.objects.create(name="Toys")
+        self.listings = [
+            Listing.objects.create(name=f"Item {i}", description="Thing", price=1,
+                                   owner=self.owner, category=self.toys)
+            for i in range(5)
+        ]
+        self.listing = self.listings[0]
+
+    def get(self, name, *args, **params):
+        response = self.client.get(reverse(name, args=args), params)
+        return response, response.json() if response.status_code == 200 else None
+
+    def test_grid_budget_and_sparse_fields(self):
+        with self.assertNumQueries(1):
+            response, data = self.get("apiListings", fields="id,name,owner,category", limit=2)
+        self.assertEqual(set(data["results"][0]), {"id", "name", "owner", "category"})
+        self.assertEqual(data["results"][0]["category"], {"name": "Toys", "slug": "toys"})
+
+        seen = [item["id"] for item in data["results"]]
+        while data["next"]:
+            data = self.client.get(data["next"]).json()
+            seen += [item["id"] for item in data["results"]]
+        self.assertEqual(sorted(seen), sorted(l.id for l in self.listings))
+
+    def test_detail(self):
+        with self.assertNumQueries(2):
+            response, data = self.get("apiListing", self.listing.id)
+        self.assertEqual(data["name"], "Item 0")
+        self.assertEqual(data["owner"], "owner")
+        self.assertEqual(self.get("apiListing", 999)[0].status_code, 404)
+        self.assertEqual(self.get("apiListing", self.listing.id, fields="nope")[0].status_code, 400)
+
+    def test_bids_and_comments_budget(self):
+        for amount in range(2, 30):
+            placeBid(self.listing.id, self.bidder, amount)
+        Comment.objects.bulk_create([
+            Comment(user=self.bidder, listing=self.listing, comment="Nice") for _ in range(30)
+        ])
+        for name in ("apiBids", "apiComments"):
+            # ETag check, listing exists, one page with users joined
+            with self.assertNumQueries(3):
+                response, data = self.get(name, self.listing.id)
+            self.assertEqual(data["results"][0]["user"], "bidder")
+            self.assertIsNotNone(data["next"])
+        self.assertEqual(self.get("apiBids", self.listing.id)[1]["results"][0]["amount"], 29)
+
+    def test_revalidation(self):
+        url = reverse("apiListing", args=[self.listing.id])
+        response = self.client.get(url)
+        self.assertIn("public", response["Cache-Control"])
+        with self.assertNumQueries(1):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, 304)
+        placeBid(self.listing.id, self.bidder, 5)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 200)
+
+        grid = self.client.get(reverse("apiListings"))
+        self.assertEqual(self.client.get(reverse("apiListings"), HTTP_IF_NONE_MATCH=grid["ETag"]).status_code, 304)
+
+    def test_read_only(self):
+        self.assertEqual(self.client.post(reverse("apiListings")).status_code, 405)
+
+
+class BidRollupTests(TestCase):
+
+    def setUp(self):
+        self.owner = User.objects.create_user("owner", "owner@example.com", "pass")
+        self.bidder = User.objects.create_user("bidder", "bidder@example.com", "pass")
+        self.toys = Category.objects.create(name="Toys")
+        self.tools = Category.objects.create(name="Tools")
+        self.broom = Listing.objects.create(name="Broom", description="Flies", price=1, owner=self.owner, category=self.toys)
+        self.hammer = Listing.objects.create(name="Hammer", description="Hits", price=1, owner=self.owner, category=self.tools)
+        self.start = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=5)
+
+    def addBids(self, listing, amounts, hour):
+        bids = Bid.objects.bulk_create([Bid(user=self.bidder, listing=listing, amount=a) for a in amounts])
+        Bid.objects.filter(pk__in=[b.pk for b in bids]).update(date=self.start + timedelta(hours=hour, minutes=10))
+
+    def test_incremental_rollups_match_raw_bids(self):
+        self.addBids(self.broom, [2, 3, 4], 0)
+        self.addBids(self.broom, [5], 1)
+        self.addBids(self.hammer, [2, 3], 1)
+        while rollupStep(batchSize=2):
+            pass
+
+        # Bids arriving later land in existing buckets
+        self.addBids(self.broom, [9, 7], 1)
+        self.assertEqual(rollupStep(), 2)
+        self.assertEqual(rollupStep(), 0)
+
+        end = self.start + timedelta(days=1)
+        self.assertEqual(bidsPerHour(self.start, end, listingId=self.broom.id), [
+            (self.start, 3), (self.start + timedelta(hours=1), 3),
+        ])
+        self.assertEqual([high for _, high in priceOverTime(self.broom.id)], [4, 9])
+        self.assertEqual(ListingBidRollup.objects.get(listing=self.broom, hour=self.start + timedelta(hours=1)).low, 5)
+        self.assertEqual(mostContestedCategories(self.start, end), [("Toys", 6), ("Tools", 2)])
+        self.assertEqual(
+            bidsPerHour(self.start, end, categoryId=self.tools.id), [(self.start + timedelta(hours=1), 2)]
+        )
+
+    def test_rebuild(self):
+        self.addBids(self.broom, [2, 3], 0)
+        call_command("rollupbids", stdout=StringIO())
+        Bid.objects.filter(amount=3).delete()
+        call_command("rollupbids", "--rebuild", stdout=StringIO())
+        self.assertEqual(ListingBidRollup.objects.get().bids, 1)
+
+
+class DatabaseRoutingTests(TestCase):
+
+    def test_connection_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute("PRAGMA synchronous")
+            # NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_router(self):
+        router = ReplicaRouter()
+        router.replicaAvailable = lambda: True
+        self.assertEqual(router.db_for_read(Listing), "default")
+        with readingReplica():
+            self.assertEqual(router.db_for_read(Listing), REPLICA)
+            self.assertEqual(router.db_for_write(Listing), "default")
+        self.assertFalse(router.allow_migrate(REPLICA, "auctions"))
+
+        # Without a replica configured everything stays on the primary
+        router.replicaAvailable = lambda: False
+        with readingReplica():
+            self.assertEqual(router.db_for_read(Listing), "default")
+
+    def test_only_safe_requests_read_the_replica(self):
+        seen = []
+        view = replicaView(lambda request: seen.append(replicaReads.get()) or HttpResponse())
+        factory = RequestFactory()
+        view(factory.get("/"))
+        view(factory.post("/"))
+        self.assertEqual(seen, [True, False])
+        self.assertFalse(replicaReads.get())
+
+
+class SessionCacheTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user("bidder", "bidder@example.com", "pass")
+        self.client.force_login(self.user)
+        self.url = reverse("watchlist")
+
+    def test_user_and_session_come_from_the_cache(self):
+        self.client.get(self.url)
+        self.assertIsNotNone(caches[USER_CACHE].get(userKey(self.user.id)))
+        # ETag check, watchlist
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_password_hash_is_not_cached(self):
+        self.client.get(self.url)
+        cached = caches[USER_CACHE].get(userKey(self.user.id))
+        self.assertNotIn("password", cached.__dict__)
+        self.assertEqual(cached.get_session_auth_hash(), self.user.get_session_auth_hash())
+        # Saving the cached copy keeps the password
+        cached.first_name = "Bea"
+        cached.save()
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("pass"))
+
+    def test_session_falls_back_to_the_database(self):
+        caches[USER_CACHE].clear()
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_password_change_logs_out(self):
+        self.client.get(self.url)
+        self.user.set_password("changed")
+        self.user.save()
+        self.assertIsNone(caches[USER_CACHE].get(userKey(self.user.id)))
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+    def test_logout_drops_the_cached_user(self):
+        self.client.get(self.url)
+        self.client.get(reverse("logout"))
+        self.assertIsNone(caches[USER_CACHE].get(userKey(self.user.id)))
+
+
+@override_settings(AUCTIONS_HASH_WORKERS=0, AUCTIONS_AUTH_THROTTLE={"ip": (3, 1 / 60), "username": (2, 1 / 60)})
+class CredentialThrottleTests(TestCase):
+
+    def setUp(self):
+        resetThrottles()
+        self.addCleanup(resetThrottles)
+        self.user = User.objects.create_user("bidder", "bidder@example.com", "pass")
+
+    def test_token_bucket(self):
+        bucket = TokenBuckets(2, 1)
+        self.assertEqual(bucket.take("a", now=0), 0)
+        self.assertEqual(bucket.take("a", now=0), 0)
+        self.assertEqual(bucket.take("a", now=0), 1)
+        self.assertEqual(bucket.take("b", now=0), 0)
+        self.assertEqual(bucket.take("a", now=1), 0)
+
+    def test_login(self):
+        response = self.client.post(reverse("login"), {"username": "bidder", "password": "pass"})
+        self.assertRedirects(response, reverse("index"))
+        self.assertEqual(int(self.client.session["_auth_user_id"]), self.user.id)
+
+    def test_login_throttled_per_username(self):
+        for _ in range(2):
+            response = self.client.post(reverse("login"), {"username": "Bidder", "password": "wrong"})
+            self.assertContains(response, "Invalid username")
+        response = self.client.post(reverse("login"), {"username": "bidder", "password": "pass"})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "60")
+
+    def test_register_throttled_per_ip(self):
+        for i in range(3):
+            response = self.client.post(reverse("register"), {
+                "username": f"new{i}", "email": "", "password": "pass", "confirmation": "pass",
+            })
+            self.assertEqual(response.status_code, 302)
+            self.client.logout()
+        response = self.client.post(reverse("register"), {
+            "username": "new3", "email": "", "password": "pass", "confirmation": "pass",
+        })
+        self.assertEqual(response.status_code, 429)
+        self.assertFalse(User.objects.filter(username="new3").exists())
+
+    @override_settings(AUCTIONS_HASH_WORKERS=1)
+    def test_hashing_pool(self):
+        encoded = asyncio.run(offloadHashing(make_password, "secret"))
+        self.assertTrue(check_password("secret", encoded))
+
+
+class SyntheticDataTests(TestCase):
+
+    def generate(self, prefix, batchSize):
+        call_command(
+            "generatedata", "--seed", "7", "--users", "30", "--categories", "4", "--listings", "60",
+            "--bids", "600", "--comments", "120", "--watchlist", "5", "--now", "2024-01-01",
+            "--prefix", prefix, "--batch-size", str(batchSize), stdout=StringIO(),
+        )
+
+    def test_summary_columns_match_the_bids(self):
+        self.generate("a", 50)
+        self.assertEqual(Bid.objects.count(), sum(Listing.objects.values_list("bid_count", flat=True)))
+        for listing in Listing.objects.filter(bid_count__gt=0):
+            top = listing.bids.order_by("-amount").first()
+            self.assertEqual(listing.bid_count, listing.bids.count())
+            self.assertAlmostEqual(float(listing.price), top.amount, places=2)
+            self.assertEqual(listing.high_bidder_id, top.user_id)
+            self.assertEqual(listing.high_bidder_id, listing.bids.order_by("-date").first().user_id)
+            self.assertTrue(listing.active or listing.winner_id == top.user_id)
+        # Popularity is skewed, the busiest listing has far more than its share
+        self.assertGreater(Listing.objects.order_by("-bid_count").first().bid_count, 60)
+
+    def test_same_seed_same_data(self):
+        def snapshot(ids):
+            return list(
+                Listing.objects.filter(id__in=ids).order_by("id")
+                .values_list("name", "price", "bid_count", "date", "end")
+            )
+
+        self.generate("a", 50)
+        first = set(Listing.objects.values_list("id", flat=True))
+        self.generate("b", 7)
+        second = set(Listing.objects.values_list("id", flat=True)) - first
+        self.assertEqual(snapshot(first), snapshot(second))
@@ -0,0 +1,114 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+
+# Default buckets as (capacity, tokens refilled per second), overridden by
+# settings.AUCTIONS_AUTH_THROTTLE
+THROTTLE = {
+    "ip": (20, 1 / 3),
+    "username": (5, 1 / 60),
+}
+
+# Keys kept per bucket set before full buckets are dropped
+MAX_KEYS = 100000
+
+
+class TokenBuckets:
+    """
+    In-memory token buckets, one per key. Each attempt takes a token, and
+    tokens come back at a fixed rate up to the capacity, so a key can burst
+    up to the capacity and then only keep the refill rate. Buckets are local
+    to the process, every worker throttles on its own.
+    """
+
+    def __init__(self, capacity, perSecond, maxKeys=MAX_KEYS):
+        self.capacity = capacity
+        self.perSecond = perSecond
+        self.maxKeys = maxKeys
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def take(self, key, now=None):
+        """
+        Takes a token for key. Returns 0 when the attempt is allowed, or the
+        seconds until the next token otherwise.
+        """
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            tokens, stamp = self.buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - stamp) * self.perSecond)
+            if tokens < 1:
+                self.buckets[key] = (tokens, now)
+                return (1 - tokens) / self.perSecond
+            self.buckets[key] = (tokens - 1, now)
+            if len(self.buckets) > self.maxKeys:
+                self.prune(now)
+            return 0
+
+    def prune(self, now):
+        # Buckets that have refilled are the same as missing ones
+        self.buckets = {
+            key: (tokens, stamp) for key, (tokens, stamp) in self.buckets.items()
+            if tokens + (now - stamp) * self.perSecond < self.capacity
+        }
+
+
+buckets = {}
+bucketsLock = threading.Lock()
+
+
+# FUNCTION
+# NAME:        throttle
+# DESCRIPTION: Function will take a token from the bucket of a key in one of
+#              the throttles (e.g. "ip" or "username"). Throttles missing from
+#              settings.AUCTIONS_AUTH_THROTTLE never block.
+# ARGUMENTS:   It needs the throttle name and the key
+# OUTPUT:      It returns 0 when allowed, or the seconds to wait otherwise
+def throttle(name, key):
+    config = getattr(settings, "AUCTIONS_AUTH_THROTTLE", THROTTLE).get(name)
+    if config is None:
+        return 0
+    with bucketsLock:
+        bucketSet = buckets.get((name, config))
+        if bucketSet is None:
+            bucketSet = buckets[(name, config)] = TokenBuckets(*config)
+    return bucketSet.take(key)
+
+
+# FUNCTION
+# NAME:        throttleCredentials
+# DESCRIPTION: Function will check a login or register attempt against the
+#              per-IP throttle and, when given a username, the per-username
+#              throttle. Both take a token, so guessing many passwords of one
+#              account and spraying one password over many accounts are both
+#              slowed down.
+# ARGUMENTS:   It needs the request and optionally the username
+# OUTPUT:      It returns 0 when allowed, or the whole seconds to wait
+def throttleCredentials(request, username=None):
+    wait = throttle("ip", clientIp(request))
+    if username is not None:
+        wait = max(wait, throttle("username", username.lower()))
+    return math.ceil(wait)
+
+
+# FUNCTION
+# NAME:        clientIp
+# DESCRIPTION: Function will return the address of the client. Behind a
+#              reverse proxy, make it set REMOTE_ADDR (X-Forwarded-For can
+#              be forged by the client).
+# ARGUMENTS:   It needs the request
+# OUTPUT:      It returns the address
+def clientIp(request):
+    return request.META.get("REMOTE_ADDR", "")
+
+
+# FUNCTION
+# NAME:        resetThrottles
+# DESCRIPTION: Function will forget every bucket
+# ARGUMENTS:   None
+# OUTPUT:      None
+def resetThrottles():
+    with bucketsLock:
+        buckets.clear()
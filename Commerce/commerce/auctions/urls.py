@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 urlpatterns = [
     path("", views.index, name="index"),
@@ -8,8 +8,16 @@ urlpatterns = [
     path("logout", views.logout_view, name="logout"),
     path("register", views.register, name="register"),
     path("categories", views.categories, name="categories"),
-    path("categories/<str:name>", views.category, name="category"),
+    path("categories/<slug:slug>", views.category, name="category"),
+    path("search", views.search, name="search"),
     path("watchlist", views.watchlist, name="watchlist"),
     path("create", views.create, name="create"),
     path("listing/<int:id>", views.listing, name="listing"),
+    path("listing/<int:id>/events", views.listingEvents, name="listingEvents"),
+
+    # Read-only JSON API
+    path(f"api/{api.API_VERSION}/listings", api.listings, name="apiListings"),
+    path(f"api/{api.API_VERSION}/listings/<int:id>", api.listing, name="apiListing"),
+    path(f"api/{api.API_VERSION}/listings/<int:id>/bids", api.bids, name="apiBids"),
+    path(f"api/{api.API_VERSION}/listings/<int:id>/comments", api.comments, name="apiComments"),
 ]
\ No newline at end of file
@@ -0,0 +1,70 @@
+import copy
+
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+from .models import User
+
+# Cache alias shared with the sessions, see SESSION_CACHE_ALIAS in settings
+USER_CACHE = "sessions"
+
+# Seconds a resolved user is reused. Caches local to one process only see
+# their own invalidations, so this also bounds how long another worker can
+# keep a user logged in after a password change.
+USER_CACHE_SECONDS = 60
+
+
+# FUNCTION
+# NAME:        userKey
+# DESCRIPTION: Function will build the cache key of a user
+# ARGUMENTS:   It needs the user id
+# OUTPUT:      It returns the cache key
+def userKey(userId):
+    return f"auctions:user:{userId}"
+
+
+# FUNCTION
+# NAME:        cachedCopy
+# DESCRIPTION: Function will build the copy of a user kept in the cache:
+#              without the password hash, which never leaves the database,
+#              but with the session hash Django checks on every request.
+#              The password is a deferred field of the copy, loaded again
+#              if anything reads it, and left alone if the copy is saved.
+# ARGUMENTS:   It needs the user
+# OUTPUT:      It returns the copy to cache
+def cachedCopy(user):
+    cached = copy.copy(user)
+    cached.session_auth_hash = user.get_session_auth_hash()
+    del cached.__dict__["password"]
+    return cached
+
+
+# FUNCTION
+# NAME:        invalidateUser
+# DESCRIPTION: Function will drop a cached user, so the next request loads
+#              it from the database
+# ARGUMENTS:   It needs the user id
+# OUTPUT:      None
+def invalidateUser(userId):
+    caches[USER_CACHE].delete(userKey(userId))
+
+
+class CachedUserBackend(ModelBackend):
+    """
+    ModelBackend resolving the logged-in user of a request from the cache,
+    so an authenticated page view does not fetch the user row. Django still
+    checks the session hash, cached in place of the password, and saving a
+    user (a password change included) or logging out drops the cached copy.
+    """
+
+    def get_user(self, user_id):
+        cache = caches[USER_CACHE]
+        key = userKey(user_id)
+        user = cache.get(key)
+        if user is None:
+            try:
+                user = User._default_manager.get(pk=user_id)
+            except User.DoesNotExist:
+                return None
+            cache.set(key, cachedCopy(user), USER_CACHE_SECONDS)
+        return user if self.user_can_authenticate(user) else None
@@ -1,41 +1,106 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+
 from django.contrib.auth import authenticate, login, logout
-from django.db import IntegrityError
-from django.http import HttpResponse, HttpResponseRedirect
+from django.db import IntegrityError, transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import render
 from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from .models import User, Listing, Category, Bid, Comment
+from .models import User, Listing, Category, Comment
 from . forms import ListingForm, BidForm, CommentForm
-
+from .bids import placeBid, closeAuction
+from .pagination import keysetPage, COMMENTS_PER_PAGE
+from .watchlist import isWatched, watchedIds
+from .search import searchListings
+from .categories import categoryCounts
+from .live import getBroker, listingChannel, formatEvent
+from .photos import enqueuePhoto
+from .etags import conditionalGet, listingEtag, indexEtag, categoryEtag, watchlistEtag
+from .routers import replicaView
+from .hashing import HashingBusy, offloadHashing
+from .throttle import throttleCredentials
+
+# Seconds between keepalive comments on idle event streams
+KEEPALIVE_SECONDS = 15
+
+@replicaView
+@conditionalGet(indexEtag)
 def index(request):
-    listings = Listing.objects.all()
+    listings, nextCursor = keysetPage(
+        Listing.objects.filter(active=True), request.GET.get("after")
+    )
     return render(request, "auctions/index.html", {
         "listings": listings,
+        "nextCursor": nextCursor,
+        "watched": pageWatchedIds(request, listings),
         "title": "Active Listings"
     })
 
 def categories(request):
-    categories = Category.objects.all()
+    counts = categoryCounts()
+    categories = Category.objects.order_by("name")
+    for cat in categories:
+        cat.activeCount = counts.get(cat.id, 0)
     return render(request, "auctions/categories.html", {
         "categories": categories
     })
 
-def category(request, name):
-    name = name.capitalize()
-    category = Category.objects.filter(name=name).first()
-    listings = category.listings.select_related("owner", "category").order_by("-date")
+@replicaView
+@conditionalGet(categoryEtag)
+def category(request, slug):
+    # Slugs are stored lowercase, so the lookup ignores the case of the url
+    category = Category.objects.filter(slug=slug.lower()).first()
+    if category is None:
+        return render(request, "auctions/error.html", {
+            "message": "EROR 404: category not found",
+        }, status=404)
+
+    listings, nextCursor = keysetPage(
+        category.listings.select_related("owner", "category"), request.GET.get("after")
+    )
     return render(request, "auctions/index.html", {
         "listings": listings,
+        "nextCursor": nextCursor,
+        "watched": pageWatchedIds(request, listings),
         "title": category
     })
 
+def search(request):
+    query = request.GET.get("q", "")
+    state = request.GET.get("active", "")
+    active = {"active": True, "closed": False}.get(state)
+    try:
+        categoryId = int(request.GET["category"]) if request.GET.get("category") else None
+        page = int(request.GET.get("page", 1))
+    except ValueError:
+        categoryId, page = None, 1
+
+    results, hasNext = searchListings(query, active, categoryId, page)
+    return render(request, "auctions/search.html", {
+        "query": query,
+        "results": results,
+        "state": state,
+        "categoryId": categoryId,
+        "categories": Category.objects.all(),
+        "page": page,
+        "hasNext": hasNext,
+    })
+
 @login_required
+@conditionalGet(watchlistEtag)
 def watchlist(request):
-    listings = request.user.watchlist.all() 
+    listings, nextCursor = keysetPage(
+        request.user.watchlist.all(), request.GET.get("after")
+    )
     return render(request, "auctions/index.html", {
         "listings": listings,
+        "nextCursor": nextCursor,
+        # Everything on this page is watched, no need to ask the database
+        "watched": {listing.id for listing in listings},
         "title": "Watchlist"
-
     })
 
 @login_required
@@ -52,22 +117,34 @@ def create(request):
                 category = cd["category"],
                 active = True,
                 photo = cd["photo"],
+                photo_upload = cd["upload"],
+                end = cd["end"],
             )
+            if cd["photo"] or cd["upload"]:
+                listing.photo_status = "pending"
             listing.save()
+            if listing.photo_status == "pending":
+                enqueuePhoto(listing.id)
             return HttpResponseRedirect(reverse("index"))
 
     else:
         form = ListingForm()
-        return render(request, "auctions/createlisting.html", {
-            "form": form
-        })
 
+    # Show the form again with its errors if it was not valid
+    return render(request, "auctions/createlisting.html", {
+        "form": form
+    })
+
+@replicaView
+@conditionalGet(listingEtag)
 def listing(request, id):
         try:
-            listing = Listing.objects.get(id=id)
+            # Owner and category are shown on the page, join them right away
+            listing = Listing.objects.select_related("owner", "category").get(id=id)
             highestBid = listing.price
-            bidCount = listing.bids.count()
+            bidCount = listing.bid_count
             isActive = listing.active
+            bidMessage = None
 
             isWinner, inWatchlist, isOwner, isCurrentBid, currentWinner = checkUserPrivileges(
                 request, isActive, listing
@@ -83,12 +160,14 @@ def listing(request, id):
                     form = BidForm(request.POST)
 
                     if form.is_valid():
-                        highestBid, bidCount = bidListing(request, form, listing, highestBid, bidCount)
+                        result = bidListing(request, form, listing)
+                        highestBid, bidCount, bidMessage = result.price, result.bidCount, result.message
+                        isCurrentBid = isCurrentBid or result.accepted
                     else: raise ValueError("Bid should be higher that previous bid")
 
                 # If user wants to close the auction
                 elif request.POST.get('close'):
-                    isActive = closeListing(listing, currentWinner)
+                    isActive = closeListing(listing)
 
                 # If user wants to add a comment
                 elif request.POST.get('comment'):
@@ -98,12 +177,17 @@ def listing(request, id):
             # In any case, return to listing
             bidForm = BidForm()
             commentForm = CommentForm()
-            comments = listing.comments.all()
+            comments, nextComments = keysetPage(
+                listing.comments.select_related("user"),
+                request.GET.get("comments"),
+                COMMENTS_PER_PAGE,
+            )
             
             return render(request, "auctions/listing.html", {
                 "listing": listing,
                 "bidForm": bidForm,
                 "comments":comments,
+                "nextComments": nextComments,
                 "commentForm": commentForm,
                 "highestBid": highestBid,
                 "bidCount": bidCount,
@@ -112,33 +196,81 @@ def listing(request, id):
                 "isOwner": isOwner,
                 "isWinner": isWinner,
                 "isCurrentBid": isCurrentBid,
+                "bidMessage": bidMessage,
             })
         
-        except RuntimeError:
+        except Listing.DoesNotExist:
             message = "EROR 404: listing not found"
             return render(request, "auctions/error.html", {
                 "message": message,
-            })
+            }, status=404)
     
 
-def login_view(request):
+async def listingEvents(request, id):
+    # Streams need an ASGI server, a WSGI worker would be held forever.
+    # 204 tells EventSource to stop reconnecting.
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    # Subscribe before reading the current state so no bid falls in between
+    subscription = getBroker().subscribe(listingChannel(id))
+    state = await Listing.objects.filter(pk=id).values("price", "bid_count", "active").afirst()
+    if state is None:
+        subscription.close()
+        return HttpResponse(status=404)
+
+    async def stream():
+        try:
+            yield "retry: 5000\n\n" + formatEvent({"event": "bid", "data": {
+                "price": str(state["price"]),
+                "bidCount": state["bid_count"],
+                "active": state["active"],
+            }})
+            if not state["active"]:
+                return
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield formatEvent(message)
+                if message["event"] == "close":
+                    return
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(stream(), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+async def login_view(request):
     if request.method == "POST":
 
         # Attempt to sign user in
         username = request.POST["username"]
         password = request.POST["password"]
-        user = authenticate(request, username=username, password=password)
+        refused = await refuseCredentials(request, "auctions/login.html", username)
+        if refused:
+            return refused
+
+        # Hashing the password runs on its own pool, away from page requests
+        try:
+            user = await offloadHashing(authenticate, request, username=username, password=password)
+        except HashingBusy:
+            return await renderBusy(request, "auctions/login.html")
 
         # Check if authentication successful
         if user is not None:
-            login(request, user)
+            await sync_to_async(login)(request, user)
             return HttpResponseRedirect(reverse("index"))
         else:
-            return render(request, "auctions/login.html", {
+            return await sync_to_async(render)(request, "auctions/login.html", {
                 "message": "Invalid username and/or password."
             })
     else:
-        return render(request, "auctions/login.html")
+        return await sync_to_async(render)(request, "auctions/login.html")
 
 
 def logout_view(request):
@@ -146,7 +278,7 @@ def logout_view(request):
     return HttpResponseRedirect(reverse("index"))
 
 
-def register(request):
+async def register(request):
     if request.method == "POST":
         username = request.POST["username"]
         email = request.POST["email"]
@@ -155,22 +287,27 @@ def register(request):
         password = request.POST["password"]
         confirmation = request.POST["confirmation"]
         if password != confirmation:
-            return render(request, "auctions/register.html", {
+            return await sync_to_async(render)(request, "auctions/register.html", {
                 "message": "Passwords must match."
             })
 
+        refused = await refuseCredentials(request, "auctions/register.html")
+        if refused:
+            return refused
+
         # Attempt to create new user
         try:
-            user = User.objects.create_user(username, email, password)
-            user.save()
+            user = await offloadHashing(User.objects.create_user, username, email, password)
         except IntegrityError:
-            return render(request, "auctions/register.html", {
+            return await sync_to_async(render)(request, "auctions/register.html", {
                 "message": "Username already taken."
             })
-        login(request, user)
+        except HashingBusy:
+            return await renderBusy(request, "auctions/register.html")
+        await sync_to_async(login)(request, user)
         return HttpResponseRedirect(reverse("index"))
     else:
-        return render(request, "auctions/register.html")
+        return await sync_to_async(render)(request, "auctions/register.html")
     
 
 # Helper functions
@@ -184,9 +321,10 @@ def register(request):
 # OUTPUT:      It returns a boolean stating if the current user is the winner 
 #              of the auction, if the listing is in the watchlist, if the user
 #              is the owner of the listing, if the user is the current highest
-#              bidder, and the highest bidder
+#              bidder, and the id of the highest bidder
 def checkUserPrivileges(request, isActive, listing):
-    currentWinner = Bid.objects.all().order_by("-amount").first().user
+    # The high bidder is stored on the listing, no need to look at the bids
+    currentWinner = listing.high_bidder_id
     inWatchlist = False
     isOwner = False
     isWinner = False
@@ -196,12 +334,27 @@ def checkUserPrivileges(request, isActive, listing):
         isWinner = listing.winner == request.user
             
     if request.user.is_authenticated:
-        inWatchlist = listing in request.user.watchlist.all()
-        isOwner = request.user == listing.owner
-        isCurrentBid = request.user == currentWinner
+        # The ETag check may already know the answer
+        inWatchlist = getattr(request, "watchState", None)
+        if inWatchlist is None:
+            inWatchlist = isWatched(request.user, listing)
+        isOwner = request.user.id == listing.owner_id
+        isCurrentBid = currentWinner is not None and request.user.id == currentWinner
     
     return isWinner, inWatchlist, isOwner, isCurrentBid, currentWinner
 
+# FUNCTION
+# NAME:        pageWatchedIds
+# DESCRIPTION: Function will return the ids of the watched listings of a grid
+#              page, reusing the ones found by the ETag check if there are
+# ARGUMENTS:   It needs the request and the listings of the page
+# OUTPUT:      It returns a set of listing ids
+def pageWatchedIds(request, listings):
+    watched = getattr(request, "watchedIds", None)
+    if watched is None:
+        watched = watchedIds(request.user, listings)
+    return watched
+
 # FUNCTION
 # NAME:        modifyWatchlist
 # DESCRIPTION: Function will modify the watchlist status of a listing
@@ -219,39 +372,29 @@ def modifyWatchlist(request, listing, inWatchlist):
 
 # FUNCTION
 # NAME:        bidListing
-# DESCRIPTION: Function will add new bid to the listing
-# ARGUMENTS:   It needs the request, the listing, bid, and current number 
-#              of bids
-# OUTPUT:      It returns the new highest bid and the updated number of bids
-def bidListing(request, form, listing, highestBid, bidCount):
+# DESCRIPTION: Function will place a new bid on the listing through the bid
+#              service and refresh the listing with the result
+# ARGUMENTS:   It needs the request, the bid form and the listing
+# OUTPUT:      It returns the BidResult of the bid
+def bidListing(request, form, listing):
     bid = form.cleaned_data["bid"]
-    if bid > highestBid:
-        newBid = Bid.objects.create(
-            user=request.user,
-            listing=listing,
-            amount=bid
-        )
-        listing.price = bid
-        highestBid = bid
-        bidCount += 1
-        listing.save()
-    return highestBid, bidCount
-
-    
-    
+    result = placeBid(listing.id, request.user, bid)
+    listing.price = result.price
+    listing.bid_count = result.bidCount
+    if result.accepted:
+        listing.high_bidder = request.user
+    return result
 
 # FUNCTION
 # NAME:        closeListing
 # DESCRIPTION: Function will close the listing and set the winner as the 
 #              highest bidder.
-# ARGUMENTS:   It needs the listing and the user that is currently winning the
-#              bid
+# ARGUMENTS:   It needs the listing
 # OUTPUT:      It returns a boolean stating the listing is not active
-def closeListing(listing, currentWinner):
-    listing.winner = currentWinner
-    listing.active = False
-    isActive = False
-    listing.save()
+def closeListing(listing):
+    closeAuction(listing.id)
+    listing.refresh_from_db(fields=["active", "winner"])
+    isActive = listing.active
     return isActive
 
 # FUNCTION
@@ -262,8 +405,43 @@ def closeListing(listing, currentWinner):
 def addNewComment(request, listing, form):
     if form.is_valid():
         comment = form.cleaned_data["comment"]
-        newComment = Comment.objects.create(
-            user=request.user,
-            listing=listing,
-            comment=comment,
-        )
\ No newline at end of file
+        with transaction.atomic():
+            newComment = Comment.objects.create(
+                user=request.user,
+                listing=listing,
+                comment=comment,
+            )
+            Listing.objects.filter(pk=listing.pk).update(last_comment=newComment.date)
+
+
+# LOGIN AND REGISTER
+
+# FUNCTION
+# NAME:        refuseCredentials
+# DESCRIPTION: Function will throttle a login or register attempt per IP and
+#              per username before any password is hashed
+# ARGUMENTS:   It needs the request, the template of the form and the
+#              username when there is an account to protect
+# OUTPUT:      It returns a 429 response, or None when the attempt may go on
+async def refuseCredentials(request, template, username=None):
+    wait = throttleCredentials(request, username)
+    if not wait:
+        return None
+    response = await sync_to_async(render)(request, template, {
+        "message": f"Too many attempts, try again in {wait} seconds."
+    }, status=429)
+    response["Retry-After"] = str(wait)
+    return response
+
+# FUNCTION
+# NAME:        renderBusy
+# DESCRIPTION: Function will answer an attempt the hashing pool has no room
+#              for
+# ARGUMENTS:   It needs the request and the template of the form
+# OUTPUT:      It returns a 503 response
+async def renderBusy(request, template):
+    response = await sync_to_async(render)(request, template, {
+        "message": "The server is busy, try again in a moment."
+    }, status=503)
+    response["Retry-After"] = "1"
+    return response
@@ -0,0 +1,32 @@
+from .models import User
+
+
+# FUNCTION
+# NAME:        isWatched
+# DESCRIPTION: Function will check if a single listing is in the watchlist of
+#              a user with an EXISTS on the watchlist table, which is indexed
+#              on (user, listing), instead of loading the whole watchlist
+# ARGUMENTS:   It needs the user and the listing
+# OUTPUT:      It returns a boolean
+def isWatched(user, listing):
+    if not user.is_authenticated:
+        return False
+    return User.watchlist.through.objects.filter(
+        user_id=user.id, listing_id=listing.id
+    ).exists()
+
+
+# FUNCTION
+# NAME:        watchedIds
+# DESCRIPTION: Function will find which of the given listings a user watches
+#              with one query, so grid pages can show the watch state of
+#              every card without a query per card
+# ARGUMENTS:   It needs the user and the listings of the page
+# OUTPUT:      It returns the set of the ids of the watched listings
+def watchedIds(user, listings):
+    ids = [listing.id for listing in listings]
+    if not user.is_authenticated or not ids:
+        return set()
+    return set(User.watchlist.through.objects.filter(
+        user_id=user.id, listing_id__in=ids
+    ).values_list("listing_id", flat=True))
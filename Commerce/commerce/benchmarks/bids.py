@@ -0,0 +1,96 @@
+"""
+Stress benchmark for auctions.bids.placeBid.
+
+Fires many concurrent bids from several threads at a single listing and
+reports accepted bids per second plus any lost-update anomalies: the final
+price must equal the highest accepted bid, the stored bid count must equal
+the number of Bid rows, and accepted bids must be strictly increasing in
+the order they were committed.
+"""
+
+import argparse
+import random
+import threading
+
+from common import Timer, setupDjango
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--bids", type=int, default=2000, help="total bids across all threads")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    setupDjango()
+
+    from django.db import connection
+    from auctions.bids import placeBid
+    from auctions.models import User, Listing, Bid
+
+    owner = User.objects.create_user("owner", "", "pass")
+    bidders = [User.objects.create_user(f"bidder{i}", "", "pass") for i in range(args.threads)]
+    listing = Listing.objects.create(name="Hot item", description="Everyone wants it", price=1, owner=owner)
+    connection.close()
+
+    perThread = args.bids // args.threads
+    accepted = [0] * args.threads
+    rejected = [0] * args.threads
+    errors = []
+    start = threading.Barrier(args.threads)
+
+    def worker(index):
+        rng = random.Random(args.seed + index)
+        user = bidders[index]
+        start.wait()
+        try:
+            for step in range(perThread):
+                # Bids climb slowly with lots of overlap between threads
+                amount = 1 + step * args.threads + rng.randint(0, 2 * args.threads)
+                if placeBid(listing.id, user, amount).accepted:
+                    accepted[index] += 1
+                else:
+                    rejected[index] += 1
+        except Exception as e:
+            errors.append(repr(e))
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(args.threads)]
+    with Timer() as timer:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    listing.refresh_from_db()
+    amounts = list(Bid.objects.filter(listing=listing).order_by("id").values_list("amount", flat=True))
+    anomalies = []
+    if amounts and float(listing.price) != max(amounts):
+        anomalies.append(f"final price {listing.price} != highest accepted bid {max(amounts)}")
+    if listing.bid_count != len(amounts):
+        anomalies.append(f"bid_count {listing.bid_count} != {len(amounts)} Bid rows")
+    if sum(accepted) != len(amounts):
+        anomalies.append(f"{sum(accepted)} bids reported accepted but {len(amounts)} stored")
+    outOfOrder = sum(1 for a, b in zip(amounts, amounts[1:]) if b <= a)
+    if outOfOrder:
+        anomalies.append(f"{outOfOrder} accepted bids were not higher than the previous one")
+
+    total = sum(accepted) + sum(rejected)
+    print(f"threads:            {args.threads}")
+    print(f"bids attempted:     {total}")
+    print(f"bids accepted:      {sum(accepted)}")
+    print(f"bids rejected:      {sum(rejected)}")
+    print(f"elapsed:            {timer.elapsed:.2f}s")
+    print(f"attempts/s:         {total / timer.elapsed:.0f}")
+    print(f"accepted bids/s:    {sum(accepted) / timer.elapsed:.0f}")
+    print(f"errors:             {len(errors)}")
+    for e in errors[:5]:
+        print(f"  {e}")
+    print(f"lost-update anomalies: {len(anomalies)}")
+    for a in anomalies:
+        print(f"  {a}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark for the listing card cache on the index page.
+
+Renders the index repeatedly with a cold card cache (cleared before every
+request) and with a warm one, and prints the card cache counters.
+"""
+
+import argparse
+
+from common import Timer, percentile, setupDjango
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--listings", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    setupDjango()
+
+    from django.core.cache import caches
+    from django.test import Client
+    from auctions.cards import CARD_CACHE, cardCacheStats, resetCardCacheStats
+    from auctions.models import User, Listing
+
+    owner = User.objects.create_user("owner", "", "pass")
+    Listing.objects.bulk_create([
+        Listing(name=f"Item {i}", description="A fairly ordinary thing " * 10, price=i, owner=owner)
+        for i in range(args.listings)
+    ], batch_size=5000)
+
+    client = Client()
+    cache = caches[CARD_CACHE]
+
+    def run(label, clear):
+        resetCardCacheStats()
+        times = []
+        for _ in range(args.repeat):
+            if clear:
+                cache.clear()
+            with Timer() as timer:
+                client.get("/")
+            times.append(timer.elapsed * 1000)
+        stats = cardCacheStats()
+        print(f"{label:<6} p50 {percentile(times, 50):7.2f} ms  p99 {percentile(times, 99):7.2f} ms  "
+              f"hits {stats['hits']:>6}  misses {stats['misses']:>6}  hit rate {stats['hitRate']:.0%}")
+
+    client.get("/")
+    run("cold", True)
+    run("warm", False)
+
+
+if __name__ == "__main__":
+    main()
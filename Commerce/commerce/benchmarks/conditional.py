@@ -0,0 +1,70 @@
+"""
+Benchmark for conditional GETs under a polling workload.
+
+Simulates clients polling the index and a listing page, with a bid landing
+every --change-every polls. Compares CPU time per poll when clients always
+download the page with clients revalidating with If-None-Match.
+"""
+
+import argparse
+import time
+
+from common import setupDjango
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--listings", type=int, default=500)
+    parser.add_argument("--comments", type=int, default=20)
+    parser.add_argument("--polls", type=int, default=1000)
+    parser.add_argument("--change-every", type=int, default=25)
+    args = parser.parse_args()
+
+    setupDjango()
+
+    from django.test import Client
+    from auctions.bids import placeBid
+    from auctions.models import User, Listing, Comment
+
+    owner = User.objects.create_user("owner", "", "pass")
+    bidder = User.objects.create_user("bidder", "", "pass")
+    Listing.objects.bulk_create([
+        Listing(name=f"Item {i}", description="A fairly ordinary thing " * 10, price=1, owner=owner)
+        for i in range(args.listings)
+    ], batch_size=5000)
+    hot = Listing.objects.order_by("-date", "-id").first()
+    Comment.objects.bulk_create([
+        Comment(user=bidder, listing=hot, comment="Still available?") for _ in range(args.comments)
+    ])
+
+    price = 1
+
+    def poll(url, conditional):
+        nonlocal price
+        client = Client()
+        client.force_login(bidder)
+        etag = None
+        changed = 0
+        start = time.process_time()
+        for n in range(args.polls):
+            if n and n % args.change_every == 0:
+                price += 1
+                placeBid(hot.id, owner, price)
+            headers = {"HTTP_IF_NONE_MATCH": etag} if conditional and etag else {}
+            response = client.get(url, **headers)
+            if response.status_code == 200:
+                etag = response["ETag"]
+                changed += 1
+        cpu = time.process_time() - start
+        return cpu / args.polls * 1000, changed
+
+    for label, url in [("index", "/"), ("listing", f"/listing/{hot.id}")]:
+        full, _ = poll(url, False)
+        cond, rendered = poll(url, True)
+        print(f"{label:<8} always 200: {full:6.2f} ms cpu/poll   "
+              f"If-None-Match: {cond:6.2f} ms cpu/poll ({rendered} of {args.polls} rendered)   "
+              f"saved {1 - cond / full:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Mixed read/write benchmark for the database settings.
+
+Reader threads load the index and listing pages while writer threads place
+bids, for --seconds, against a SQLite file. Each configuration runs in its
+own process:
+
+- stock: rollback journal, deferred transactions, a new connection per
+  request (Django's defaults before commerce/database.py)
+- tuned: the settings from commerce/database.py (WAL, pragmas, IMMEDIATE
+  transactions, persistent connections)
+- replica: tuned, with the read-only views routed to a replica. The
+  replica is a copy of the file taken after seeding, so it only shows how
+  much the readers gain from not sharing the primary's file at all.
+
+Reports page latency percentiles, bids per second and "database is locked"
+errors.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import percentile
+
+MODES = ["stock", "tuned", "replica"]
+
+
+def run(args):
+    dbPath = os.path.join(tempfile.mkdtemp(prefix="auctions-bench-"), "bench.sqlite3")
+    database = {}
+    if args.mode == "stock":
+        database = {
+            "CONN_MAX_AGE": 0,
+            "OPTIONS": {"init_command": "PRAGMA journal_mode=DELETE", "timeout": 5},
+        }
+    elif args.mode == "replica":
+        os.environ["AUCTIONS_DB_REPLICA"] = dbPath + ".replica"
+
+    from common import setupDjango
+    setupDjango(dbPath, **database)
+
+    from django.db import OperationalError, close_old_connections, connection
+    from django.test import Client
+    from auctions.bids import placeBid
+    from auctions.models import User, Listing
+
+    owner = User.objects.create_user("owner", "", "pass")
+    bidders = [User.objects.create_user(f"bidder{i}", "", "pass") for i in range(args.writers)]
+    listings = Listing.objects.bulk_create([
+        Listing(name=f"Item {i}", description="A fairly ordinary thing", price=1, owner=owner)
+        for i in range(args.listings)
+    ])
+    ids = [listing.id for listing in listings]
+    connection.close()
+    if args.mode == "replica":
+        shutil.copy(dbPath, dbPath + ".replica")
+
+    stop = threading.Event()
+    latencies = []
+    bids = [0]
+    locked = [0]
+    lock = threading.Lock()
+
+    def reader(index):
+        rng = random.Random(index)
+        client = Client()
+        mine = []
+        while not stop.is_set():
+            url = "/" if rng.random() < 0.3 else f"/listing/{rng.choice(ids)}"
+            start = time.perf_counter()
+            try:
+                client.get(url)
+                mine.append((time.perf_counter() - start) * 1000)
+            except OperationalError:
+                with lock:
+                    locked[0] += 1
+        with lock:
+            latencies.extend(mine)
+
+    def writer(index):
+        rng = random.Random(1000 + index)
+        user = bidders[index]
+        price = 1
+        while not stop.is_set():
+            price += rng.randint(1, 3)
+            try:
+                placeBid(rng.choice(ids[:10]), user, price)
+                with lock:
+                    bids[0] += 1
+            except OperationalError:
+                with lock:
+                    locked[0] += 1
+            # What the end of a request would do
+            close_old_connections()
+        connection.close()
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(args.readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(args.writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    print(json.dumps({
+        "pages": len(latencies),
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "bids": bids[0] / args.seconds,
+        "locked": locked[0],
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--listings", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--mode", choices=MODES, help="run one configuration only, in this process")
+    args = parser.parse_args()
+
+    if args.mode:
+        run(args)
+        return
+
+    print(f"{'mode':<10}{'pages':>8}{'p50 ms':>9}{'p99 ms':>9}{'bids/s':>9}{'locked':>8}")
+    for mode in MODES:
+        output = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--readers", str(args.readers),
+             "--writers", str(args.writers), "--listings", str(args.listings), "--seconds", str(args.seconds)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:<10}{result['pages']:>8}{result['p50']:>9.1f}{result['p99']:>9.1f}"
+              f"{result['bids']:>9.0f}{result['locked']:>8}")
+
+
+if __name__ == "__main__":
+    main()
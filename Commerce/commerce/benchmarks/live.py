@@ -0,0 +1,119 @@
+"""
+Load test for the live listing event streams.
+
+Opens many Server-Sent Event subscribers on one listing directly against
+the ASGI application of a single worker (no network in between), measures
+the memory held per idle subscriber, then publishes bursts of bids and
+reports how fast every subscriber receives them.
+"""
+
+import argparse
+import asyncio
+import json
+import threading
+import time
+import tracemalloc
+
+from common import percentile, setupDjango
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--events", type=int, default=50)
+    args = parser.parse_args()
+
+    setupDjango()
+
+    from django.core.asgi import get_asgi_application
+    from auctions.live import getBroker, publishListing
+    from auctions.models import User, Listing
+
+    owner = User.objects.create_user("owner", "", "pass")
+    listing = Listing.objects.create(name="Hot item", description="Everyone wants it", price=1, owner=owner)
+    application = get_asgi_application()
+    path = f"/listing/{listing.id}/events"
+
+    received = []
+    latencies = []
+    ready = 0
+
+    async def subscriber(index, stop):
+        sentRequest = False
+
+        async def receive():
+            nonlocal sentRequest
+            if not sentRequest:
+                sentRequest = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await stop.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal ready
+            if message["type"] != "http.response.body" or not message.get("body"):
+                return
+            body = message["body"].decode()
+            if body.startswith("retry"):
+                ready += 1
+                return
+            for line in body.splitlines():
+                if line.startswith("data: "):
+                    data = json.loads(line[6:])
+                    if "sent" in data:
+                        latencies.append(time.perf_counter() - data["sent"])
+                        received.append(index)
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(),
+            "query_string": b"", "headers": [(b"host", b"localhost")],
+            "server": ("localhost", 80), "client": ("127.0.0.1", 10000 + index),
+        }
+        await application(scope, receive, send)
+
+    async def run():
+        stop = asyncio.Event()
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(subscriber(i, stop)) for i in range(args.subscribers)]
+        while ready < args.subscribers:
+            await asyncio.sleep(0.05)
+        connectTime = time.perf_counter() - started
+        held = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        print(f"idle subscribers:      {getBroker().subscriberCount()}")
+        print(f"connect time:          {connectTime:.2f}s")
+        print(f"memory per subscriber: {held / args.subscribers / 1024:.1f} KiB")
+
+        # Publish from another thread, like a sync bid view would
+        def publisher():
+            for n in range(args.events):
+                publishListing(listing.id, "bid", {"price": str(n), "bidCount": n, "active": True, "sent": time.perf_counter()})
+                time.sleep(0.01)
+
+        expected = args.subscribers * args.events
+        started = time.perf_counter()
+        thread = threading.Thread(target=publisher)
+        thread.start()
+        while len(received) < expected and time.perf_counter() - started < 60:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+        thread.join()
+
+        ms = [l * 1000 for l in latencies]
+        print(f"events published:      {args.events}")
+        print(f"deliveries:            {len(received)} of {expected}")
+        print(f"deliveries/s:          {len(received) / elapsed:.0f}")
+        print(f"delivery latency:      p50 {percentile(ms, 50):.1f} ms  p99 {percentile(ms, 99):.1f} ms")
+
+        stop.set()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
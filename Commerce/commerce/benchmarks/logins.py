@@ -0,0 +1,127 @@
+"""
+Benchmark for listing page latency during a login flood.
+
+Drives the ASGI application directly (no network in between). Page
+clients load a listing page in a loop while flooders post wrong passwords
+to the login form from a handful of IPs. Runs three configurations for
+--seconds each:
+
+- inline: hashing on the thread that also runs the sync page views, which
+  is where authenticate ran before it was offloaded
+- pool: hashing on the AUCTIONS_HASH_WORKERS pool, no throttling
+- throttled: the pool plus the default per-IP and per-username throttles
+
+and reports page p50/p99 next to a run without any flood.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from common import percentile, setupDjango
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=4, help="concurrent page clients")
+    parser.add_argument("--flooders", type=int, default=16, help="concurrent login clients")
+    parser.add_argument("--ips", type=int, default=4, help="addresses the flood comes from")
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    setupDjango()
+
+    from django.conf import settings
+    from django.core.asgi import get_asgi_application
+    from auctions.models import User, Listing
+    from auctions.throttle import THROTTLE, resetThrottles
+
+    owner = User.objects.create_user("owner", "", "pass")
+    for i in range(50):
+        User.objects.create_user(f"user{i}", "", "pass")
+    listing = Listing.objects.create(name="Hot item", description="Everyone wants it", price=1, owner=owner)
+    application = get_asgi_application()
+
+    async def request(method, path, body=b"", headers=(), ip="127.0.0.1"):
+        sent = False
+        response = {}
+
+        async def receive():
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await asyncio.Event().wait()
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = message["headers"]
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+            "query_string": b"", "headers": [(b"host", b"localhost"), *headers],
+            "server": ("localhost", 80), "client": (ip, 10000),
+        }
+        await application(scope, receive, send)
+        return response
+
+    async def csrfToken():
+        response = await request("GET", "/login")
+        for name, value in response["headers"]:
+            if name.lower() == b"set-cookie" and value.startswith(b"csrftoken="):
+                return value.split(b";")[0].split(b"=", 1)[1]
+
+    async def run(flood):
+        resetThrottles()
+        token = await csrfToken()
+        latencies = []
+        statuses = {}
+        deadline = time.perf_counter() + args.seconds
+
+        async def pageClient():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                await request("GET", f"/listing/{listing.id}")
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        async def flooder(index):
+            rng = random.Random(index)
+            headers = [
+                (b"cookie", b"csrftoken=" + token),
+                (b"x-csrftoken", token),
+                (b"content-type", b"application/x-www-form-urlencoded"),
+            ]
+            while time.perf_counter() < deadline:
+                body = f"username=user{rng.randrange(50)}&password=wrong".encode()
+                response = await request("POST", "/login", body, headers, ip=f"10.0.0.{index % args.ips}")
+                statuses[response["status"]] = statuses.get(response["status"], 0) + 1
+                if response["status"] != 200:
+                    # A refused client backs off a little, like a real one would
+                    await asyncio.sleep(0.05)
+
+        tasks = [pageClient() for _ in range(args.pages)]
+        if flood:
+            tasks += [flooder(i) for i in range(args.flooders)]
+        await asyncio.gather(*tasks)
+        return latencies, statuses
+
+    configurations = [
+        ("no flood", False, 2, THROTTLE),
+        ("inline", True, 0, {}),
+        ("pool", True, 2, {}),
+        ("throttled", True, 2, THROTTLE),
+    ]
+    print(f"{'mode':<12}{'pages':>7}{'p50 ms':>9}{'p99 ms':>9}  logins by status")
+    for name, flood, workers, throttle in configurations:
+        settings.AUCTIONS_HASH_WORKERS = workers
+        settings.AUCTIONS_AUTH_THROTTLE = throttle
+        latencies, statuses = asyncio.run(run(flood))
+        print(f"{name:<12}{len(latencies):>7}{percentile(latencies, 50):>9.1f}"
+              f"{percentile(latencies, 99):>9.1f}  {dict(sorted(statuses.items()))}")
+
+
+if __name__ == "__main__":
+    main()
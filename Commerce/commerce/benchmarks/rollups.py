@@ -0,0 +1,112 @@
+"""
+Benchmark for the hourly bid rollups.
+
+Loads a large synthetic Bid table, times the catch-up job folding it into
+the rollups, then compares the analytics queries on the rollups with the
+same aggregates run as GROUP BY over the raw bids. Pass --bids 20000000
+for the tens-of-millions case, it only takes longer to load.
+"""
+
+import argparse
+import random
+from datetime import timedelta
+
+from common import Timer, setupDjango
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bids", type=int, default=1000000)
+    parser.add_argument("--listings", type=int, default=10000)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--hours", type=int, default=24 * 30)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    setupDjango()
+
+    from django.db import connection, transaction
+    from django.db.models import Count, Max
+    from django.db.models.functions import TruncHour
+    from django.utils import timezone
+    from auctions.analytics import bidsPerHour, mostContestedCategories, priceOverTime, rollupStep
+    from auctions.models import User, Listing, Category, Bid
+
+    rng = random.Random(args.seed)
+    owner = User.objects.create_user("owner", "", "pass")
+    categories = Category.objects.bulk_create([
+        Category(name=f"Category {i}", slug=f"category-{i}") for i in range(args.categories)
+    ])
+    listings = Listing.objects.bulk_create([
+        Listing(name=f"Item {i}", description="Thing", price=1, owner=owner, category=rng.choice(categories))
+        for i in range(args.listings)
+    ], batch_size=5000)
+
+    start = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=args.hours)
+    span = args.hours * 3600
+
+    with Timer() as timer:
+        # Straight to SQLite in Django's UTC storage format, the ORM would
+        # dominate the load time
+        with transaction.atomic(), connection.cursor() as cursor:
+            chunk = 100000
+            for offset in range(0, args.bids, chunk):
+                rows = []
+                for _ in range(min(chunk, args.bids - offset)):
+                    date = start + timedelta(seconds=rng.randrange(span))
+                    rows.append((owner.id, rng.choice(listings).id, date.strftime("%Y-%m-%d %H:%M:%S"), rng.uniform(1, 1000)))
+                cursor.executemany(
+                    "INSERT INTO auctions_bid (user_id, listing_id, date, amount) VALUES (%s, %s, %s, %s)", rows
+                )
+    print(f"loaded {args.bids} bids in {timer.elapsed:.1f}s")
+
+    with Timer() as timer:
+        folded = 0
+        while True:
+            step = rollupStep()
+            if not step:
+                break
+            folded += step
+    print(f"rolled up {folded} bids in {timer.elapsed:.1f}s ({folded / timer.elapsed:.0f} bids/s)")
+
+    end = start + timedelta(hours=args.hours)
+    week = end - timedelta(days=7)
+    category = categories[0]
+    listing = listings[0]
+
+    def raw():
+        return {
+            "bids/hour, category, last week": lambda: list(
+                Bid.objects.filter(listing__category=category, date__gte=week, date__lt=end)
+                .annotate(hour=TruncHour("date")).values("hour").annotate(bids=Count("id")).order_by("hour")
+            ),
+            "price over time, one listing": lambda: list(
+                Bid.objects.filter(listing=listing).annotate(hour=TruncHour("date"))
+                .values("hour").annotate(high=Max("amount")).order_by("hour")
+            ),
+            "most contested categories": lambda: list(
+                Bid.objects.filter(date__gte=start, date__lt=end).values("listing__category__name")
+                .annotate(bids=Count("id")).order_by("-bids")[:10]
+            ),
+        }
+
+    rolled = {
+        "bids/hour, category, last week": lambda: bidsPerHour(week, end, categoryId=category.id),
+        "price over time, one listing": lambda: priceOverTime(listing.id),
+        "most contested categories": lambda: mostContestedCategories(start, end),
+    }
+
+    print(f"{'query':<34}{'raw ms':>12}{'rollup ms':>12}")
+    for name, query in raw().items():
+        with Timer() as rawTimer:
+            for _ in range(args.repeat):
+                query()
+        with Timer() as rollupTimer:
+            for _ in range(args.repeat):
+                rolled[name]()
+        print(f"{name:<34}{rawTimer.elapsed / args.repeat * 1000:>12.1f}{rollupTimer.elapsed / args.repeat * 1000:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark for the cached sessions and users.
+
+A logged-in client loads the index, watchlist, create and a listing page
+over and over, first with database sessions and the stock ModelBackend,
+then with the cached_db sessions and auctions.users.CachedUserBackend.
+Reports queries and wall time per page view.
+"""
+
+import argparse
+import time
+
+from common import setupDjango
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--views", type=int, default=400)
+    args = parser.parse_args()
+
+    setupDjango()
+
+    from django.db import connection
+    from django.test import Client, override_settings
+    from django.test.utils import CaptureQueriesContext
+    from auctions.models import User, Listing
+
+    user = User.objects.create_user("bidder", "", "pass")
+    listings = Listing.objects.bulk_create([
+        Listing(name=f"Item {i}", description="Thing", price=1, owner=user) for i in range(50)
+    ])
+    user.watchlist.add(*listings[:10])
+    urls = ["/", "/watchlist", "/create", f"/listing/{listings[0].id}"]
+
+    configurations = {
+        "database": {
+            "SESSION_ENGINE": "django.contrib.sessions.backends.db",
+            "AUTHENTICATION_BACKENDS": ["django.contrib.auth.backends.ModelBackend"],
+        },
+        "cached": {},
+    }
+
+    print(f"{'sessions':<10}{'queries/view':>14}{'ms/view':>10}")
+    for name, overrides in configurations.items():
+        with override_settings(**overrides):
+            client = Client()
+            client.force_login(user)
+            for url in urls:
+                client.get(url)
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                for n in range(args.views):
+                    client.get(urls[n % len(urls)])
+                elapsed = time.perf_counter() - start
+        print(f"{name:<10}{len(queries) / args.views:>14.2f}{elapsed / args.views * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
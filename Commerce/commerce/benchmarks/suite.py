@@ -0,0 +1,277 @@
+"""
+End-to-end benchmark of every route of the auctions app.
+
+Seeds a dataset (--scale multiplies every table), then requests each route
+of auctions/urls.py as an anonymous visitor, a logged-in user, the owner
+of the busiest listing and its high bidder. For every route and user it
+records the status, latency percentiles, SQL queries and rows fetched, and
+compares them with benchmarks/baseline.json:
+
+- any extra query fails (that is how a new N+1 shows up)
+- more rows than the baseline, past --rows-tolerance, fails when the
+  scale is the same as the baseline's
+- a p95 over --latency-tolerance times the baseline, and more than
+  --latency-slack ms over it, fails unless --no-latency is given (latency
+  depends on the machine, and p99 over a few requests is mostly noise)
+- a different status code fails
+
+Exits with status 1 listing every regression. After an intended change,
+refresh the baseline with --update and commit it.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+from datetime import timedelta
+
+from common import Timer, percentile, setupDjango
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+ROLES = ["anonymous", "user", "owner", "bidder"]
+
+
+# FUNCTION
+# NAME:        seed
+# DESCRIPTION: Function will fill the database with a deterministic dataset
+#              and keep the denormalized bid columns of the listings right
+# ARGUMENTS:   It needs the scale and the random seed
+# OUTPUT:      It returns a dict with the users of every role and the
+#              busiest listing
+def seed(scale, seedValue):
+    from django.utils import timezone
+    from auctions.models import User, Listing, Category, Bid, Comment
+
+    rng = random.Random(seedValue)
+    now = timezone.now()
+    users = User.objects.bulk_create([
+        User(username=f"user{i}", email=f"user{i}@example.com") for i in range(20 * scale)
+    ])
+    for user in users[:3]:
+        user.set_password("pass")
+        user.save(update_fields=["password"])
+    categories = [Category.objects.create(name=f"Category {i}") for i in range(10)]
+    listings = Listing.objects.bulk_create([
+        Listing(
+            name=f"Item {i}", description=f"A fairly ordinary thing number {i}", price=1,
+            owner=rng.choice(users), category=rng.choice(categories),
+            end=now + timedelta(days=rng.randint(1, 30)),
+        )
+        for i in range(200 * scale)
+    ], batch_size=5000)
+
+    # The first listing is the busy one every role looks at
+    hot, owner, bidder, user = listings[0], users[0], users[1], users[2]
+    hot.owner = owner
+
+    bids = []
+    for listing in listings:
+        count = 60 if listing is hot else rng.randint(0, 10)
+        bidders = [u for u in rng.sample(users, min(count, len(users))) if u != listing.owner] or [bidder]
+        for n in range(count):
+            who = bidder if listing is hot and n == count - 1 else rng.choice(bidders)
+            listing.price += rng.randint(1, 5)
+            bids.append(Bid(user=who, listing=listing, amount=listing.price))
+            listing.high_bidder = who
+            listing.bid_count += 1
+    Bid.objects.bulk_create(bids, batch_size=5000)
+    Listing.objects.bulk_update(listings, ["owner", "price", "high_bidder", "bid_count"], batch_size=2000)
+
+    Comment.objects.bulk_create([
+        Comment(user=rng.choice(users), listing=listing, comment="Is this still available?")
+        for listing in listings
+        for _ in range(45 if listing is hot else rng.randint(0, 5))
+    ], batch_size=5000)
+
+    Through = User.watchlist.through
+    Through.objects.bulk_create([
+        Through(user_id=u.id, listing_id=listing.id)
+        for u in users
+        for listing in rng.sample(listings, min(20, len(listings)))
+    ], batch_size=5000, ignore_conflicts=True)
+    user.watchlist.add(hot)
+
+    return {"owner": owner, "bidder": bidder, "user": user, "hot": hot, "category": categories[0]}
+
+
+# FUNCTION
+# NAME:        routes
+# DESCRIPTION: Function will list the requests to make, one per route of
+#              auctions/urls.py plus the listing actions
+# ARGUMENTS:   It needs the seeded data
+# OUTPUT:      It returns a list of (name, method, url, data function)
+def routes(data):
+    from django.urls import reverse
+    from auctions.models import Listing
+
+    hot = data["hot"]
+
+    def nextBid():
+        return {"bid": str(Listing.objects.values_list("price", flat=True).get(pk=hot.id) + 1)}
+
+    return [
+        ("index", "get", reverse("index"), None),
+        ("login", "get", reverse("login"), None),
+        ("register", "get", reverse("register"), None),
+        ("categories", "get", reverse("categories"), None),
+        ("category", "get", reverse("category", args=[data["category"].slug]), None),
+        ("search", "get", reverse("search") + "?q=ordinary+thing", None),
+        ("watchlist", "get", reverse("watchlist"), None),
+        ("create", "get", reverse("create"), None),
+        ("listing", "get", reverse("listing", args=[hot.id]), None),
+        ("listing:comment", "post", reverse("listing", args=[hot.id]), lambda: {"comment": "Nice"}),
+        ("listing:bid", "post", reverse("listing", args=[hot.id]), nextBid),
+        ("listingEvents", "get", reverse("listingEvents", args=[hot.id]), None),
+        ("apiListings", "get", reverse("apiListings"), None),
+        ("apiListing", "get", reverse("apiListing", args=[hot.id]), None),
+        ("apiBids", "get", reverse("apiBids", args=[hot.id]), None),
+        ("apiComments", "get", reverse("apiComments", args=[hot.id]), None),
+        ("logout", "get", reverse("logout"), None),
+    ]
+
+
+# FUNCTION
+# NAME:        countRows
+# DESCRIPTION: Function will count the rows the SELECTs of a request return
+#              by running each of them again wrapped in a COUNT
+# ARGUMENTS:   It needs the (sql, params) pairs of the request
+# OUTPUT:      It returns the number of rows
+def countRows(statements):
+    from django.db import connection
+
+    rows = 0
+    with connection.cursor() as cursor:
+        for sql, params in statements:
+            if not sql.lstrip().upper().startswith("SELECT"):
+                continue
+            cursor.execute(f"SELECT COUNT(*) FROM ({sql})", params)
+            rows += cursor.fetchone()[0]
+    return rows
+
+
+# FUNCTION
+# NAME:        measure
+# DESCRIPTION: Function will request every route as every role
+# ARGUMENTS:   It needs the seeded data, the number of measured requests and
+#              of warm-up requests per route
+# OUTPUT:      It returns a dict of results keyed by "route as role"
+def measure(data, iterations, warmup):
+    from django.db import connection
+    from django.test import Client
+
+    results = {}
+    for role in ROLES:
+        client = Client()
+        login = (lambda: client.force_login(data[role])) if role != "anonymous" else (lambda: None)
+        login()
+        for name, method, url, body in routes(data):
+            if method == "post" and role == "anonymous":
+                continue
+            times, queries, status, statements = [], [], None, []
+            for n in range(warmup + iterations):
+                captured = []
+
+                def record(execute, sql, params, many, context):
+                    captured.append((sql, params))
+                    return execute(sql, params, many, context)
+
+                payload = body() if body else None
+                with connection.execute_wrapper(record), Timer() as timer:
+                    response = getattr(client, method)(url, payload) if payload else getattr(client, method)(url)
+                if n >= warmup:
+                    times.append(timer.elapsed * 1000)
+                    queries.append(len(captured))
+                    status, statements = response.status_code, captured
+                if name == "logout":
+                    login()
+            results[f"{name} as {role}"] = {
+                "status": status,
+                "p50": round(percentile(times, 50), 2),
+                "p95": round(percentile(times, 95), 2),
+                "p99": round(percentile(times, 99), 2),
+                "queries": sorted(queries)[len(queries) // 2],
+                "rows": countRows(statements),
+            }
+    return results
+
+
+# FUNCTION
+# NAME:        compare
+# DESCRIPTION: Function will list the regressions of the results against
+#              the baseline
+# ARGUMENTS:   It needs the results, the baseline and the parsed arguments
+# OUTPUT:      It returns a list of messages, empty when nothing regressed
+def compare(results, baseline, args):
+    regressions = []
+    sameScale = baseline.get("scale") == args.scale
+    for key, result in results.items():
+        before = baseline["routes"].get(key)
+        if before is None:
+            continue
+        if result["status"] != before["status"]:
+            regressions.append(f"{key}: status {before['status']} -> {result['status']}")
+        if result["queries"] > before["queries"]:
+            regressions.append(f"{key}: {before['queries']} -> {result['queries']} queries")
+        if sameScale and result["rows"] > before["rows"] * (1 + args.rows_tolerance):
+            regressions.append(f"{key}: {before['rows']} -> {result['rows']} rows fetched")
+        if not args.no_latency and result["p95"] > max(
+            before["p95"] * args.latency_tolerance, before["p95"] + args.latency_slack
+        ):
+            regressions.append(f"{key}: p95 {before['p95']:.1f}ms -> {result['p95']:.1f}ms")
+    for key in baseline["routes"]:
+        if key not in results:
+            regressions.append(f"{key}: no longer measured")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--rows-tolerance", type=float, default=0.1)
+    parser.add_argument("--latency-tolerance", type=float, default=3.0)
+    parser.add_argument("--latency-slack", type=float, default=5.0)
+    parser.add_argument("--no-latency", action="store_true", help="do not compare latencies")
+    parser.add_argument("--update", action="store_true", help="write the results as the new baseline")
+    args = parser.parse_args()
+
+    setupDjango()
+    # Attempts are throttled per IP, and every request comes from the same one
+    from django.conf import settings
+    settings.AUCTIONS_AUTH_THROTTLE = {}
+
+    data = seed(args.scale, args.seed)
+    results = measure(data, args.iterations, args.warmup)
+
+    print(f"{'route':<32}{'status':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'rows':>8}")
+    for key, result in results.items():
+        print(f"{key:<32}{result['status']:>7}{result['p50']:>9.1f}{result['p95']:>9.1f}"
+              f"{result['p99']:>9.1f}{result['queries']:>9}{result['rows']:>8}")
+
+    if args.update:
+        with open(args.baseline, "w") as f:
+            json.dump({"scale": args.scale, "routes": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        sys.exit(f"No baseline at {args.baseline}, run with --update first")
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    regressions = compare(results, baseline, args)
+    if regressions:
+        print(f"\n{len(regressions)} REGRESSIONS against {args.baseline}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"\nNo regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
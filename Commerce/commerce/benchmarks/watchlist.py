@@ -0,0 +1,66 @@
+"""
+Benchmark for watchlist lookups with very large watchlists.
+
+Compares the old membership test, which loaded the whole watchlist into
+Python, with the indexed EXISTS used by the listing page, and a grid page
+checking each card on its own with the batched lookup used by the index.
+"""
+
+import argparse
+
+from common import Timer, setupDjango
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--watched", type=int, default=10000, help="listings in the watchlist")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    setupDjango()
+
+    from auctions.models import User, Listing
+    from auctions.pagination import LISTINGS_PER_PAGE
+    from auctions.watchlist import isWatched, watchedIds
+
+    owner = User.objects.create_user("owner", "", "pass")
+    watcher = User.objects.create_user("watcher", "", "pass")
+    listings = Listing.objects.bulk_create([
+        Listing(name=f"Item {i}", description="Thing", price=1, owner=owner)
+        for i in range(args.watched * 2)
+    ], batch_size=5000)
+    watcher.watchlist.through.objects.bulk_create([
+        watcher.watchlist.through(user_id=watcher.id, listing_id=listing.id)
+        for listing in listings[::2]
+    ], batch_size=5000)
+    target = listings[-1]
+    page = listings[:LISTINGS_PER_PAGE]
+
+    def report(label, timer):
+        print(f"{label:<34} {timer.elapsed / args.repeat * 1000:8.3f} ms")
+
+    print(f"watchlist size: {watcher.watchlist.count()}, page size: {len(page)}")
+
+    with Timer() as timer:
+        for _ in range(args.repeat):
+            target in watcher.watchlist.all()
+    report("single: load whole watchlist", timer)
+
+    with Timer() as timer:
+        for _ in range(args.repeat):
+            isWatched(watcher, target)
+    report("single: indexed EXISTS", timer)
+
+    with Timer() as timer:
+        for _ in range(args.repeat):
+            [isWatched(watcher, listing) for listing in page]
+    report("grid: one EXISTS per card", timer)
+
+    with Timer() as timer:
+        for _ in range(args.repeat):
+            watchedIds(watcher, page)
+    report("grid: batched lookup", timer)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Database settings for commerce.
+
+The database file is switched to WAL once, by migration 0023_sqlite_wal
+of auctions. WAL lets readers run while a bid is being written, instead of
+the whole file being locked for the length of the write. The mode is
+stored in the file, so running migrate rewrites the header of the
+checked-in db.sqlite3 once. Other manage.py commands leave it as it is,
+apart from the db.sqlite3-wal and -shm files SQLite keeps next to it
+(ignored by git).
+
+The other pragmas only last for a connection, so they are run on every
+new connection through init_command:
+
+- synchronous=NORMAL only syncs at WAL checkpoints, which is safe in WAL
+  mode (a power cut can lose the last commits, never corrupt the file).
+- busy_timeout makes a writer wait for the lock instead of failing with
+  "database is locked".
+- cache_size is negative, so it is in KiB rather than pages.
+
+Transactions begin IMMEDIATE so writers queue for the lock when they start
+instead of failing when a read transaction tries to upgrade to a write.
+"""
+
+PRAGMAS = {
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -64000,
+}
+
+# Seconds a connection is kept open between requests. Only applies to WSGI
+# workers: Django closes connections after every request under ASGI.
+CONN_MAX_AGE = 600
+
+
+# FUNCTION
+# NAME:        initCommand
+# DESCRIPTION: Function will turn the pragmas into the statements run on
+#              each new connection
+# ARGUMENTS:   It needs the pragmas as a dict
+# OUTPUT:      It returns the init_command string
+def initCommand(pragmas):
+    return "; ".join(f"PRAGMA {name}={value}" for name, value in pragmas.items())
+
+
+# FUNCTION
+# NAME:        sqliteDatabase
+# DESCRIPTION: Function will build a DATABASES entry for a SQLite file with
+#              the tuning above and persistent connections. A read-only
+#              entry refuses writes through query_only, so a routing mistake
+#              fails loudly instead of writing to a replica.
+# ARGUMENTS:   It needs the file path, and whether the entry is read-only
+# OUTPUT:      It returns the settings dict
+def sqliteDatabase(path, readOnly=False, **pragmas):
+    pragmas = {**PRAGMAS, **pragmas}
+    if readOnly:
+        pragmas["query_only"] = "ON"
+    return {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": path,
+        "CONN_MAX_AGE": CONN_MAX_AGE,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "init_command": initCommand(pragmas),
+            "transaction_mode": None if readOnly else "IMMEDIATE",
+        },
+    }
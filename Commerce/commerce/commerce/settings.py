@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 
 import os
 
+from .database import sqliteDatabase
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -73,16 +75,99 @@ WSGI_APPLICATION = 'commerce.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
+#
+# WAL mode, pragmas and persistent connections are set in commerce/database.py.
+# Set AUCTIONS_DB_REPLICA to the path of a read replica of the database (e.g.
+# kept up to date by Litestream or LiteFS) to serve the index, category and
+# listing pages from it, see auctions/routers.py. Replicas copied
+# asynchronously may show a bid a moment after it was placed.
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    'default': sqliteDatabase(os.environ.get('AUCTIONS_DB', os.path.join(BASE_DIR, 'db.sqlite3'))),
 }
 
+if os.environ.get('AUCTIONS_DB_REPLICA'):
+    DATABASES['replica'] = sqliteDatabase(os.environ['AUCTIONS_DB_REPLICA'], readOnly=True)
+    # Tests run everything against the test copy of the primary
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['auctions.routers.ReplicaRouter']
+
 AUTH_USER_MODEL = 'auctions.User'
 
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+#
+# "cards" holds the rendered listing cards (see auctions/cards.py). "sessions"
+# holds the sessions and logged-in users (see auctions/users.py), apart so
+# other entries do not evict them. Local memory is private to each process:
+# it is fine for the cards, which expire on their own, but with several
+# worker processes a logout in one of them would leave the session valid in
+# the others. Deployments running more than one worker must point the
+# sessions alias at a cache server shared by all of them, through the
+# environment:
+#
+#   AUCTIONS_SESSIONS_CACHE=django.core.cache.backends.redis.RedisCache
+#   AUCTIONS_SESSIONS_CACHE_LOCATION=redis://127.0.0.1:6379/1
+#
+# or PyMemcacheCache with host:port. Without them, as in the tests, the
+# sessions stay in local memory.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sessions': {
+        'BACKEND': os.environ.get('AUCTIONS_SESSIONS_CACHE', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('AUCTIONS_SESSIONS_CACHE_LOCATION', 'sessions'),
+    },
+    'cards': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'listing-cards',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+        },
+    },
+}
+
+# Cache servers take client options instead of an entry cap
+if CACHES['sessions']['BACKEND'].endswith('.LocMemCache'):
+    CACHES['sessions']['OPTIONS'] = {'MAX_ENTRIES': 100000}
+
+# Sessions are read from the cache and written through to the database, which
+# still has them when the cache loses them. Users are resolved from the cache
+# for a short time, see auctions/users.py.
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+SESSION_CACHE_ALIAS = 'sessions'
+
+AUTHENTICATION_BACKENDS = ['auctions.users.CachedUserBackend']
+
+# Login and register hash passwords on a pool of this many threads, so a burst
+# of logins cannot hold up the threads serving pages (see auctions/hashing.py).
+# Set to 0 to hash on the request's own thread.
+
+AUCTIONS_HASH_WORKERS = 2
+
+# Token buckets throttling login and register attempts, as (burst, tokens
+# refilled per second) per client IP and per username (see
+# auctions/throttle.py). Remove an entry to turn that throttle off.
+
+AUCTIONS_AUTH_THROTTLE = {
+    'ip': (20, 1 / 3),
+    'username': (5, 1 / 60),
+}
+
+# Pub/sub carrying live bid updates to the listing pages (see auctions/live.py).
+# The local broker only reaches clients of the same worker process, replace it
+# with a class exposing publish() and subscribe() over a shared broker when
+# running several workers. Streams need an ASGI server, e.g.
+# uvicorn commerce.asgi:application
+
+AUCTIONS_LIVE_BROKER = 'auctions.live.LocalBroker'
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -124,4 +209,18 @@ STATIC_URL = '/static/'
 MEDIA_URL  = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
-MEDIA_URL  = "/media/"
\ No newline at end of file
+MEDIA_URL  = "/media/"
+
+# Listing photos are resized into variants under MEDIA_ROOT/photos by a pool
+# of background threads (see auctions/photos.py). The variant file names are
+# content hashes, so the web server can serve /media/photos/ with a
+# far-future Cache-Control. Set to 0 to leave the work to
+# "manage.py processphotos".
+
+AUCTIONS_PHOTO_WORKERS = 2
+
+# Photo urls are only fetched from public addresses, never from loopback,
+# private or link-local ones (cloud metadata). Only the tests, which serve
+# photos from 127.0.0.1, turn loopback on.
+
+AUCTIONS_PHOTO_ALLOW_LOOPBACK = False
@@ -0,0 +1,60 @@
+"""
+Benchmark for the entry catalogue of encyclopedia.util.
+
+Writes --entries Markdown files to a throwaway entries directory, then
+compares listing the directory on every call (what list_entries did
+before the catalogue) with the catalogue: first build, warm reads,
+existence checks, count, and save_entry. Run it from the wiki directory:
+
+    python benchmarks/catalogue.py --entries 100000
+"""
+
+import argparse
+import os
+import re
+import time
+
+from common import setupDjango, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    entries = setupDjango()
+
+    from django.core.files.storage import default_storage
+    from encyclopedia import util
+
+    start = time.perf_counter()
+    for i in range(args.entries):
+        with open(os.path.join(entries, f"Entry {i:06d}.md"), "w") as f:
+            f.write(f"# Entry {i}\n\nSome text.")
+    print(f"wrote {args.entries} files in {time.perf_counter() - start:.1f}s")
+
+    def listDirectory():
+        _, filenames = default_storage.listdir("entries")
+        return list(sorted(re.sub(r"\.md$", "", filename)
+                    for filename in filenames if filename.endswith(".md")))
+
+    probe = f"Entry {args.entries // 2:06d}"
+    rows = [
+        ("list the directory (before)", timed(listDirectory, args.repeat)),
+        ("exists, by listing (before)", timed(lambda: probe in listDirectory(), args.repeat)),
+        ("catalogue first build", timed(lambda: util.EntryCatalogue().sorted_titles(), args.repeat)),
+        ("list_entries, warm", timed(util.list_entries, args.repeat * 100)),
+        ("entry_exists", timed(lambda: util.entry_exists(probe), args.repeat * 100)),
+        ("count_entries", timed(util.count_entries, args.repeat * 100)),
+    ]
+    counter = iter(range(10 ** 9))
+    rows.append(("save_entry, new title", timed(lambda: util.save_entry(f"New {next(counter)}", "# New"), args.repeat)))
+    rows.append(("list_entries after saves", timed(util.list_entries, args.repeat * 100)))
+
+    for name, ms in rows:
+        print(f"{name:<30}{ms:>12.4f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Shared setup for the benchmark scripts.
+
+Every benchmark works on a throwaway entries directory and SQLite file so
+it never touches entries/ or db.sqlite3. Run them from the wiki
+directory, e.g.
+
+    python benchmarks/catalogue.py --entries 100000
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setupDjango(**overrides):
+    """
+    Configures Django with MEDIA_ROOT in a fresh temporary directory, which
+    holds an empty entries directory and the migrated database. Keyword
+    arguments override settings. Returns the path of the entries directory.
+    """
+    if BASE_DIR not in sys.path:
+        sys.path.insert(0, BASE_DIR)
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "wiki.settings")
+
+    import django
+    from django.conf import settings
+
+    media = tempfile.mkdtemp(prefix="wiki-bench-")
+    settings.MEDIA_ROOT = media
+    settings.DATABASES["default"]["NAME"] = os.path.join(media, "bench.sqlite3")
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ["testserver", "localhost"]
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    django.setup()
+
+    from django.core.management import call_command
+    call_command("migrate", verbosity=0, skip_checks=True)
+
+    entries = os.path.join(media, "entries")
+    os.mkdir(entries)
+    return entries
+
+
+def timed(func, repeat):
+    """
+    Returns the mean time of a call of func over repeat calls, in ms.
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
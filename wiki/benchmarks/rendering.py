@@ -0,0 +1,95 @@
+"""
+Benchmark for the rendered Markdown cache of encyclopedia.rendering.
+
+Writes --articles entries of about --size KB each, then requests their
+pages --views times, a few pages being much more popular than the others,
+with one edit through save_entry every --edit-every views. Runs it twice:
+
+- before: a new Markdown renderer converting the entry on every view,
+  which is what the wiki view did before the cache
+- cached: the view as it is, with the memory tier only, or with the disk
+  tier as well when --disk is given
+
+and reports the mean and p95 page time, the hit rate of the cache and the
+render time the hits saved.
+"""
+
+import argparse
+import itertools
+import os
+import random
+import tempfile
+import time
+
+from common import setupDjango
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=50)
+    parser.add_argument("--size", type=int, default=40, help="KB of Markdown per article")
+    parser.add_argument("--views", type=int, default=2000)
+    parser.add_argument("--edit-every", type=int, default=100)
+    parser.add_argument("--disk", action="store_true", help="also use the disk tier")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    entries = setupDjango(
+        WIKI_RENDER_CACHE_DIR=tempfile.mkdtemp(prefix="wiki-rendered-") if args.disk else None,
+    )
+
+    from django.test import Client
+    from markdown2 import Markdown
+    from encyclopedia import rendering, util, views
+
+    section = (
+        "## Section {n}\n\nSome *emphasis*, some **strong** text, a [link](/wiki/Python) "
+        "and `inline code`.\n\n- one item\n- another item\n\n    indented code block\n\n"
+    )
+    titles = [f"Article {i}" for i in range(args.articles)]
+    for title in titles:
+        body, n = [f"# {title}\n\n"], 0
+        while sum(map(len, body)) < args.size * 1024:
+            body.append(section.format(n=n))
+            n += 1
+        with open(os.path.join(entries, f"{title}.md"), "w") as f:
+            f.write("".join(body))
+
+    weights = list(itertools.accumulate(1 / rank for rank in range(1, args.articles + 1)))
+
+    def run():
+        rng = random.Random(args.seed)
+        client = Client()
+        times = []
+        for n in range(args.views):
+            if args.edit_every and n and n % args.edit_every == 0:
+                title = rng.choice(titles)
+                util.save_entry(title, util.get_entry(title) + f"\n\nEdit {n}.\n")
+            title = rng.choices(titles, cum_weights=weights)[0]
+            start = time.perf_counter()
+            response = client.get(f"/wiki/{title}")
+            times.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200
+        times.sort()
+        return sum(times) / len(times), times[int(len(times) * 0.95) - 1]
+
+    cached = views.render_entry
+    views.render_entry = lambda title, content: Markdown().convert(content)
+    rendering.cache.size = 0
+    before = run()
+    views.render_entry = cached
+    rendering.cache.size = None
+    rendering.cache.clear()
+    after = run()
+
+    print(f"{'mode':<10}{'mean ms':>10}{'p95 ms':>10}")
+    print(f"{'before':<10}{before[0]:>10.2f}{before[1]:>10.2f}")
+    print(f"{'cached':<10}{after[0]:>10.2f}{after[1]:>10.2f}")
+    stats = rendering.cache.stats()
+    print(f"\nhit rate {stats['hit_rate']:.1%} ({stats['hits']} hits, {stats['disk_hits']} from disk, "
+          f"{stats['misses']} renders)")
+    print(f"render time spent {stats['render_seconds']:.2f}s, saved by the hits {stats['saved_seconds']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark for the full-text search index of encyclopedia.search.
+
+Writes --entries entries of random words, then measures:
+
+- building the index from scratch, which reads and tokenizes every entry
+- starting again from the saved index, which reads no entry
+- save_entry with the index up to date
+- queries of one to three words against the index, next to the title
+  scan the search did before and to reading every entry for the words
+"""
+
+import argparse
+import os
+import random
+import time
+
+from common import setupDjango, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--words", type=int, default=300, help="words per entry")
+    parser.add_argument("--vocabulary", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    entries = setupDjango()
+    path = os.path.join(os.path.dirname(entries), "search-index.pickle")
+
+    from django.conf import settings
+    from encyclopedia import search, util
+    from encyclopedia.search import SearchIndex
+
+    settings.WIKI_SEARCH_INDEX = path
+    rng = random.Random(args.seed)
+    vocabulary = [f"word{i}" for i in range(args.vocabulary)]
+    # Zipf-like word frequencies, like real text
+    weights = [1 / rank for rank in range(1, args.vocabulary + 1)]
+    for i in range(args.entries):
+        with open(os.path.join(entries, f"Entry {i}.md"), "w") as f:
+            f.write(" ".join(rng.choices(vocabulary, weights, k=args.words)))
+
+    start = time.perf_counter()
+    search.index.search("word1")
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    SearchIndex().search("word1")
+    restart = time.perf_counter() - start
+
+    queries = [" ".join(rng.choices(vocabulary[:2000], k=rng.randint(1, 3))) for _ in range(args.queries)]
+    cycle = iter(queries * 1000)
+
+    def titleScan():
+        query = next(cycle)
+        return [entry for entry in util.list_entries() if query in entry]
+
+    def readEverything():
+        terms = next(cycle).split()
+        return [title for title in util.list_entries()
+                if any(term in util.get_entry(title) for term in terms)]
+
+    counter = iter(range(10 ** 9))
+    rows = [
+        ("build from scratch", build * 1000),
+        ("start from the saved index", restart * 1000),
+        ("title scan (before)", timed(titleScan, args.queries)),
+        ("read every entry", timed(readEverything, 3)),
+        ("index query", timed(lambda: search.index.search(next(cycle)), args.queries)),
+        ("index query with snippets", timed(lambda: search.search_entries(next(cycle)), args.queries)),
+        ("save_entry", timed(lambda: util.save_entry(f"New {next(counter)}", "word1 word2 word3"), 50)),
+    ]
+    print(f"{args.entries} entries, index file {os.path.getsize(path) / 1e6:.1f} MB")
+    for name, ms in rows:
+        print(f"{name:<30}{ms:>12.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark of the two entry stores of encyclopedia.stores.
+
+Writes --entries entries of about --size bytes to the file system store,
+copies them to the database store with the importentries command, then
+measures for both stores:
+
+- listing the titles and the stamp the catalogue checks on every read
+- reading an entry, and looking up a title that does not exist
+- list_entries and entry_exists through the catalogue
+- replacing an entry, alone and through save_entry
+"""
+
+import argparse
+import os
+import random
+import time
+from io import StringIO
+
+from common import setupDjango, timed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    entries = setupDjango(WIKI_SEARCH_INDEX=None)
+
+    from django.conf import settings
+    from django.core.management import call_command
+    from encyclopedia import util
+    from encyclopedia.stores import DatabaseStore, FileSystemStore
+
+    rng = random.Random(args.seed)
+    titles = [f"Entry {i:06d}" for i in range(args.entries)]
+    body = ("Some words of an encyclopedia entry. " * (args.size // 37 + 1))[:args.size]
+
+    start = time.perf_counter()
+    for title in titles:
+        with open(os.path.join(entries, f"{title}.md"), "w") as f:
+            f.write(f"# {title}\n\n{body}")
+    written = time.perf_counter() - start
+    start = time.perf_counter()
+    call_command("importentries", stdout=StringIO())
+    imported = time.perf_counter() - start
+    print(f"{args.entries} entries: files written in {written:.1f}s, imported into the database in {imported:.1f}s")
+
+    stores = [
+        ("files", "encyclopedia.stores.FileSystemStore", FileSystemStore()),
+        ("database", "encyclopedia.stores.DatabaseStore", DatabaseStore()),
+    ]
+    results = {}
+    for name, path, store in stores:
+        settings.WIKI_ENTRY_STORE = path
+        picks = iter([rng.choice(titles) for _ in range(args.repeat * 10)])
+        counter = iter(range(10 ** 9))
+        util.list_entries()
+        results[name] = [
+            ("titles", timed(store.titles, 3)),
+            ("stamp", timed(store.stamp, args.repeat)),
+            ("read", timed(lambda: store.read(next(picks)), args.repeat)),
+            ("read missing", timed(lambda: store.read("Nothing here"), args.repeat)),
+            ("list_entries, warm", timed(util.list_entries, args.repeat)),
+            ("entry_exists", timed(lambda: util.entry_exists(next(picks)), args.repeat)),
+            ("write", timed(lambda: store.write(next(picks), "# Replaced"), args.repeat)),
+            ("save_entry, new title", timed(lambda: util.save_entry(f"{name} {next(counter)}", "# New"), 50)),
+        ]
+
+    print(f"{'ms per call':<24}{'files':>12}{'database':>12}")
+    for (label, files), (_, database) in zip(results["files"], results["database"]):
+        print(f"{label:<24}{files:>12.3f}{database:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
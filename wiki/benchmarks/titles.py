@@ -0,0 +1,83 @@
+"""
+Benchmark for the title index of encyclopedia.titles.
+
+Writes --entries entries with titles of one to three made up words, then
+measures building the index and looking titles up as the search box
+does: prefixes of existing titles, titles with a typo, and queries
+matching nothing, next to the substring scan the search did before.
+Also times the autocomplete route through the test client.
+"""
+
+import argparse
+import os
+import random
+import time
+
+from common import setupDjango, timed
+
+# Made up words from these sound like real titles, with about as many
+# different trigrams
+SYLLABLES = [
+    "ka", "lo", "mi", "tor", "en", "sa", "ri", "ven", "ta", "no", "bel", "dra", "qu", "is", "ar", "pe",
+    "ston", "gle", "wi", "ham", "ux", "op", "cra", "phy", "zo", "lin", "dus", "me", "ter", "gra", "fo", "bur",
+    "chi", "val", "ne", "oc", "sy", "pha", "rum", "tle", "ob", "ju", "kel", "mon", "ith", "ae", "scu", "vi",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    entries = setupDjango()
+
+    from django.test import Client
+    from encyclopedia import titles, util
+
+    rng = random.Random(args.seed)
+
+    def word():
+        return "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))).title()
+
+    names = set()
+    while len(names) < args.entries:
+        names.add(" ".join(word() for _ in range(rng.randint(1, 3))))
+    for name in names:
+        open(os.path.join(entries, f"{name}.md"), "w").close()
+    names = sorted(names)
+
+    def typo(text):
+        i = rng.randrange(len(text))
+        return text[:i] + rng.choice("aeiourst") + text[i + 1:]
+
+    start = time.perf_counter()
+    titles.index.lookup("warm up")
+    build = (time.perf_counter() - start) * 1000
+
+    sets = {
+        "prefix": [rng.choice(names)[:rng.randint(2, 6)].lower() for _ in range(args.queries)],
+        "typo": [typo(rng.choice(names)) for _ in range(args.queries)],
+        "no match": ["xyzzy" + str(i) for i in range(args.queries)],
+    }
+    client = Client()
+    print(f"{args.entries} titles, index built in {build:.0f} ms")
+    print(f"{'queries':<10}{'scan (before)':>15}{'lookup':>10}{'route':>10}  ms per query")
+    for name, queries in sets.items():
+        cycle = iter(queries * 3)
+
+        def scanTitles():
+            query = next(cycle)
+            return [title for title in util.list_entries() if query in title]
+
+        scan = timed(scanTitles, 20)
+        cycle = iter(queries * 3)
+        lookup = timed(lambda: titles.index.lookup(next(cycle)), len(queries))
+        cycle = iter(queries * 3)
+        route = timed(lambda: client.get("/autocomplete", {"q": next(cycle)}), len(queries))
+        print(f"{name:<10}{scan:>15.3f}{lookup:>10.3f}{route:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
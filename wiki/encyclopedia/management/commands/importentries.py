@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from encyclopedia.stores import DatabaseStore, FileSystemStore
+
+
+class Command(BaseCommand):
+    help = (
+        "Copies the entries of the entries directory into the Entry table used by "
+        "encyclopedia.stores.DatabaseStore, in batches and in one transaction, so an "
+        "interrupted import leaves the table as it was. Entries already in the table "
+        "are replaced. Switch WIKI_ENTRY_STORE once it is done."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--directory", default="entries", help="Directory of the default storage to read.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("The batch size must be at least 1.")
+        source = FileSystemStore(options["directory"])
+        target = DatabaseStore(batch_size=options["batch_size"])
+        titles = sorted(source.titles())
+        if not titles:
+            raise CommandError(f"No entries in \"{options['directory']}\".")
+
+        start = time.perf_counter()
+        imported = 0
+        with transaction.atomic():
+            for offset in range(0, len(titles), options["batch_size"]):
+                batch = []
+                for title in titles[offset:offset + options["batch_size"]]:
+                    content = source.read(title)
+                    if content is not None:
+                        batch.append((title, content))
+                target.write_many(batch)
+                imported += len(batch)
+                self.stdout.write(f"{imported}/{len(titles)} entries")
+        seconds = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} entries in {seconds:.1f}s ({imported / max(seconds, 1e-9):.0f} entries/s)."
+        ))
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Entry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255, unique=True)),
+                ('content', models.TextField()),
+                ('updated', models.DateTimeField(auto_now=True, db_index=True)),
+            ],
+            options={
+                'verbose_name_plural': 'entries',
+            },
+        ),
+    ]
@@ -1,3 +1,18 @@
 from django.db import models
 
-# Create your models here.
+
+class Entry(models.Model):
+    """
+    An encyclopedia entry, for the database entry store. The title is
+    unique, so it is indexed, and updated tells other processes that
+    something changed.
+    """
+    title = models.CharField(max_length=255, unique=True)
+    content = models.TextField()
+    updated = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        verbose_name_plural = "entries"
+
+    def __str__(self):
+        return self.title
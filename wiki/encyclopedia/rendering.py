@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+import markdown2
+from django.conf import settings
+
+_local = threading.local()
+
+
+def get_renderer():
+    """
+    Returns the Markdown renderer of the current thread. Building one
+    compiles its regular expressions, so every thread keeps its own
+    instead of building one per page view; convert resets it between
+    documents.
+    """
+    renderer = getattr(_local, "renderer", None)
+    if renderer is None:
+        renderer = _local.renderer = markdown2.Markdown()
+    return renderer
+
+
+def content_key(content):
+    """
+    Returns the cache key of a Markdown source: a hash of the content and
+    of the markdown2 version, so an upgrade never serves stale HTML.
+    """
+    source = f"{markdown2.__version__}\0{content}".encode("utf-8")
+    return hashlib.sha256(source).hexdigest()
+
+
+class RenderCache:
+    """
+    Rendered HTML of the entries, keyed by the hash of their Markdown.
+
+    The memory tier is an LRU of WIKI_RENDER_CACHE_SIZE pages. When
+    WIKI_RENDER_CACHE_DIR is set, pages are also written there, one file
+    per key, so they survive restarts and are shared between processes.
+    Since the key is the content, an edited entry simply gets a new key;
+    entry_saved drops the old one and renders the new content right away.
+    """
+
+    def __init__(self, size=None, directory=None):
+        self.size = size
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.pages = OrderedDict()
+        self.keys = {}
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.render_seconds = 0.0
+        self.saved_seconds = 0.0
+
+    def max_size(self):
+        if self.size is not None:
+            return self.size
+        return getattr(settings, "WIKI_RENDER_CACHE_SIZE", 256)
+
+    def disk_directory(self):
+        if self.directory is not None:
+            return self.directory
+        return getattr(settings, "WIKI_RENDER_CACHE_DIR", None)
+
+    def disk_path(self, key):
+        directory = self.disk_directory()
+        if not directory:
+            return None
+        return os.path.join(directory, key[:2], f"{key}.json")
+
+    def read_disk(self, key):
+        path = self.disk_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                page = json.load(f)
+            return page["html"], page["seconds"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def write_disk(self, key, html, seconds):
+        path = self.disk_path(key)
+        if path is None:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside then renamed, so readers never see half a page
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"html": html, "seconds": seconds}, f)
+        os.replace(temporary, path)
+
+    def remember(self, key, page):
+        with self.lock:
+            self.pages[key] = page
+            self.pages.move_to_end(key)
+            while len(self.pages) > max(self.max_size(), 0):
+                self.pages.popitem(last=False)
+
+    def render(self, content, title=None):
+        """
+        Returns the HTML of a Markdown source, from the cache when it can.
+        The render time of every page is kept with it, to tell how much
+        time the hits saved.
+        """
+        key = content_key(content)
+        with self.lock:
+            if title is not None:
+                self.keys[title] = key
+            page = self.pages.get(key)
+            if page is not None:
+                self.pages.move_to_end(key)
+                self.hits += 1
+                self.saved_seconds += page[1]
+                return page[0]
+
+        page = self.read_disk(key)
+        if page is not None:
+            with self.lock:
+                self.hits += 1
+                self.disk_hits += 1
+                self.saved_seconds += page[1]
+            self.remember(key, page)
+            return page[0]
+
+        start = time.perf_counter()
+        html = get_renderer().convert(content)
+        seconds = time.perf_counter() - start
+        with self.lock:
+            self.misses += 1
+            self.render_seconds += seconds
+        self.remember(key, (html, seconds))
+        self.write_disk(key, html, seconds)
+        return html
+
+    def entry_saved(self, title, content):
+        """
+        Forgets the HTML of the previous content of an entry and renders
+        the new one, so the next view of the page is a hit.
+        """
+        key = content_key(content)
+        with self.lock:
+            previous = self.keys.pop(title, None)
+            if previous is not None and previous != key:
+                self.pages.pop(previous, None)
+        if previous is not None and previous != key:
+            path = self.disk_path(previous)
+            if path is not None:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        self.render(content, title)
+
+    def clear(self):
+        with self.lock:
+            self.pages.clear()
+            self.keys.clear()
+            self.reset_stats()
+
+    def stats(self):
+        """
+        Returns the counters of the cache: hits (memory and disk), misses,
+        hit rate, time spent rendering and render time saved by the hits.
+        """
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "pages": len(self.pages),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "render_seconds": self.render_seconds,
+                "saved_seconds": self.saved_seconds,
+            }
+
+
+cache = RenderCache()
+
+
+def render_entry(title, content):
+    """
+    Returns the HTML of an encyclopedia entry, given its title and
+    Markdown content.
+    """
+    return cache.render(content, title)
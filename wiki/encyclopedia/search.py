@@ -0,0 +1,246 @@
+import math
+import os
+import pickle
+import re
+import sys
+import tempfile
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from . import util
+
+# BM25 parameters: how fast repeated terms stop adding to the score, and
+# how much long entries are penalized
+K1 = 1.5
+B = 0.75
+
+# Bumped whenever the tokenizer or the file format changes
+INDEX_VERSION = 1
+
+WORD = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """
+    Splits a text into lowercase words.
+    """
+    return WORD.findall(text.lower())
+
+
+class SearchIndex:
+    """
+    Inverted index over the title and content of the entries, ranked with
+    BM25.
+
+    For every word the index keeps the entries containing it and how often
+    (the postings), and for every entry its words, to take it out of the
+    postings when it changes. Both are pickled to WIKI_SEARCH_INDEX, like
+    the file based cache of Django does, so loading the index needs no
+    tokenizing and no rebuilding.
+
+    The index is built the first time it is used. Entries that changed
+    since they were indexed, according to the signature the entry store
+    gives them, are indexed again and the others are taken from the saved
+    index. save_entry updates the entry in place. When the catalogue sees
+    files change behind our back, the files are checked again.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.RLock()
+        self.docs = {}
+        self.postings = {}
+        self.lengths = {}
+        self.total_length = 0
+        self.generation = None
+
+    def index_path(self):
+        if self.path is not None:
+            return self.path
+        return getattr(settings, "WIKI_SEARCH_INDEX", None)
+
+    def add(self, title, content, signature):
+        terms = Counter(tokenize(title))
+        terms.update(tokenize(content))
+        # One string per word, shared by the postings and the entries, which
+        # also keeps the pickle small
+        terms = {sys.intern(term): count for term, count in terms.items()}
+        self.remove(title)
+        self.docs[title] = (signature, list(terms))
+        self.lengths[title] = sum(terms.values())
+        self.total_length += self.lengths[title]
+        for term, count in terms.items():
+            self.postings.setdefault(term, {})[title] = count
+
+    def remove(self, title):
+        doc = self.docs.pop(title, None)
+        if doc is None:
+            return
+        self.total_length -= self.lengths.pop(title)
+        for term in doc[1]:
+            postings = self.postings[term]
+            del postings[title]
+            if not postings:
+                del self.postings[term]
+
+    def reset(self):
+        """
+        Forgets the index in memory, the next search loads it again.
+        """
+        with self.lock:
+            self.docs, self.postings, self.lengths, self.total_length = {}, {}, {}, 0
+            self.generation = None
+
+    def load(self):
+        """
+        Reads the saved index. A missing, broken or outdated file leaves
+        the index empty.
+        """
+        path = self.index_path()
+        self.docs, self.postings, self.lengths, self.total_length = {}, {}, {}, 0
+        if not path:
+            return
+        try:
+            with open(path, "rb") as f:
+                saved = pickle.load(f)
+        except (OSError, EOFError, ValueError, pickle.PickleError):
+            return
+        if not isinstance(saved, dict) or saved.get("version") != INDEX_VERSION:
+            return
+        self.postings = saved["postings"]
+        for title, (signature, length, terms) in saved["docs"].items():
+            self.docs[title] = (signature, terms)
+            self.lengths[title] = length
+        self.total_length = sum(self.lengths.values())
+
+    def dump(self):
+        path = self.index_path()
+        if not path:
+            return
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # Written aside then renamed, so a crash never leaves half a file
+        fd, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            docs = {title: (signature, self.lengths[title], terms)
+                    for title, (signature, terms) in self.docs.items()}
+            pickle.dump({"version": INDEX_VERSION, "docs": docs, "postings": self.postings}, f,
+                        pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary, path)
+
+    def sync(self):
+        """
+        Brings the index up to date with the entries directory, indexing
+        only the entries that are new or changed, and saves it if anything
+        changed.
+        """
+        # Listing the entries also refreshes the catalogue
+        titles = util.list_entries()
+        if self.generation == util.catalogue.generation:
+            return
+        with self.lock:
+            if self.generation is None:
+                self.load()
+            changed = False
+            for title in set(self.docs) - set(titles):
+                self.remove(title)
+                changed = True
+            for title in titles:
+                signature = util.entry_signature(title)
+                doc = self.docs.get(title)
+                if doc is not None and signature is not None and doc[0] == signature:
+                    continue
+                content = util.get_entry(title)
+                if content is None:
+                    continue
+                self.add(title, content, signature)
+                changed = True
+            if changed:
+                self.dump()
+            self.generation = util.catalogue.generation
+
+    def entry_saved(self, title, content, generation):
+        """
+        Indexes the new content of an entry. The saved file is not written
+        again: the next start notices the entry changed and indexes it.
+        """
+        with self.lock:
+            if self.generation is None:
+                # Never built, the first search will read everything anyway
+                return
+            self.add(title, content, util.entry_signature(title))
+            # Only this entry changed if the index was current before the save
+            if self.generation == generation - 1:
+                self.generation = generation
+
+    def search(self, query, limit=20):
+        """
+        Returns the titles of the entries matching any word of the query,
+        best first, with their BM25 score.
+        """
+        self.sync()
+        terms = set(tokenize(query))
+        with self.lock:
+            count = len(self.docs)
+            if not count or not terms:
+                return []
+            average = self.total_length / count
+            scores = Counter()
+            for term in terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for title, frequency in postings.items():
+                    length = self.lengths[title]
+                    scores[title] += idf * frequency * (K1 + 1) / (
+                        frequency + K1 * (1 - B + B * length / average)
+                    )
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+def snippet(content, query, width=80):
+    """
+    Returns a short, HTML-safe piece of an entry around the first word of
+    the query it contains, with the words of the query highlighted.
+    """
+    terms = set(tokenize(query))
+    first = next((word for word in WORD.finditer(content) if word.group().lower() in terms), None)
+    center = first.start() if first else 0
+    start = max(0, center - width // 2)
+    end = min(len(content), start + width)
+    # Whole words only at both ends
+    while start > 0 and content[start - 1].isalnum():
+        start -= 1
+    while end < len(content) and content[end].isalnum():
+        end += 1
+
+    parts = []
+    position = start
+    for word in WORD.finditer(content, start, end):
+        if word.group().lower() in terms:
+            parts.append(escape(content[position:word.start()]))
+            parts.append(f"<mark>{escape(word.group())}</mark>")
+            position = word.end()
+    parts.append(escape(content[position:end]))
+    text = " ".join("".join(parts).split())
+    return mark_safe(("… " if start > 0 else "") + text + (" …" if end < len(content) else ""))
+
+
+index = SearchIndex()
+
+
+def search_entries(query, limit=20):
+    """
+    Returns the entries matching a query, best first, as dicts with the
+    title and a snippet of the content.
+    """
+    results = []
+    for title, score in index.search(query, limit):
+        content = util.get_entry(title) or ""
+        results.append({"title": title, "score": score, "snippet": snippet(content, query)})
+    return results
@@ -0,0 +1,30 @@
+// Fills the suggestions of the search box with the titles of the
+// autocomplete route as the user types
+document.addEventListener('DOMContentLoaded', () => {
+    const input = document.querySelector('.search');
+    const suggestions = document.querySelector('#suggestions');
+    let latest = 0;
+
+    input.addEventListener('input', () => {
+        const query = input.value.trim();
+        const request = ++latest;
+        if (query === '') {
+            suggestions.innerHTML = '';
+            return;
+        }
+        fetch(`${input.dataset.url}?q=${encodeURIComponent(query)}`)
+            .then(response => response.json())
+            .then(data => {
+                // Answers can come back out of order, only keep the last one
+                if (request !== latest) {
+                    return;
+                }
+                suggestions.innerHTML = '';
+                data.results.forEach(title => {
+                    const option = document.createElement('option');
+                    option.value = title;
+                    suggestions.append(option);
+                });
+            });
+    });
+});
@@ -0,0 +1,190 @@
+import abc
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.utils import validate_file_name
+from django.db import transaction
+from django.db.models import Max
+from django.utils.module_loading import import_string
+
+from .models import Entry
+
+
+class EntryStore(abc.ABC):
+    """
+    Where the entries are kept. The functions of util only go through
+    these methods, so the entries can live anywhere that provides them.
+    """
+
+    @abc.abstractmethod
+    def titles(self):
+        """
+        Returns the titles of all the entries, in any order.
+        """
+
+    @abc.abstractmethod
+    def read(self, title):
+        """
+        Returns the Markdown content of an entry, or None if there is no
+        such entry.
+        """
+
+    @abc.abstractmethod
+    def write(self, title, content):
+        """
+        Creates or replaces an entry. Readers see either the previous
+        content or the new one, never a mix.
+        """
+
+    def write_many(self, entries):
+        """
+        Creates or replaces many entries, given (title, content) pairs.
+        """
+        for title, content in entries:
+            self.write(title, content)
+
+    @abc.abstractmethod
+    def stamp(self):
+        """
+        Returns a cheap value that changes whenever entries are added or
+        changed, by this process or another one.
+        """
+
+    def signature(self, title):
+        """
+        Returns a value that changes whenever this entry changes, or None
+        if the store cannot tell.
+        """
+        return None
+
+
+class FileSystemStore(EntryStore):
+    """
+    One Markdown file per entry, entries/<title>.md, in the default
+    storage. The stamp is the modification time of the directory and the
+    signature of an entry the modification time and size of its file.
+    """
+
+    def __init__(self, directory="entries"):
+        self.directory = directory
+
+    def filename(self, title):
+        # A title is one file of the directory, never a path: "../x" or
+        # "a/b" raise SuspiciousFileOperation instead of writing elsewhere
+        validate_file_name(f"{title}.md")
+        return f"{self.directory}/{title}.md"
+
+    def local_path(self, name):
+        try:
+            return default_storage.path(name)
+        except NotImplementedError:
+            return None
+
+    def titles(self):
+        try:
+            _, filenames = default_storage.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return [re.sub(r"\.md$", "", filename) for filename in filenames if filename.endswith(".md")]
+
+    def read(self, title):
+        try:
+            f = default_storage.open(self.filename(title))
+            return f.read().decode("utf-8")
+        except FileNotFoundError:
+            return None
+
+    def write(self, title, content):
+        filename = self.filename(title)
+        path = self.local_path(filename)
+        if path is None:
+            if default_storage.exists(filename):
+                default_storage.delete(filename)
+            default_storage.save(filename, ContentFile(content))
+            return
+        # Written aside then renamed over the entry, so it is never missing
+        # or half written
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content.encode("utf-8"))
+        os.chmod(temporary, settings.FILE_UPLOAD_PERMISSIONS or 0o644)
+        os.replace(temporary, path)
+
+    def stamp(self):
+        path = self.local_path(self.directory)
+        if path is None:
+            # Storages without local paths cannot tell, only writes through
+            # this process are seen
+            return "remote"
+        try:
+            return (path, os.stat(path).st_mtime_ns)
+        except FileNotFoundError:
+            return (path, None)
+
+    def signature(self, title):
+        path = self.local_path(self.filename(title))
+        try:
+            stat = os.stat(path) if path else None
+        except FileNotFoundError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size] if stat else None
+
+
+class DatabaseStore(EntryStore):
+    """
+    The entries as rows of the Entry model, in the database of the
+    project, a single SQLite file. Titles are looked up through the unique
+    index of their column, and a write is a single upsert, which SQLite
+    applies in one transaction. The stamp is the number of entries, so
+    deletions count too, and the latest update time, read from its index.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+
+    def titles(self):
+        return list(Entry.objects.values_list("title", flat=True))
+
+    def read(self, title):
+        return Entry.objects.filter(title=title).values_list("content", flat=True).first()
+
+    def write(self, title, content):
+        self.write_many([(title, content)])
+
+    def write_many(self, entries):
+        entries = list(entries)
+        with transaction.atomic():
+            for start in range(0, len(entries), self.batch_size):
+                Entry.objects.bulk_create(
+                    [Entry(title=title, content=content) for title, content in entries[start:start + self.batch_size]],
+                    update_conflicts=True, unique_fields=["title"], update_fields=["content", "updated"],
+                )
+
+    def stamp(self):
+        # Two queries: together in one, SQLite no longer reads the maximum
+        # from the index
+        return (Entry.objects.count(), Entry.objects.aggregate(latest=Max("updated"))["latest"])
+
+    def signature(self, title):
+        updated = Entry.objects.filter(title=title).values_list("updated", flat=True).first()
+        return updated.isoformat() if updated else None
+
+
+_stores = {}
+
+
+def get_store():
+    """
+    Returns the entry store named by the WIKI_ENTRY_STORE setting, one
+    instance per process.
+    """
+    path = getattr(settings, "WIKI_ENTRY_STORE", "encyclopedia.stores.FileSystemStore")
+    store = _stores.get(path)
+    if store is None:
+        store = _stores[path] = import_string(path)()
+    return store
@@ -1,3 +1,316 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import rendering, search, titles, util
+from .rendering import RenderCache
+from .models import Entry
+from .search import SearchIndex
+from .stores import DatabaseStore, FileSystemStore
+from .titles import TitleIndex, edit_distance
+from .util import EntryCatalogue
+
+
+class EntriesMixin:
+    """
+    Runs every test with MEDIA_ROOT in a fresh temporary directory, holding
+    an empty entries directory.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        self.overrideSettings(MEDIA_ROOT=self.media)
+        self.entries = os.path.join(self.media, "entries")
+        os.mkdir(self.entries)
+
+    def overrideSettings(self, **settings):
+        override = override_settings(**settings)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def writeFile(self, title, content=None):
+        with open(os.path.join(self.entries, f"{title}.md"), "w") as f:
+            f.write(f"# {title}" if content is None else content)
+        # Make sure the directory looks changed even on coarse clocks
+        stat = os.stat(self.entries)
+        os.utime(self.entries, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+
+
+class EntryCatalogueTests(EntriesMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for title in ["Python", "CSS", "Git"]:
+            self.writeFile(title)
+
+    def test_titles_existence_and_count(self):
+        catalogue = EntryCatalogue()
+        self.assertEqual(catalogue.sorted_titles(), ("CSS", "Git", "Python"))
+        self.assertIn("Git", catalogue)
+        self.assertNotIn("git", catalogue)
+        self.assertEqual(len(catalogue), 3)
+
+    def test_directory_is_read_once(self):
+        catalogue = EntryCatalogue()
+        with mock.patch.object(default_storage, "listdir", wraps=default_storage.listdir) as listdir:
+            for _ in range(5):
+                catalogue.sorted_titles()
+                self.assertIn("CSS", catalogue)
+        self.assertEqual(listdir.call_count, 1)
+
+    def test_save_updates_in_place(self):
+        catalogue = EntryCatalogue()
+        catalogue.sorted_titles()
+        generation = catalogue.generation
+        with mock.patch.object(default_storage, "listdir", wraps=default_storage.listdir) as listdir:
+            catalogue.save("HTML", "# HTML")
+            self.assertEqual(catalogue.sorted_titles(), ("CSS", "Git", "HTML", "Python"))
+        self.assertEqual(listdir.call_count, 0)
+        self.assertGreater(catalogue.generation, generation)
+        self.assertEqual(util.get_entry("HTML"), "# HTML")
+
+    def test_files_added_elsewhere_are_picked_up(self):
+        catalogue = EntryCatalogue()
+        self.assertEqual(len(catalogue), 3)
+        self.writeFile("Django")
+        self.assertIn("Django", catalogue)
+        os.remove(os.path.join(self.entries, "CSS.md"))
+        self.writeFile("Git")
+        self.assertNotIn("CSS", catalogue)
+
+    def test_search_for_an_exact_title_shows_the_entry(self):
+        response = self.client.get(reverse("index"), {"q": "Python"}, follow=True)
+        self.assertRedirects(response, reverse("wiki", args=["Python"]))
+        self.assertContains(response, "<h1>Python</h1>", html=True)
+
+
+class RenderCacheTests(EntriesMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        rendering.cache.clear()
+        self.addCleanup(rendering.cache.clear)
+
+    def test_same_content_is_rendered_once(self):
+        cache = RenderCache(size=10)
+        with mock.patch.object(rendering, "get_renderer", wraps=rendering.get_renderer) as renderer:
+            for _ in range(3):
+                self.assertEqual(cache.render("# Git"), "<h1>Git</h1>\n")
+        self.assertEqual(renderer.call_count, 1)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 1))
+        self.assertAlmostEqual(stats["hit_rate"], 2 / 3)
+
+    def test_least_recently_used_page_is_dropped(self):
+        cache = RenderCache(size=2)
+        cache.render("# A")
+        cache.render("# B")
+        cache.render("# A")
+        cache.render("# C")
+        self.assertEqual(list(cache.pages), [rendering.content_key("# A"), rendering.content_key("# C")])
+
+    def test_disk_tier_outlives_the_memory_tier(self):
+        directory = os.path.join(self.media, "rendered")
+        RenderCache(size=10, directory=directory).render("# Disk")
+        cache = RenderCache(size=10, directory=directory)
+        self.assertEqual(cache.render("# Disk"), "<h1>Disk</h1>\n")
+        self.assertEqual(cache.stats()["disk_hits"], 1)
+
+    def test_save_entry_renders_the_new_content(self):
+        util.save_entry("Git", "# Old")
+        util.save_entry("Git", "# New")
+        self.assertNotIn(rendering.content_key("# Old"), rendering.cache.pages)
+        response = self.client.get(reverse("wiki", args=["Git"]))
+        self.assertContains(response, "<h1>New</h1>", html=True)
+        self.assertEqual(rendering.cache.stats()["misses"], 2)
+        self.assertEqual(rendering.cache.stats()["hits"], 1)
+
+    def test_renderer_is_kept_per_thread(self):
+        self.assertIs(rendering.get_renderer(), rendering.get_renderer())
+        other = []
+        thread = threading.Thread(target=lambda: other.append(rendering.get_renderer()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], rendering.get_renderer())
+
+
+class SearchIndexTests(EntriesMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.media, "search-index.pickle")
+        self.overrideSettings(WIKI_SEARCH_INDEX=self.path)
+        search.index.reset()
+        self.addCleanup(search.index.reset)
+        self.writeFile("Python", "Python is a programming language. Python code is readable.")
+        self.writeFile("Django", "Django is a web framework written in Python.")
+        self.writeFile("CSS", "CSS styles web pages.")
+
+    def titles(self, query):
+        return [title for title, score in SearchIndex().search(query)]
+
+    def test_multi_term_queries_are_ranked(self):
+        self.assertEqual(self.titles("python"), ["Python", "Django"])
+        self.assertEqual(self.titles("web framework"), ["Django", "CSS"])
+        self.assertEqual(self.titles("nothing here"), [])
+
+    def test_index_is_saved_and_only_changed_entries_are_read_again(self):
+        SearchIndex().search("python")
+        self.assertTrue(os.path.exists(self.path))
+        self.writeFile("CSS", "CSS styles web pages, and Python does not.")
+        with mock.patch.object(util, "get_entry", wraps=util.get_entry) as get_entry:
+            self.assertEqual(self.titles("python")[0], "Python")
+        self.assertEqual([c.args for c in get_entry.call_args_list], [("CSS",)])
+
+    def test_save_entry_updates_the_index(self):
+        self.assertEqual(search.index.search("javascript"), [])
+        util.save_entry("JavaScript", "JavaScript runs in the browser.")
+        util.save_entry("CSS", "Nothing left.")
+        with mock.patch.object(util, "get_entry", wraps=util.get_entry) as get_entry:
+            self.assertEqual([title for title, score in search.index.search("javascript")], ["JavaScript"])
+            self.assertEqual(search.index.search("styles"), [])
+        self.assertEqual(get_entry.call_count, 0)
+
+    def test_search_page_shows_snippets(self):
+        response = self.client.get(reverse("index"), {"q": "framework"})
+        self.assertContains(response, "a web <mark>framework</mark> written")
+
+    def test_search_page_still_matches_parts_of_titles(self):
+        response = self.client.get(reverse("index"), {"q": "jang"})
+        self.assertContains(response, 'href="/wiki/Django"')
+
+
+class TitleIndexTests(EntriesMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for title in ["Python", "PyTorch", "Django", "HTML", "Git", "GitHub", "JavaScript", "Java"]:
+            self.writeFile(title)
+        self.index = TitleIndex()
+
+    def test_edit_distance_stops_at_the_limit(self):
+        self.assertEqual(edit_distance("python", "pyhton", 2), 2)
+        self.assertEqual(edit_distance("python", "java", 2), 3)
+
+    def test_prefixes_ignore_case(self):
+        self.assertEqual(self.index.lookup("py"), ["Python", "PyTorch"])
+        self.assertEqual(self.index.lookup("GIT", limit=1), ["Git"])
+
+    def test_typos_are_tolerated(self):
+        self.assertEqual(self.index.lookup("Djnago"), ["Django"])
+        self.assertEqual(self.index.lookup("javscript"), ["JavaScript"])
+        self.assertEqual(self.index.lookup("zzzz"), [])
+
+    def test_titles_containing_text(self):
+        self.assertEqual(self.index.containing("AVA"), ["Java", "JavaScript"])
+        self.assertEqual(self.index.containing("it"), ["Git", "GitHub"])
+        self.assertEqual(self.index.containing("a", limit=2), ["Django", "Java"])
+        self.assertEqual(self.index.containing("torch"), ["PyTorch"])
+        self.assertEqual(self.index.containing("zzz"), [])
+
+    def test_near_match(self):
+        self.assertEqual(self.index.near_match("Python"), "Python")
+        self.assertEqual(self.index.near_match("html"), "HTML")
+        self.assertEqual(self.index.near_match("Pythn"), "Python")
+        # Too far, or not clear which one is meant
+        self.assertIsNone(self.index.near_match("Pyton tutorial"))
+        self.assertIsNone(self.index.near_match("Gt"))
+
+    def test_saved_titles_are_added(self):
+        titles.index.lookup("py")
+        util.save_entry("Pyramid", "# Pyramid")
+        self.assertEqual(titles.index.lookup("pyr"), ["Pyramid"])
+
+    def test_saving_leaves_what_readers_hold_alone(self):
+        titles.index.lookup("py")
+        keys, held = titles.index.sorted
+        buckets = titles.index.grams[" py"]
+        util.save_entry("Pyramid", "# Pyramid")
+        self.assertNotIn("Pyramid", held)
+        self.assertEqual(len(keys), len(held))
+        self.assertNotIn("Pyramid", buckets.get(7, []))
+        self.assertEqual(titles.index.lookup("py"), ["Pyramid", "Python", "PyTorch"])
+
+    def test_autocomplete_route(self):
+        response = self.client.get(reverse("autocomplete"), {"q": "jav", "limit": "5"})
+        self.assertEqual(response.json(), {"query": "jav", "results": ["Java", "JavaScript"]})
+
+    def test_search_with_a_typo_redirects(self):
+        response = self.client.get(reverse("index"), {"q": "Djang"})
+        self.assertRedirects(response, reverse("wiki", args=["Django"]))
+
+
+class EntryStoreTests(EntriesMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.overrideSettings(WIKI_SEARCH_INDEX=None)
+        for title in ["Python", "Git"]:
+            self.writeFile(title)
+
+    def useDatabase(self):
+        self.overrideSettings(WIKI_ENTRY_STORE="encyclopedia.stores.DatabaseStore")
+
+    def test_file_writes_replace_the_file(self):
+        store = FileSystemStore()
+        store.write("Python", "# Snake")
+        self.assertEqual(store.read("Python"), "# Snake")
+        self.assertEqual(sorted(os.listdir(self.entries)), ["Git.md", "Python.md"])
+
+    def test_titles_cannot_leave_the_entries_directory(self):
+        store = FileSystemStore()
+        for title in ["../evil", "../../evil", "other/evil", "/tmp/evil"]:
+            with self.assertRaises(SuspiciousFileOperation):
+                store.write(title, "# Evil")
+        self.assertEqual(sorted(os.listdir(self.media)), ["entries"])
+        self.assertEqual(sorted(os.listdir(self.entries)), ["Git.md", "Python.md"])
+        response = self.client.post(reverse("createNewPage"), {"title": "../evil", "content": "# Evil"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_database_store(self):
+        store = DatabaseStore()
+        self.assertIsNone(store.read("Python"))
+        store.write("Python", "# Python")
+        stamp = store.stamp()
+        store.write_many([("Python", "# Snake"), ("Git", "# Git")])
+        self.assertEqual(store.read("Python"), "# Snake")
+        self.assertEqual(sorted(store.titles()), ["Git", "Python"])
+        self.assertNotEqual(store.stamp(), stamp)
+
+    def test_deleted_entries_disappear(self):
+        self.useDatabase()
+        util.save_entry("Django", "# Django")
+        util.save_entry("Flask", "# Flask")
+        self.assertEqual(titles.index.lookup("dja"), ["Django"])
+        # Not the latest entry, the latest update time stays the same
+        Entry.objects.filter(title="Django").delete()
+        self.assertEqual(util.list_entries(), ("Flask",))
+        self.assertEqual(titles.index.lookup("dja"), [])
+        self.assertEqual(search.index.search("django"), [])
+
+    def test_import_command_copies_the_files(self):
+        call_command("importentries", stdout=StringIO())
+        self.assertEqual(DatabaseStore().read("Git"), "# Git")
+        self.useDatabase()
+        self.assertEqual(util.list_entries(), ("Git", "Python"))
+
+    def test_wiki_runs_on_the_database(self):
+        self.useDatabase()
+        self.assertEqual(util.list_entries(), ())
+        util.save_entry("Django", "# Django")
+        self.assertEqual(util.list_entries(), ("Django",))
+        self.assertEqual(util.get_entry("Django"), "# Django")
+        response = self.client.get(reverse("wiki", args=["Django"]))
+        self.assertContains(response, "<h1>Django</h1>", html=True)
+        self.assertEqual([title for title, score in search.index.search("django")], ["Django"])
@@ -0,0 +1,278 @@
+import bisect
+import heapq
+import threading
+from collections import Counter
+
+from . import util
+
+# Trigrams the titles must still share with the query when the lists of
+# the most common ones are left out of the count
+MIN_SHARED = 4
+
+
+def trigrams(text):
+    """
+    Returns the set of three letter pieces of a lowercase text, padded so
+    the start and the end of the text count too.
+    """
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def max_distance(text):
+    """
+    Returns how many typos a query of this length may contain.
+    """
+    return 1 if len(text) <= 5 else 2
+
+
+def pattern(text):
+    """
+    Returns, for every letter of a text, the bits of the positions where
+    it appears, which edit_distance compares the other text against.
+    """
+    bits = {}
+    for i, letter in enumerate(text):
+        bits[letter] = bits.get(letter, 0) | 1 << i
+    return bits
+
+
+def edit_distance(a, b, limit, bits=None):
+    """
+    Returns the Levenshtein distance between two texts, or limit + 1 as
+    soon as it is known to be over limit.
+
+    The column of the distances to every prefix of a is kept as the bits
+    of two integers, whether each cell is one more or one less than the
+    one above (Myers' algorithm), so a letter of b costs a handful of
+    integer operations instead of a loop over a. bits is pattern(a), when
+    the caller compares a to many texts.
+    """
+    over = limit + 1
+    if abs(len(a) - len(b)) > limit:
+        return over
+    if not a:
+        return len(b)
+    if bits is None:
+        bits = pattern(a)
+    mask = (1 << len(a)) - 1
+    last = 1 << (len(a) - 1)
+    plus, minus = mask, 0
+    distance = len(a)
+    left = len(b)
+    for letter in b:
+        equal = bits.get(letter, 0)
+        vertical = equal | minus
+        horizontal = (((equal & plus) + plus) ^ plus) | equal
+        up = minus | (~(horizontal | plus) & mask)
+        down = plus & horizontal
+        if up & last:
+            distance += 1
+        elif down & last:
+            distance -= 1
+        left -= 1
+        # Every letter left lowers the distance by one at most
+        if distance - left > limit:
+            return over
+        up = ((up << 1) | 1) & mask
+        down = (down << 1) & mask
+        plus = down | (~(vertical | up) & mask)
+        minus = up & vertical
+    return min(distance, over)
+
+
+class TitleIndex:
+    """
+    Index of the entry titles for the search box: case insensitive prefix
+    matching and matching with a few typos.
+
+    The lowercase titles are kept sorted, so the titles starting with a
+    prefix are a slice found by bisection, which is what a trie gives with
+    much less memory in Python. For typos, every title is listed under
+    each of its trigrams, by length. A title within k edits of the query
+    is at most k letters longer or shorter, and since an edit changes at
+    most three trigrams, it shares all but 3k of the query's trigrams.
+    Counting the shared trigrams of the titles of those lengths rules out
+    nearly all of them before computing any edit distance. The lists of
+    the most common trigrams are long and rule out little, so they are
+    left out of the count, as long as a few trigrams still have to match.
+
+    The index follows the catalogue: save_entry adds titles, and it is
+    built again when the catalogue changed some other way. Readers do not
+    take the lock, so writers never change a list or dict a reader may
+    hold: they build new ones and swap them in, the sorted keys and titles
+    as one pair.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.generation = None
+        self.sorted = ([], [])
+        self.grams = {}
+        self.by_key = {}
+
+    def insert(self, title):
+        key = title.lower()
+        keys, titles = self.sorted
+        position = bisect.bisect_left(keys, key)
+        self.sorted = (keys[:position] + [key] + keys[position:],
+                       titles[:position] + [title] + titles[position:])
+        self.by_key[key] = self.by_key.get(key, []) + [title]
+        for gram in trigrams(key):
+            by_length = dict(self.grams.get(gram, {}))
+            by_length[len(key)] = by_length.get(len(key), []) + [title]
+            self.grams[gram] = by_length
+
+    def refresh(self):
+        titles = util.list_entries()
+        if self.generation == util.catalogue.generation:
+            return
+        with self.lock:
+            generation = util.catalogue.generation
+            pairs = sorted((title.lower(), title) for title in titles)
+            by_key, grams = {}, {}
+            for key, title in pairs:
+                by_key.setdefault(key, []).append(title)
+                for gram in trigrams(key):
+                    grams.setdefault(gram, {}).setdefault(len(key), []).append(title)
+            self.sorted = ([key for key, title in pairs], [title for key, title in pairs])
+            self.by_key, self.grams = by_key, grams
+            self.generation = generation
+
+    def entry_saved(self, title, generation):
+        """
+        Adds the title of a saved entry, if it is new.
+        """
+        with self.lock:
+            if self.generation is None:
+                return
+            if title not in self.by_key.get(title.lower(), ()):
+                self.insert(title)
+            # Only this entry changed if the index was current before the save
+            if self.generation == generation - 1:
+                self.generation = generation
+
+    def prefixed(self, prefix, limit):
+        """
+        Returns up to limit titles starting with prefix, ignoring case.
+        """
+        self.refresh()
+        prefix = prefix.lower()
+        keys, titles = self.sorted
+        start = bisect.bisect_left(keys, prefix)
+        found = []
+        for key, title in zip(keys[start:start + limit], titles[start:start + limit]):
+            if not key.startswith(prefix):
+                break
+            found.append(title)
+        return found
+
+    def containing(self, text, limit=50):
+        """
+        Returns up to limit titles containing text, ignoring case, in the
+        order of their lowercase forms. Such a title has every trigram of
+        the text, so only the titles listed under its rarest trigram, and
+        not shorter than it, are looked at.
+        """
+        self.refresh()
+        text = text.lower()
+        grams = {text[i:i + 3] for i in range(len(text) - 2)}
+        if not grams:
+            # Too short for trigrams, but matching many titles: the sorted
+            # keys are read until enough of them are found
+            found = []
+            for key, title in zip(*self.sorted):
+                if text in key:
+                    found.append(title)
+                    if len(found) == limit:
+                        break
+            return found
+        buckets = []
+        for gram in grams:
+            by_length = self.grams.get(gram, {})
+            found = [titles for length, titles in by_length.items() if length >= len(text)]
+            if not found:
+                return []
+            buckets.append(found)
+        rarest = min(buckets, key=lambda found: sum(map(len, found)))
+        matches = set()
+        for titles in rarest:
+            for title in titles:
+                key = title.lower()
+                if text in key:
+                    matches.add((key, title))
+        return [title for key, title in heapq.nsmallest(limit, matches)]
+
+    def fuzzy(self, query, limit, distance=None):
+        """
+        Returns up to limit (distance, title) pairs of the titles within a
+        few typos of the query, closest first.
+        """
+        self.refresh()
+        query = query.lower()
+        if distance is None:
+            distance = max_distance(query)
+        grams = trigrams(query)
+        lengths = range(len(query) - distance, len(query) + distance + 1)
+        lists = []
+        for gram in grams:
+            by_length = self.grams.get(gram, {})
+            lists.append([by_length[length] for length in lengths if length in by_length])
+        lists.sort(key=lambda buckets: sum(map(len, buckets)))
+        # Every list left out lowers by one the trigrams to have in common
+        needed = len(grams) - 3 * distance
+        skipped = max(0, min(len(lists), needed - MIN_SHARED))
+        needed -= skipped
+        shared = Counter()
+        for buckets in lists[:len(lists) - skipped]:
+            for bucket in buckets:
+                shared.update(bucket)
+
+        matches = []
+        bits = pattern(query)
+        for title, count in shared.items():
+            if count >= needed:
+                found = edit_distance(query, title.lower(), distance, bits)
+                if found <= distance:
+                    matches.append((found, title))
+        matches.sort(key=lambda match: (match[0], match[1].lower()))
+        return matches[:limit]
+
+    def lookup(self, query, limit=10):
+        """
+        Returns up to limit titles for the search box: the titles starting
+        with the query or, when there are none, the titles within a few
+        typos of it.
+        """
+        query = query.strip()
+        if not query:
+            return []
+        matches = self.prefixed(query, limit)
+        if not matches and len(query) >= 3:
+            matches = [title for _, title in self.fuzzy(query, limit)]
+        return matches
+
+    def near_match(self, query):
+        """
+        Returns the title a query clearly means: the title itself, the
+        only title equal to it ignoring case, or the only title one typo
+        away. Returns None when there is no such title or several.
+        """
+        query = query.strip()
+        if not query:
+            return None
+        self.refresh()
+        same = self.by_key.get(query.lower(), [])
+        if query in same:
+            return query
+        if len(same) == 1:
+            return same[0]
+        if same or len(query) < 4:
+            return None
+        close = self.fuzzy(query, 2, distance=1)
+        if len(close) == 1:
+            return close[0][1]
+        return None
+
+
+index = TitleIndex()
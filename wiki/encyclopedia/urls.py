@@ -5,5 +5,6 @@ from . import views
 urlpatterns = [
     path("", views.index, name="index"),
     path("wiki/<str:title>", views.wiki, name="wiki"),
-    path("new", views.createNewPage, name="createNewPage")
+    path("new", views.createNewPage, name="createNewPage"),
+    path("autocomplete", views.autocomplete, name="autocomplete")
 ]
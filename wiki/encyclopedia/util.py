@@ -1,28 +1,126 @@
-import re
+import bisect
+import threading
 
-from django.core.files.base import ContentFile
-from django.core.files.storage import default_storage
+from . import rendering, search, stores, titles
+
+
+class EntryCatalogue:
+    """
+    Process-wide, in-memory list of the entry titles.
+
+    The titles are read from the entry store once, then kept up to date
+    in place by save_entry. Every read asks the store for its stamp (one
+    stat call for the files, a count and an indexed query for the
+    database) and reads the titles again when entries were added or
+    removed behind our back, e.g. by another worker process. generation goes up on every change, so caches
+    built from the entries can tell when they are stale.
+    """
+
+    def __init__(self, store=None):
+        self.fixed_store = store
+        self.lock = threading.Lock()
+        self.titles = ()
+        self.names = frozenset()
+        self.stamp = None
+        self.generation = 0
+
+    @property
+    def store(self):
+        return self.fixed_store or stores.get_store()
+
+    def store_stamp(self):
+        """
+        Returns what identifies the current state of the entries: the store
+        used and its own stamp.
+        """
+        store = self.store
+        return (type(store).__name__, store.stamp())
+
+    def refresh(self):
+        """
+        Reads the titles again if the entries changed since the last read.
+        """
+        stamp = self.store_stamp()
+        if stamp == self.stamp:
+            return
+        with self.lock:
+            if stamp == self.stamp:
+                return
+            self.titles = tuple(sorted(self.store.titles()))
+            self.names = frozenset(self.titles)
+            self.stamp = stamp
+            self.generation += 1
+
+    def sorted_titles(self):
+        """
+        Returns the sorted titles as a tuple, shared by every caller.
+        """
+        self.refresh()
+        return self.titles
+
+    def __contains__(self, title):
+        self.refresh()
+        return title in self.names
+
+    def __len__(self):
+        self.refresh()
+        return len(self.titles)
+
+    def save(self, title, content):
+        """
+        Writes an entry and adds its title in place. The store stamp is
+        only taken over when nothing else changed the entries since the
+        last read, otherwise the next read lists them again.
+        """
+        self.refresh()
+        with self.lock:
+            current = self.store_stamp() == self.stamp
+            self.store.write(title, content)
+            if title not in self.names:
+                titles = list(self.titles)
+                bisect.insort(titles, title)
+                self.titles = tuple(titles)
+                self.names = self.names | {title}
+            self.stamp = self.store_stamp() if current else None
+            self.generation += 1
+
+
+catalogue = EntryCatalogue()
 
 
 def list_entries():
     """
-    Returns a list of all names of encyclopedia entries.
+    Returns the sorted names of all encyclopedia entries, as a tuple.
     """
-    _, filenames = default_storage.listdir("entries")
-    return list(sorted(re.sub(r"\.md$", "", filename)
-                for filename in filenames if filename.endswith(".md")))
+    return catalogue.sorted_titles()
+
+
+def entry_exists(title):
+    """
+    Tells whether an encyclopedia entry with this exact title exists,
+    without touching the disk.
+    """
+    return title in catalogue
+
+
+def count_entries():
+    """
+    Returns the number of encyclopedia entries.
+    """
+    return len(catalogue)
 
 
 def save_entry(title, content):
     """
     Saves an encyclopedia entry, given its title and Markdown
     content. If an existing entry with the same title already exists,
-    it is replaced.
+    it is replaced. The entry is indexed for search and rendered right
+    away, so the next view of the page does not have to.
     """
-    filename = f"entries/{title}.md"
-    if default_storage.exists(filename):
-        default_storage.delete(filename)
-    default_storage.save(filename, ContentFile(content))
+    catalogue.save(title, content)
+    search.index.entry_saved(title, content, catalogue.generation)
+    titles.index.entry_saved(title, catalogue.generation)
+    rendering.cache.entry_saved(title, content)
 
 
 def get_entry(title):
@@ -30,8 +128,12 @@ def get_entry(title):
     Retrieves an encyclopedia entry by its title. If no such
     entry exists, the function returns None.
     """
-    try:
-        f = default_storage.open(f"entries/{title}.md")
-        return f.read().decode("utf-8")
-    except FileNotFoundError:
-        return None
+    return catalogue.store.read(title)
+
+
+def entry_signature(title):
+    """
+    Returns what tells whether an entry changed since it was last seen,
+    or None if the store cannot say.
+    """
+    return catalogue.store.signature(title)
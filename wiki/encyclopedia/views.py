@@ -1,7 +1,7 @@
 from django.shortcuts import render
-from django.http import HttpResponse
-from . import util
-from markdown2 import Markdown
+from django.http import HttpResponse, JsonResponse
+from . import search, titles, util
+from .rendering import render_entry
 from django import forms
 from django.shortcuts import redirect
 from random import randint
@@ -31,10 +31,10 @@ def index(request):
     random = request.GET.get('rand')
 
     if query:
-        entry = util.get_entry(query)
-
-        if entry:
-           return HttpResponse(wiki(request, query)) 
+        # Go straight to the entry the query clearly means, typos and case aside
+        match = titles.index.near_match(query)
+        if match is not None:
+            return redirect("wiki", title=match)
         else:
             return HttpResponse(searchResults(request, query)) 
 
@@ -50,26 +50,29 @@ def index(request):
 
 def wiki(request, title):
     entry = util.get_entry(title)
-    markdown = Markdown()
     if entry is None:
         return render(request, "encyclopedia/error.html")
     else:
         return render(request, "encyclopedia/wiki.html", {
             "title": title,
-            "entry": markdown.convert(entry)
+            # Cached by content, rendered only when the entry changed
+            "entry": render_entry(title, entry)
         })
 
 def searchResults(request, query):
-    listQuery = []
-    listEntries = util.list_entries()
-    
-    # For each entry check if query is a substring
-    for entry in listEntries:
-        if query in entry:
-            listQuery.append(entry)
+    # Entries whose content matches, best first, with a piece of their text
+    results = search.search_entries(query)
+    found = {result["title"] for result in results}
+
+    # Then the titles that contain the query, like the search always did,
+    # looked up through the trigrams of the title index
+    for entry in titles.index.containing(query):
+        if entry not in found:
+            results.append({"title": entry, "snippet": ""})
 
     return render(request, "encyclopedia/searchResults.html", {
-        "listEntries": listQuery
+        "query": query,
+        "results": results
     })
 
 def createNewPage(request):
@@ -87,6 +90,19 @@ def createNewPage(request):
         "form": newCreatePageForm()
     })
 
+# Titles for the search box as the user types, as JSON
+# Returns the titles starting with q, then the ones a few typos away
+def autocomplete(request):
+    query = request.GET.get("q", "")
+    try:
+        limit = min(max(int(request.GET.get("limit", 10)), 1), 50)
+    except ValueError:
+        limit = 10
+    return JsonResponse({
+        "query": query,
+        "results": titles.index.lookup(query, limit)
+    })
+
 # Get a random name from the list of entries
 # Returns a string witht the title
 def randomPage():
@@ -119,3 +119,26 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.0/howto/static-files/
 
 STATIC_URL = '/static/'
+
+
+# Rendered entries
+# Pages kept in memory by the rendered Markdown cache of each process
+WIKI_RENDER_CACHE_SIZE = 256
+
+# Directory where rendered pages are also written, so they survive
+# restarts and are shared between processes. None keeps them in memory only
+WIKI_RENDER_CACHE_DIR = None
+
+
+# Search
+# File where the search index is saved, so a restart only reads the
+# entries that changed. None keeps it in memory only
+WIKI_SEARCH_INDEX = os.path.join(BASE_DIR, 'search-index.pickle')
+
+
+# Entries
+# Where the entries are kept: encyclopedia.stores.FileSystemStore keeps
+# one Markdown file per entry in entries/, encyclopedia.stores.DatabaseStore
+# keeps them in the Entry table of the SQLite database. Copy the files over
+# with "python manage.py importentries" before switching
+WIKI_ENTRY_STORE = 'encyclopedia.stores.FileSystemStore'